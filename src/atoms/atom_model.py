@@ -5,11 +5,74 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from typing import List, Optional
-from solid2 import sphere, cube, color
+from typing import Dict, Final, List, Optional, Tuple
+from functools import lru_cache
+from math import radians
+from solid2 import sphere, cube, color, difference, multmatrix
+import numpy as np
 from .element import Element
 from .neighbor import Neighbor
-from src.atoms.bond import bond_model_from_order
+from src.atoms.bond import BOND_TEMPLATE_CACHE_SIZE, bond_model_from_order, bond_scad_modules, clear_bond_templates
+from src.utils.resolution import Resolution, scad_fn
+from src.utils.rotation import affine_matrix, axis_angle_matrix_degrees, z_rotation_matrix_degrees
+from src.utils.scad_library import scad_module, scad_module_definition, scad_parameter
+
+
+"""
+Two atoms are treated as the same printed part when their neighbors match to within these tolerances. Distances are in
+the model units (mm) and angles in degrees.
+"""
+SIGNATURE_DISTANCE_QUANTUM: Final[float] = 0.01
+SIGNATURE_ANGLE_QUANTUM: Final[float] = 0.1
+
+
+def _neighbor_space(radius):
+    return cube(3 * radius).translate([-3 * radius / 2, -3 * radius / 2, -3 * radius])
+
+
+def _multmatrix(matrix: np.ndarray):
+    """A multmatrix node for the 4x4 matrix. Rounding off the last few bits keeps exact angles from leaving noise like
+    6.1e-17 in the scad.
+    """
+    return multmatrix((np.round(matrix, 12) + 0.0).tolist())
+
+
+@lru_cache(maxsize=BOND_TEMPLATE_CACHE_SIZE)
+def _neighbor_space_template(
+    radius: float,
+    bond_order: int,
+    label: Optional[str],
+    library: bool = False,
+    resolution: Optional[Resolution] = None,
+):
+    """The space removed for a neighbor, before it is moved into place, only depends on the radius of the atom, the
+    bond order, the label and the resolution. So it is built once and shared by every neighbor with the same values.
+    """
+    neighbor_space = scad_module('neighbor_space', radius=radius) if library else _neighbor_space(radius)
+    bond = bond_model_from_order(bond_order)
+    # A bond without any space of its own would only add an empty node to the tree.
+    if not bond.has_space(label):
+        return neighbor_space
+    return neighbor_space + bond.model(label, library, resolution)
+
+
+def clear_atom_templates() -> None:
+    """Drops all of the cached geometry atom models are built from: the neighbor spaces and, through
+    clear_bond_templates, the bonds and the rings of label text. This is the one place to reset the caches, e.g. after
+    changing code or settings the geometry is built from in a running process.
+    """
+    _neighbor_space_template.cache_clear()
+    clear_bond_templates()
+
+
+def atom_scad_library() -> str:
+    """Returns the source of the shared scad library used by atom models built in library mode. On top of the bond
+    modules (see bond_scad_modules) it defines neighbor_space(radius), the block removed from an atom with the given
+    radius to make room for a neighbor.
+    """
+    modules = bond_scad_modules()
+    modules.append(scad_module_definition('neighbor_space', ['radius'], _neighbor_space(scad_parameter('radius'))))
+    return '\n'.join(modules)
 
 
 class AtomModelBuilder(object):
@@ -63,6 +126,8 @@ class AtomModelBuilder(object):
 class AtomModel(object):
     """This is a class that represents the model of an atom. It is holds all of the information about neighboring atoms
     and the bonds between them. This is then used to generate the 3D model of the atom by calling the model() method.
+    Builds skip the files whose inputs have not changed (see build_manifest), so bump BUILD_MANIFEST_VERSION along with
+    any change to the geometry made here.
     """
     def __init__(
         self,
@@ -76,9 +141,93 @@ class AtomModel(object):
     def element(self) -> Element:
         return self._element
 
+    @property
+    def neighbors(self) -> List[Neighbor]:
+        return self._neighbors
+
     def clone(self) -> 'AtomModel':
         return AtomModel(self._element, self._neighbors.copy())
 
+    def __neighbor_keys(self) -> List[Tuple[int, int, int, str]]:
+        """The part of each neighbor that does not depend on its direction, with the distance quantized."""
+        return [
+            (neighbor.element.atomic_number, round(neighbor.distance / SIGNATURE_DISTANCE_QUANTUM),
+             neighbor.bond_order, neighbor.label or '')
+            for neighbor in self._neighbors]
+
+    def neighbor_vectors(self) -> np.ndarray:
+        """Returns an N x 3 array with the unit vector pointing at each neighbor. The space removed for a neighbor is
+        everything further than interface_distance(neighbor) along its vector.
+        """
+        inclinations = np.radians([neighbor.direction.inclination for neighbor in self._neighbors])
+        azimuths = np.radians([neighbor.direction.azimuthal for neighbor in self._neighbors])
+        return np.column_stack((
+            np.cos(inclinations) * np.cos(azimuths), np.cos(inclinations) * np.sin(azimuths), np.sin(inclinations)))
+
+    def signature(self) -> Tuple:
+        """Returns a signature of the shape of the atom that does not change when the atom is rotated. It is made from
+        the element and, for its neighbors, the quantized distances, bond orders, elements and labels along with the
+        quantized angles between each pair of neighbors. Atoms that are the same part (see is_equivalent) always have
+        the same signature, so it can be used to find the candidates that need to be compared.
+        """
+        keys = self.__neighbor_keys()
+        vectors = self.neighbor_vectors()
+        angles = np.degrees(np.arccos(np.clip(vectors @ vectors.T, -1.0, 1.0)))
+        pairs = sorted(
+            (min(keys[i], keys[j]), max(keys[i], keys[j]), round(angles[i, j] / SIGNATURE_ANGLE_QUANTUM))
+            for i in range(len(keys)) for j in range(i + 1, len(keys)))
+        return (self._element.atomic_number, tuple(sorted(keys)), tuple(pairs))
+
+    def is_equivalent(self, other: 'AtomModel') -> bool:
+        """Returns True if the other atom is the same printed part as this one, that is, a rotation takes the neighbors
+        of one onto the neighbors of the other. Unlike the signature this tells mirror images apart.
+        """
+        if self.signature() != other.signature():
+            return False
+        keys = self.__neighbor_keys()
+        other_keys = other.__neighbor_keys()
+        vectors = self.neighbor_vectors()
+        other_vectors = other.neighbor_vectors()
+        tolerance = 2 * radians(SIGNATURE_ANGLE_QUANTUM)
+
+        # Any rotation is fixed by where it takes two neighbors that are not in line with each other. If there are no
+        # such neighbors then the atom is symmetric about an axis and the matching signatures are enough.
+        first = 0
+        crosses = np.linalg.norm(np.cross(vectors[first], vectors), axis=1) if len(keys) > 0 else np.zeros(0)
+        candidates = np.flatnonzero(crosses > tolerance)
+        if len(candidates) == 0:
+            return True
+        second = int(candidates[0])
+
+        def frame(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+            e2 = v - (v @ u) * u
+            e2 /= np.linalg.norm(e2)
+            return np.column_stack((u, e2, np.cross(u, e2)))
+
+        angle = vectors[first] @ vectors[second]
+        for i in range(len(other_keys)):
+            if other_keys[i] != keys[first]:
+                continue
+            for j in range(len(other_keys)):
+                if j == i or other_keys[j] != keys[second]:
+                    continue
+                if abs(other_vectors[i] @ other_vectors[j] - angle) > tolerance:
+                    continue
+                rotation = frame(other_vectors[i], other_vectors[j]) @ frame(vectors[first], vectors[second]).T
+                rotated = vectors @ rotation.T
+                unmatched = list(range(len(other_keys)))
+                for k in range(len(keys)):
+                    match = next((
+                        m for m in unmatched
+                        if other_keys[m] == keys[k] and np.linalg.norm(rotated[k] - other_vectors[m]) < tolerance),
+                        None)
+                    if match is None:
+                        break
+                    unmatched.remove(match)
+                if len(unmatched) == 0:
+                    return True
+        return False
+
     def __atom_interface_distance(
         self,
         mate: Element,
@@ -94,6 +243,56 @@ class AtomModel(object):
         mate_r = mate.van_der_waals_radius
         return ((self_r + mate_r)*(self_r - mate_r) + distance * distance) / (2 * distance)
 
+    def interface_distance(self, neighbor: Neighbor) -> float:
+        """Returns the distance from the center of the atom to the flat face it shares with the neighbor."""
+        return self.__atom_interface_distance(neighbor.element, neighbor.distance)
+
+    def cut_neighbors(self) -> List[Neighbor]:
+        """Returns the neighbors whose space changes the model of the atom, in their original order. The space of a
+        neighbor whose bond has no space of its own (see BondModel.has_space) is just everything beyond its flat face,
+        so it can be dropped when that face misses the sphere, or when the cap it cuts off is already removed by the
+        space of another neighbor that is kept. The space of any other bond is kept, since it is cut below the face.
+        """
+        if len(self._neighbors) == 0:
+            return []
+        radius = self._element.van_der_waals_radius
+        vectors = self.neighbor_vectors()
+        distances = np.array([self.interface_distance(neighbor) for neighbor in self._neighbors])
+        kept = np.ones(len(self._neighbors), dtype=bool)
+        for i, neighbor in enumerate(self._neighbors):
+            if bond_model_from_order(neighbor.bond_order).has_space(neighbor.label):
+                continue
+            distance = distances[i]
+            if distance >= radius:
+                kept[i] = False
+                continue
+            # The cap cut off by neighbor i is inside the space of neighbor j when the lowest point of the cap along
+            # vector j is beyond the face of j. That lowest point is the bottom of the sphere when it is on the cap, and
+            # otherwise it is on the circle where the face meets the sphere.
+            cosines = np.clip(vectors @ vectors[i], -1.0, 1.0)
+            lowest = np.where(
+                -radius * cosines >= distance,
+                -radius,
+                distance * cosines - np.sqrt(radius * radius - distance * distance) * np.sqrt(1 - cosines * cosines))
+            others = kept.copy()
+            others[i] = False
+            if np.any(others & (lowest >= distances)):
+                kept[i] = False
+        return [neighbor for neighbor, keep in zip(self._neighbors, kept) if keep]
+
+    def print_neighbor(self) -> Optional[Neighbor]:
+        """Returns the neighbor whose face print() puts on the x-y plane, or None if the atom has no neighbors."""
+        # We want to make sure we have a flat surface to print from, so we want to find the largest surface area formed
+        # by the intersection of the atom and its neighbors. We will then rotate/move the atom so that surface is on the
+        # x-y plane. But there can be many neighbors, so really we want to limit our search to neighbors that are
+        # actually bonded to the atom. So if the bond order is 0, then we make the radius 0 so it doesn't get picked.
+        if len(self._neighbors) == 0:
+            return None
+        radii = [
+            self.__atom_interface_radius(neighbor.element, neighbor.distance) if neighbor.bond_order > 0 else 0
+            for neighbor in self._neighbors]
+        return self._neighbors[radii.index(max(radii))]
+
     def __atom_interface_radius(
         self,
         mate: Element,
@@ -116,54 +315,78 @@ class AtomModel(object):
         area = 0.25 * ((a + (b + c)) * (c - (a - b)) * (c + (a - b)) * (a + (b - c))) ** 0.5
         return distance / area / 2
 
-    def __neighbor_space(
-        self,
-        neighbor: Neighbor,
-    ):
-        """This method returns the space that needs to be removed from the atom in order to make room for the neighbor.
+    def __neighbor_matrix(self, neighbor: Neighbor) -> np.ndarray:
+        """Returns the 4x4 matrix that moves the space of the neighbor (see _neighbor_space_template) into place. The
+        space is built below the x-y plane, so it is moved down to the face, turned so it is beyond the face along the x
+        axis, and then turned to point at the neighbor.
         """
-        self_r = self._element.van_der_waals_radius
-        neighbor_space = cube(3 * self_r).translate([-3 * self_r / 2, -3 * self_r / 2, -3 * self_r])
-        bond_space = bond_model_from_order(neighbor.bond_order)
-        total_space = neighbor_space + bond_space.model(neighbor.label)
-        total_space = total_space.down(self.__atom_interface_distance(neighbor.element, neighbor.distance))
-        return total_space.rotate(0, -90, 0)
+        rotation = (
+            z_rotation_matrix_degrees(neighbor.direction.azimuthal)
+            @ axis_angle_matrix_degrees((0.0, 1.0, 0.0), -neighbor.direction.inclination - 90))
+        return affine_matrix(rotation, rotation @ [0.0, 0.0, -self.interface_distance(neighbor)])
 
-    def model(self):
-        """This method returns the 3D model of the atom. It does this by creating a sphere with the radius of the atom
-        and then subtracting the space that is taken up by the neighbors.
+    def print_matrix(self) -> np.ndarray:
+        """Returns the 4x4 matrix print() applies to the model, which puts the face of print_neighbor() on the x-y
+        plane with the atom above it.
         """
-        atom = sphere(self._element.van_der_waals_radius)
-        for neighbor in self._neighbors:
-            # combine the neighbor space and bond space
-            to_remove = self.__neighbor_space(neighbor)
-            # rotate the portion to remove to the correct orientation then subtract it from the atom
-            to_remove = to_remove.rotate(0, -neighbor.direction.inclination, 0)
-            to_remove = to_remove.rotate(0, 0, neighbor.direction.azimuthal)
-            atom -= to_remove
+        base = self.print_neighbor()
+        if base is None:
+            return np.eye(4)
+        rotation = (
+            axis_angle_matrix_degrees((0.0, 1.0, 0.0), 90 + base.direction.inclination)
+            @ z_rotation_matrix_degrees(-base.direction.azimuthal))
+        return affine_matrix(rotation, [0.0, 0.0, self.interface_distance(base)])
+
+    def __model(self, matrix: np.ndarray, library: bool, resolution: Optional[Resolution]):
+        """Builds the model of the atom moved by the 4x4 matrix. Every transform is folded into a single multmatrix on
+        each child, and all the spaces are subtracted by one difference, so the tree stays shallow.
+        """
+        radius = self._element.van_der_waals_radius
+        ball = sphere(radius, _fn=scad_fn(resolution, radius))
+        atom = ball if np.array_equal(matrix, np.eye(4)) else _multmatrix(matrix)(ball)
+        spaces = [
+            _multmatrix(matrix @ self.__neighbor_matrix(neighbor))(
+                _neighbor_space_template(radius, neighbor.bond_order, neighbor.label, library, resolution))
+            for neighbor in self.cut_neighbors()]
+        if len(spaces) > 0:
+            atom = difference()(atom, *spaces)
         return color(self._element.cpk_color)(atom)
 
-    def print(self):
-        """This takes the model (from model() call above) and orientates it so that the largest surface area is on the
-        x-y plane.
+    def model(self, library: bool = False, resolution: Optional[Resolution] = None):
+        """This method returns the 3D model of the atom. It does this by creating a sphere with the radius of the atom
+        and then subtracting the space that is taken up by the neighbors, skipping those that would not change it (see
+        cut_neighbors). If library is True each neighbor's space is a call to the modules of the shared scad library
+        (see atom_scad_library) rather than being written out in full. The round parts are drawn at the resolution, or
+        with OpenSCAD's defaults if there is none.
+        """
+        return self.__model(np.eye(4), library, resolution)
+
+    def print(self, library: bool = False, resolution: Optional[Resolution] = None):
+        """This returns the model (from model() call above) orientated so that the largest surface area is on the x-y
+        plane, see print_matrix(). The orientation is folded into the transform of each child rather than wrapped around
+        the model. The library flag and the resolution are as for model().
         """
         print("Printing atom: {} With {} neighbors:".format(self._element.name, len(self._neighbors)))
         for neighbor in self._neighbors:
             print("  Neighbor: {} with interface radius: {} with bond order: {}".format(
                 neighbor.element.name, self.__atom_interface_radius(neighbor.element, neighbor.distance),
                 neighbor.bond_order))
-        atom = self.model()
-        # We want to make sure we have a flat surface to print from, so we want to find the largest surface area formed
-        # by the intersection of the atom and its neighbors. We will then rotate/move the atom so that surface is on the
-        # x-y plane. But there can be many neighbors, so really we want to limit our search to neighbors that are
-        # actually bonded to the atom. So if the bond order is 0, then we make the radius 0 so it doesn't get picked.
-        if len(self._neighbors) > 0:
-            radii = [
-                self.__atom_interface_radius(neighbor.element, neighbor.distance) if neighbor.bond_order > 0 else 0
-                for neighbor in self._neighbors]
-            neighbor = self._neighbors[radii.index(max(radii))]
-            atom = atom.rotate(0, 0, -neighbor.direction.azimuthal)
-            atom = atom.rotate(0, neighbor.direction.inclination, 0)
-            atom = atom.rotate(0, 90, 0)
-            atom = atom.up(self.__atom_interface_distance(neighbor.element, neighbor.distance))
-        return atom
+        return self.__model(self.print_matrix(), library, resolution)
+
+
+def group_equivalent_atoms(atoms: List[AtomModel]) -> List[List[AtomModel]]:
+    """Groups the atoms that are the same printed part (see AtomModel.is_equivalent), so each part only needs to be
+    modelled and rendered once and can then be placed as many times as there are atoms in its group. The groups are in
+    the order of their first atom, and the atoms in each group keep their order.
+    """
+    groups: List[List[AtomModel]] = []
+    candidates: Dict[Tuple, List[List[AtomModel]]] = {}
+    for atom in atoms:
+        same_signature = candidates.setdefault(atom.signature(), [])
+        group = next((group for group in same_signature if group[0].is_equivalent(atom)), None)
+        if group is None:
+            group = []
+            same_signature.append(group)
+            groups.append(group)
+        group.append(atom)
+    return groups
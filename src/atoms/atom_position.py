@@ -5,12 +5,19 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
+import numpy as np
 from src.atoms.element import Element
 from src.utils.point import Point
+from src.utils.rotation import z_rotation_matrix_degrees
 
 
 class AtomPosition(object):
-    """This is a class that represents the position of an atom in 3D space. It holds the element type and position."""
+    """This is a class that represents the position of an atom in 3D space. It holds the element type and position.
+
+    The coordinates are kept in a small numpy array. When the AtomPosition comes from a MoleculePositions object that
+    array is a view onto a single row of the molecule's coordinate array, so reading or moving the atom reads or moves
+    the molecule's storage directly without any copies.
+    """
 
     def __init__(
         self,
@@ -18,7 +25,15 @@ class AtomPosition(object):
         position: Point
     ) -> None:
         self._element = element
-        self._position = position
+        self._coordinates = np.array([position.x, position.y, position.z], dtype=np.float64)
+
+    @staticmethod
+    def view(element: Element, coordinates: np.ndarray) -> 'AtomPosition':
+        """Create an AtomPosition that shares the given length 3 coordinate array instead of copying it."""
+        atom = AtomPosition.__new__(AtomPosition)
+        atom._element = element
+        atom._coordinates = coordinates
+        return atom
 
     @property
     def element(self) -> Element:
@@ -26,11 +41,15 @@ class AtomPosition(object):
 
     @property
     def position(self) -> Point:
-        return self._position
+        return Point(float(self._coordinates[0]), float(self._coordinates[1]), float(self._coordinates[2]))
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        return self._coordinates
 
     def translate(self, point: Point) -> None:
-        self._position += point
+        self._coordinates += (point.x, point.y, point.z)
 
     def rotate_degrees(self, angle: float) -> None:
-        # TODO: fix for 3D
-        self._position = self._position.rotate_degrees(angle)
+        """Rotate the atom around the z-axis by the given angle in degrees."""
+        self._coordinates[:] = z_rotation_matrix_degrees(angle) @ self._coordinates
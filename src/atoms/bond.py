@@ -5,13 +5,24 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from typing import Optional
+from typing import Final, List, Optional
 from abc import abstractmethod
+from functools import lru_cache
 from solid2 import cube, linear_extrude
 from src.utils.constants import EPS
+from src.utils.resolution import Resolution
+from src.utils.scad_library import scad_module, scad_module_definition, scad_parameter
 from src.utils.snap_joint import SnapJoint
 from src.utils.spherical_cap import spherical_cap
-from src.utils.revolve_text import revolve_text
+from src.utils.revolve_text import revolve_text, revolve_text_module
+
+"""
+Most of the bonds in a molecule have the same shape apart from where they are placed and their label, so the geometry
+of each distinct bond is built once and then shared by every atom that uses it. The solid2 operators never modify their
+operands, so sharing a subtree between many models is safe. This is the number of distinct bond geometries we hold on
+to, the least recently used ones are dropped first.
+"""
+BOND_TEMPLATE_CACHE_SIZE: Final[int] = 512
 
 
 class BondModel:
@@ -21,10 +32,22 @@ class BondModel:
     @abstractmethod
     def model(
         self,
-        label: Optional[str]
+        label: Optional[str],
+        library: bool = False,
+        resolution: Optional[Resolution] = None,
     ):
+        """Returns the space the bond takes up. If library is True the repeated pieces of geometry are calls to the
+        modules of the shared scad library (see bond_scad_modules) instead of being written out in full. The round parts
+        are drawn at the resolution, or with OpenSCAD's defaults if there is none.
+        """
         raise NotImplementedError("The model method must be implemented by the subclass.")
 
+    def has_space(self, label: Optional[str]) -> bool:
+        """Returns False if model() is empty for the label, so there is nothing to subtract for the bond beyond the
+        space of the neighbor itself.
+        """
+        return True
+
 
 class NoBondModel(BondModel):
     """THe NoBondModel class is used to represent a bond that does not exist between two atoms, That is, the two atoms
@@ -35,35 +58,38 @@ class NoBondModel(BondModel):
 
     def model(
         self,
-        label: Optional[str]
+        label: Optional[str],
+        library: bool = False,
+        resolution: Optional[Resolution] = None,
     ):
         """We have to return something, so we return a cube with no size."""
-        return cube(0)
+        return _no_bond_template()
+
+    def has_space(self, label: Optional[str]) -> bool:
+        return False
 
 
 class SingleBondModel(BondModel):
     """The SingleBondModel class is used to represent a single bond between two atoms. This bond is able to rotate in
     space, so we use a snap joint design to connect the two atoms together.
     """
-    def __init__(self):
-        pass
+    def __init__(self, snap: Optional[SnapJoint] = None):
+        self._snap = snap if snap is not None else SnapJoint()
+
+    @property
+    def snap(self) -> SnapJoint:
+        return self._snap
 
     def model(
         self,
-        label: Optional[str]
+        label: Optional[str],
+        library: bool = False,
+        resolution: Optional[Resolution] = None,
     ):
-        """We return the space that the snap joint occupies so that we can subtract it from the atom model."""
-        snap = SnapJoint()
-        receiver = snap.snap_receiver_model().translate(0, 0, -2 * EPS + snap.indent)
-        cap = (
-            spherical_cap(r=snap.clearance / 2 + snap.radius - snap.lip)
-            .translate(0, 0, 4 * (snap.lip - EPS) + snap.indent - EPS))
-        model = receiver + cap
-        if label is not None:
-            model += linear_extrude(1)(
-                revolve_text(1.25 * snap.radius, 4, label + ' ' + label + ' ').mirror(0, 1, 0)
-            ).translate(0, 0, -0.5)
-        return model
+        """We return the space that the snap joint occupies so that we can subtract it from the atom model. The
+        geometry is shared by every bond with the same snap joint and label.
+        """
+        return _single_bond_template(self._snap, label, library, resolution)
 
 
 class FixedBondModel(BondModel):
@@ -73,27 +99,125 @@ class FixedBondModel(BondModel):
 
     def model(
         self,
-        label: Optional[str]
+        label: Optional[str],
+        library: bool = False,
+        resolution: Optional[Resolution] = None,
     ):
-        # TODO: Implement the FixedBondModel and pick an appropriate text radius
-        text_radius = 3.25
-        model = cube(0)
+        return _fixed_bond_template(label, library)
+
+    def has_space(self, label: Optional[str]) -> bool:
+        return label is not None
+
+
+@lru_cache(maxsize=1)
+def _no_bond_template():
+    return cube(0)
+
+
+"""
+The radius the label of a fixed bond is placed around.
+"""
+# TODO: Implement the FixedBondModel and pick an appropriate text radius
+FIXED_BOND_TEXT_RADIUS: Final[float] = 3.25
+
+
+def _snap_cap_radius(snap: SnapJoint):
+    return snap.clearance / 2 + snap.radius - snap.lip
+
+
+def _single_bond_space(snap: SnapJoint, receiver, cap):
+    """Places the snap receiver and the spherical cap above it, which together make the space of a single bond."""
+    return (
+        receiver.translate([0, 0, -2 * EPS + snap.indent])
+        + cap.translate([0, 0, 4 * (snap.lip - EPS) + snap.indent - EPS]))
+
+
+def _bond_label(ring):
+    """Turns the ring of text made by revolve_text into the label that is cut into the face of the atom."""
+    return linear_extrude(1)(ring.mirror(0, 1, 0)).translate(0, 0, -0.5)
+
+
+def _label_message(label: str) -> str:
+    return label + ' ' + label + ' '
+
+
+@lru_cache(maxsize=BOND_TEMPLATE_CACHE_SIZE)
+def _single_bond_template(
+    snap: SnapJoint, label: Optional[str], library: bool = False, resolution: Optional[Resolution] = None,
+):
+    if library:
+        clearance, lip, radius, indent = snap.parameters
+        # The radii are only known inside the modules, so OpenSCAD works out the fragments from $fa and $fs.
+        detail = resolution.scad_parameters(lip) if resolution is not None else {}
+        model = scad_module('single_bond_space', clearance=clearance, lip=lip, radius=radius, indent=indent, **detail)
         if label is not None:
-            model += linear_extrude(1)(
-                revolve_text(1.25 * text_radius, 4, label + ' ' + label + ' ').mirror(0, 1, 0)
-            ).translate(0, 0, -0.5)
+            model += scad_module('bond_label', radius=snap.radius, message=_label_message(label))
         return model
+    model = _single_bond_space(
+        snap,
+        snap.snap_receiver_model(resolution),
+        spherical_cap(r=_snap_cap_radius(snap), resolution=resolution, feature_size=snap.lip))
+    if label is not None:
+        model += _bond_label(revolve_text(1.25 * snap.radius, 4, _label_message(label)))
+    return model
+
 
+@lru_cache(maxsize=BOND_TEMPLATE_CACHE_SIZE)
+def _fixed_bond_template(label: Optional[str], library: bool = False):
+    if label is None:
+        return _no_bond_template()
+    if library:
+        return scad_module('bond_label', radius=FIXED_BOND_TEXT_RADIUS, message=_label_message(label))
+    return _bond_label(revolve_text(1.25 * FIXED_BOND_TEXT_RADIUS, 4, _label_message(label)))
 
-def bond_model_from_order(bond_order: int) -> BondModel:
+
+def bond_scad_modules() -> List[str]:
+    """Returns the definitions of the modules used by the bond models in library mode. Apart from revolve_text, the
+    bodies are built by the same code as the inlined geometry, with the module parameters in place of the numbers:
+
+    - snap_receiver(clearance, lip, radius, indent): SnapJoint.snap_receiver_model()
+    - spherical_cap(r)
+    - single_bond_space(clearance, lip, radius, indent): the space of a SingleBondModel without its label.
+    - revolve_text(radius, font_size, message)
+    - bond_label(radius, message): the label cut into the face of a bond with the given text radius.
+    """
+    snap_names = ['clearance', 'lip', 'radius', 'indent']
+    snap = SnapJoint(*[scad_parameter(name) for name in snap_names])
+    receiver = scad_module('snap_receiver', **{name: scad_parameter(name) for name in snap_names})
+    cap = scad_module('spherical_cap', r=_snap_cap_radius(snap))
+    ring = scad_module(
+        'revolve_text', radius=1.25 * scad_parameter('radius'), font_size=4, message=scad_parameter('message'))
+    return [
+        scad_module_definition('snap_receiver', snap_names, snap.snap_receiver_model()),
+        scad_module_definition('spherical_cap', ['r'], spherical_cap(scad_parameter('r'))),
+        scad_module_definition('single_bond_space', snap_names, _single_bond_space(snap, receiver, cap)),
+        revolve_text_module(),
+        scad_module_definition('bond_label', ['radius', 'message'], _bond_label(ring)),
+    ]
+
+
+@lru_cache(maxsize=BOND_TEMPLATE_CACHE_SIZE)
+def bond_model_from_order(bond_order: int, snap: Optional[SnapJoint] = None) -> BondModel:
     """This function will return the bond model that corresponds to the given bond order. This allows us to easily
-    switch between bond models based on the bond order.
+    switch between bond models based on the bond order. The bond models hold no per bond state, so the same model object
+    is returned for every bond with the same order and snap joint.
     """
     if bond_order == 0:
         return NoBondModel()
     elif bond_order == 1:
-        return SingleBondModel()
+        return SingleBondModel(snap)
     elif bond_order in [2, 3]:
         return FixedBondModel()
     else:
         raise ValueError("The bond order must be between 0 and 3.")
+
+
+def clear_bond_templates() -> None:
+    """Drops all of the cached bond models and geometry, including the rings of label text. The neighbor spaces of
+    atoms hold on to bond geometry too, so use clear_atom_templates in atom_model to reset everything.
+    """
+    bond_model_from_order.cache_clear()
+    _no_bond_template.cache_clear()
+    _single_bond_template.cache_clear()
+    _fixed_bond_template.cache_clear()
+    revolve_text.cache_clear()
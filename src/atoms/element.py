@@ -5,7 +5,9 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
+from typing import Dict, List
 from enum import Enum
+import numpy as np
 from src.utils.constants import pm
 
 
@@ -51,7 +53,12 @@ class ElementProperties:
 
 
 class Element(ElementProperties, Enum):
-    """Defines the specific elements of the periodic table."""
+    """Defines the specific elements of the periodic table.
+
+    The van der Waals radii are the values tabulated by PubChem (Bondi, Mantina et al. and Alvarez) and the single bond
+    radii are the covalent radii of Pyykkö and Atsumi. The van der Waals radii of the super-heavy elements after Lr are
+    not known, so they use the radius of Lr.
+    """
     H = 1, 'H', 120*pm, 'white', 32*pm
     He = 2, 'He', 140*pm, 'cyan', 46*pm
     Li = 3, 'Li', 182*pm, 'violet', 133*pm
@@ -72,11 +79,154 @@ class Element(ElementProperties, Enum):
     Ar = 18, 'Ar', 188*pm, 'cyan', 96*pm
     K = 19, 'K', 275*pm, 'violet', 196*pm
     Ca = 20, 'Ca', 231*pm, 'darkgreen', 171*pm
+    Sc = 21, 'Sc', 211*pm, 'pink', 148*pm
+    Ti = 22, 'Ti', 187*pm, 'gray', 136*pm
+    V = 23, 'V', 179*pm, 'pink', 134*pm
+    Cr = 24, 'Cr', 189*pm, 'pink', 122*pm
+    Mn = 25, 'Mn', 197*pm, 'pink', 119*pm
+    Fe = 26, 'Fe', 194*pm, 'darkorange', 116*pm
+    Co = 27, 'Co', 192*pm, 'pink', 111*pm
+    Ni = 28, 'Ni', 163*pm, 'pink', 110*pm
+    Cu = 29, 'Cu', 140*pm, 'pink', 112*pm
+    Zn = 30, 'Zn', 139*pm, 'pink', 118*pm
+    Ga = 31, 'Ga', 187*pm, 'pink', 124*pm
+    Ge = 32, 'Ge', 211*pm, 'pink', 121*pm
+    As = 33, 'As', 185*pm, 'pink', 121*pm
+    Se = 34, 'Se', 190*pm, 'pink', 116*pm
+    Br = 35, 'Br', 185*pm, 'darkred', 114*pm
+    Kr = 36, 'Kr', 202*pm, 'cyan', 117*pm
+    Rb = 37, 'Rb', 303*pm, 'violet', 210*pm
+    Sr = 38, 'Sr', 249*pm, 'darkgreen', 185*pm
+    Y = 39, 'Y', 219*pm, 'pink', 163*pm
+    Zr = 40, 'Zr', 186*pm, 'pink', 154*pm
+    Nb = 41, 'Nb', 207*pm, 'pink', 147*pm
+    Mo = 42, 'Mo', 209*pm, 'pink', 138*pm
+    Tc = 43, 'Tc', 209*pm, 'pink', 128*pm
+    Ru = 44, 'Ru', 207*pm, 'pink', 125*pm
+    Rh = 45, 'Rh', 195*pm, 'pink', 125*pm
+    Pd = 46, 'Pd', 202*pm, 'pink', 120*pm
+    Ag = 47, 'Ag', 172*pm, 'pink', 128*pm
+    Cd = 48, 'Cd', 158*pm, 'pink', 136*pm
+    In = 49, 'In', 193*pm, 'pink', 142*pm
+    Sn = 50, 'Sn', 217*pm, 'pink', 140*pm
+    Sb = 51, 'Sb', 206*pm, 'pink', 140*pm
+    Te = 52, 'Te', 206*pm, 'pink', 136*pm
+    I = 53, 'I', 198*pm, 'darkviolet', 133*pm  # noqa: E741
+    Xe = 54, 'Xe', 216*pm, 'cyan', 131*pm
+    Cs = 55, 'Cs', 343*pm, 'violet', 232*pm
+    Ba = 56, 'Ba', 268*pm, 'darkgreen', 196*pm
+    La = 57, 'La', 240*pm, 'pink', 180*pm
+    Ce = 58, 'Ce', 235*pm, 'pink', 163*pm
+    Pr = 59, 'Pr', 239*pm, 'pink', 176*pm
+    Nd = 60, 'Nd', 229*pm, 'pink', 174*pm
+    Pm = 61, 'Pm', 236*pm, 'pink', 173*pm
+    Sm = 62, 'Sm', 229*pm, 'pink', 172*pm
+    Eu = 63, 'Eu', 233*pm, 'pink', 168*pm
+    Gd = 64, 'Gd', 237*pm, 'pink', 169*pm
+    Tb = 65, 'Tb', 221*pm, 'pink', 168*pm
+    Dy = 66, 'Dy', 229*pm, 'pink', 167*pm
+    Ho = 67, 'Ho', 216*pm, 'pink', 166*pm
+    Er = 68, 'Er', 235*pm, 'pink', 165*pm
+    Tm = 69, 'Tm', 227*pm, 'pink', 164*pm
+    Yb = 70, 'Yb', 242*pm, 'pink', 170*pm
+    Lu = 71, 'Lu', 221*pm, 'pink', 162*pm
+    Hf = 72, 'Hf', 212*pm, 'pink', 152*pm
+    Ta = 73, 'Ta', 217*pm, 'pink', 146*pm
+    W = 74, 'W', 210*pm, 'pink', 137*pm
+    Re = 75, 'Re', 217*pm, 'pink', 131*pm
+    Os = 76, 'Os', 216*pm, 'pink', 129*pm
+    Ir = 77, 'Ir', 202*pm, 'pink', 122*pm
+    Pt = 78, 'Pt', 209*pm, 'pink', 123*pm
+    Au = 79, 'Au', 166*pm, 'pink', 124*pm
+    Hg = 80, 'Hg', 209*pm, 'pink', 133*pm
+    Tl = 81, 'Tl', 196*pm, 'pink', 144*pm
+    Pb = 82, 'Pb', 202*pm, 'pink', 144*pm
+    Bi = 83, 'Bi', 207*pm, 'pink', 151*pm
+    Po = 84, 'Po', 197*pm, 'pink', 145*pm
+    At = 85, 'At', 202*pm, 'pink', 147*pm
+    Rn = 86, 'Rn', 220*pm, 'cyan', 142*pm
+    Fr = 87, 'Fr', 348*pm, 'violet', 223*pm
+    Ra = 88, 'Ra', 283*pm, 'darkgreen', 201*pm
+    Ac = 89, 'Ac', 260*pm, 'pink', 186*pm
+    Th = 90, 'Th', 237*pm, 'pink', 175*pm
+    Pa = 91, 'Pa', 243*pm, 'pink', 169*pm
+    U = 92, 'U', 240*pm, 'pink', 170*pm
+    Np = 93, 'Np', 221*pm, 'pink', 171*pm
+    Pu = 94, 'Pu', 243*pm, 'pink', 172*pm
+    Am = 95, 'Am', 244*pm, 'pink', 166*pm
+    Cm = 96, 'Cm', 245*pm, 'pink', 166*pm
+    Bk = 97, 'Bk', 244*pm, 'pink', 168*pm
+    Cf = 98, 'Cf', 245*pm, 'pink', 168*pm
+    Es = 99, 'Es', 245*pm, 'pink', 165*pm
+    Fm = 100, 'Fm', 245*pm, 'pink', 167*pm
+    Md = 101, 'Md', 246*pm, 'pink', 173*pm
+    No = 102, 'No', 246*pm, 'pink', 176*pm
+    Lr = 103, 'Lr', 246*pm, 'pink', 161*pm
+    Rf = 104, 'Rf', 246*pm, 'pink', 157*pm
+    Db = 105, 'Db', 246*pm, 'pink', 149*pm
+    Sg = 106, 'Sg', 246*pm, 'pink', 143*pm
+    Bh = 107, 'Bh', 246*pm, 'pink', 141*pm
+    Hs = 108, 'Hs', 246*pm, 'pink', 134*pm
+    Mt = 109, 'Mt', 246*pm, 'pink', 129*pm
+    Ds = 110, 'Ds', 246*pm, 'pink', 128*pm
+    Rg = 111, 'Rg', 246*pm, 'pink', 121*pm
+    Cn = 112, 'Cn', 246*pm, 'pink', 122*pm
+    Nh = 113, 'Nh', 246*pm, 'pink', 136*pm
+    Fl = 114, 'Fl', 246*pm, 'pink', 143*pm
+    Mc = 115, 'Mc', 246*pm, 'pink', 162*pm
+    Lv = 116, 'Lv', 246*pm, 'pink', 175*pm
+    Ts = 117, 'Ts', 246*pm, 'pink', 165*pm
+    Og = 118, 'Og', 246*pm, 'pink', 157*pm
 
     @staticmethod
     def from_atomic_number(atomic: int) -> 'Element':
         """Return the element with the given atomic number."""
-        for element in Element:
-            if element.atomic_number == atomic:
-                return element
+        if 0 < atomic < len(_ELEMENTS_BY_NUMBER):
+            return _ELEMENTS_BY_NUMBER[atomic]
         raise ValueError('No element with atomic number {}'.format(atomic))
+
+    @staticmethod
+    def from_atomic_numbers(atomic_numbers: np.ndarray) -> List['Element']:
+        """Return the elements with the given atomic numbers."""
+        numbers = np.asarray(atomic_numbers, dtype=np.int64)
+        if len(numbers) > 0 and (numbers.min() < 1 or numbers.max() >= len(_ELEMENTS_BY_NUMBER)):
+            bad = numbers[(numbers < 1) | (numbers >= len(_ELEMENTS_BY_NUMBER))][0]
+            raise ValueError('No element with atomic number {}'.format(bad))
+        return [_ELEMENTS_BY_NUMBER[number] for number in numbers.tolist()]
+
+    @staticmethod
+    def from_symbol(symbol: str) -> 'Element':
+        """Return the element with the given symbol, e.g. 'He'. The case of the symbol is ignored."""
+        element = _ELEMENTS_BY_SYMBOL.get(symbol.lower())
+        if element is None:
+            raise ValueError('No element with symbol {}'.format(symbol))
+        return element
+
+    @staticmethod
+    def van_der_waals_radii(atomic_numbers: np.ndarray) -> np.ndarray:
+        """Return the van der Waals radius of each of the given atomic numbers."""
+        return VAN_DER_WAALS_RADII[atomic_numbers]
+
+    @staticmethod
+    def single_bond_radii(atomic_numbers: np.ndarray) -> np.ndarray:
+        """Return the single bond (covalent) radius of each of the given atomic numbers."""
+        return SINGLE_BOND_RADII[atomic_numbers]
+
+    @staticmethod
+    def cpk_colors(atomic_numbers: np.ndarray) -> np.ndarray:
+        """Return the CPK color name of each of the given atomic numbers."""
+        return CPK_COLORS[atomic_numbers]
+
+
+"""
+The elements, and their properties, as dense arrays indexed by atomic number, so that looking up an element is a single
+index and looking up a property for many atoms at once is a single vectorized operation. Index 0 is not an element, so
+it holds a placeholder (nan for the radii).
+"""
+_ELEMENTS_BY_NUMBER: List[Element] = [Element.H] + sorted(Element, key=lambda element: element.atomic_number)
+_ELEMENTS_BY_SYMBOL: Dict[str, Element] = {element.symbol.lower(): element for element in Element}
+VAN_DER_WAALS_RADII: np.ndarray = np.array(
+    [np.nan] + [element.van_der_waals_radius for element in _ELEMENTS_BY_NUMBER[1:]])
+SINGLE_BOND_RADII: np.ndarray = np.array(
+    [np.nan] + [element.single_bond_radius for element in _ELEMENTS_BY_NUMBER[1:]])
+CPK_COLORS: np.ndarray = np.array([''] + [element.cpk_color for element in _ELEMENTS_BY_NUMBER[1:]], dtype=object)
@@ -6,10 +6,14 @@
 #
 
 import unittest
-from src.atoms.atom_model import AtomModelBuilder
+import numpy as np
+from src.atoms.atom_model import (
+    AtomModel, AtomModelBuilder, atom_scad_library, clear_atom_templates, group_equivalent_atoms)
 from src.atoms.element import Element
 from src.atoms.neighbor import Neighbor
 from src.utils.constants import pm
+from src.utils.point_array import PointArray
+from src.utils.rotation import axis_angle_matrix_degrees
 
 
 class TestAtomModel(unittest.TestCase):
@@ -19,3 +23,98 @@ class TestAtomModel(unittest.TestCase):
         model = builder.build()
         model.model()
         self.assertTrue(True)
+
+    def test_library_model(self):
+        builder = AtomModelBuilder(Element.Na)
+        builder.add_bond(Element.Cl, 238.6*pm, Neighbor.Direction(45.0, 45.0), 1, 'x')
+        model = builder.build()
+        scad = model.model(library=True).as_scad()
+        self.assertIn('neighbor_space(radius = ', scad)
+        self.assertIn('single_bond_space(', scad)
+        self.assertNotIn('polygon', scad)
+        self.assertNotEqual(scad, model.model().as_scad())
+        library = atom_scad_library()
+        self.assertIn('module neighbor_space(radius) {', library)
+        self.assertIn('module single_bond_space(clearance, lip, radius, indent) {', library)
+
+    def test_clear_templates(self):
+        builder = AtomModelBuilder(Element.O)
+        builder.add_bond(Element.H, 95.84*pm, Neighbor.Direction(0.0, 0.0), 1, 'a')
+        atom = builder.build()
+        scad = atom.model().as_scad()
+        space = atom.model()._children[0]._children[1]._children[0]
+        clear_atom_templates()
+        self.assertIsNot(space, atom.model()._children[0]._children[1]._children[0])
+        self.assertEqual(scad, atom.model().as_scad())
+
+    def test_flat_model(self):
+        builder = AtomModelBuilder(Element.C)
+        builder.add_bond(Element.H, 100*pm, Neighbor.Direction(0.0, 0.0), 1)
+        builder.add_bond(Element.O, 120*pm, Neighbor.Direction(20.0, 120.0), 2)
+        builder.add_neighbor(Element.N, 250*pm, Neighbor.Direction(-30.0, -120.0))
+        atom = builder.build()
+        for model in [atom.model(), atom.print()]:
+            # The color holds one difference of the sphere and each neighbor space, each under a single multmatrix.
+            difference = model._children[0]
+            self.assertEqual('difference', difference._name)
+            self.assertEqual(1 + len(atom.cut_neighbors()), len(difference._children))
+            self.assertTrue(all(child._name == 'multmatrix' for child in difference._children[1:]))
+            self.assertNotIn('rotate(a = [0', model.as_scad())
+
+        # print() puts the center of the face it prints from on the origin, with the atom above it.
+        base = atom.print_neighbor()
+        vector = atom.neighbor_vectors()[atom.neighbors.index(base)]
+        matrix = atom.print_matrix()
+        np.testing.assert_allclose([0, 0, 0], matrix[:3, :3] @ (atom.interface_distance(base) * vector) + matrix[:3, 3],
+                                   atol=1e-12)
+        np.testing.assert_allclose([0, 0, -1], matrix[:3, :3] @ vector, atol=1e-12)
+
+    def test_cut_neighbors(self):
+        bonded = Neighbor(Element.Cl, 238.6*pm, Neighbor.Direction(0.0, 0.0), 1)
+        # Further along the same direction, so everything it cuts off is already cut off by the bond.
+        behind = Neighbor(Element.Cl, 300.0*pm, Neighbor.Direction(5.0, 0.0), 0)
+        opposite = Neighbor(Element.Cl, 300.0*pm, Neighbor.Direction(0.0, 180.0), 0)
+        # Too far away to touch the atom at all.
+        distant = Neighbor(Element.Cl, 600.0*pm, Neighbor.Direction(0.0, 90.0), 0)
+        atom = AtomModel(Element.Na, [behind, bonded, opposite, distant])
+        self.assertEqual([bonded, opposite], atom.cut_neighbors())
+        self.assertEqual(
+            AtomModel(Element.Na, [bonded, opposite]).model().as_scad(), atom.model().as_scad())
+        # A bond is never dropped, even when another neighbor covers its face, since its space is cut below the face.
+        front = Neighbor(Element.Cl, 200.0*pm, Neighbor.Direction(0.0, 0.0), 0)
+        self.assertEqual([front, bonded], AtomModel(Element.Na, [front, bonded]).cut_neighbors())
+        self.assertNotIn('cube(size = 0', atom.model().as_scad())
+
+    @staticmethod
+    def carbon(directions):
+        builder = AtomModelBuilder(Element.C)
+        for element, (inclination, azimuthal) in zip([Element.H, Element.N, Element.O], directions):
+            builder.add_bond(element, 100*pm, Neighbor.Direction(inclination, azimuthal), 1)
+        return builder.build()
+
+    @staticmethod
+    def rotate_directions(directions, matrix):
+        vectors = PointArray(np.array([
+            (np.cos(np.radians(inclination)) * np.cos(np.radians(azimuthal)),
+             np.cos(np.radians(inclination)) * np.sin(np.radians(azimuthal)),
+             np.sin(np.radians(inclination)))
+            for inclination, azimuthal in directions])).rotate_matrix(matrix)
+        return list(zip(vectors.get_inclination_angles().tolist(), vectors.get_azimuthal_angles().tolist()))
+
+    def test_equivalent_atoms(self):
+        directions = [(0.0, 0.0), (0.0, 100.0), (30.0, -120.0)]
+        atom = self.carbon(directions)
+        rotated = self.carbon(self.rotate_directions(directions, axis_angle_matrix_degrees((1.0, 2.0, 3.0), 70.0)))
+        mirrored = self.carbon([(0.0, 0.0), (0.0, -100.0), (30.0, 120.0)])
+        moved = self.carbon([(0.0, 0.0), (0.0, 101.0), (30.0, -120.0)])
+
+        self.assertEqual(atom.signature(), rotated.signature())
+        self.assertTrue(atom.is_equivalent(rotated))
+        self.assertTrue(atom.is_equivalent(atom.clone()))
+        # A mirror image has the same angles between its neighbors, but it can not be rotated onto the atom.
+        self.assertEqual(atom.signature(), mirrored.signature())
+        self.assertFalse(atom.is_equivalent(mirrored))
+        self.assertNotEqual(atom.signature(), moved.signature())
+        self.assertFalse(atom.is_equivalent(moved))
+        self.assertEqual(
+            [[atom, rotated], [mirrored], [moved]], group_equivalent_atoms([atom, mirrored, rotated, moved]))
@@ -0,0 +1,70 @@
+#
+# test_bond.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from src.atoms.bond import (
+    NoBondModel, SingleBondModel, FixedBondModel, bond_model_from_order, bond_scad_modules, clear_bond_templates)
+from src.utils.snap_joint import SnapJoint
+
+
+class TestBond(unittest.TestCase):
+
+    def test_bond_model_from_order(self):
+        self.assertIsInstance(bond_model_from_order(0), NoBondModel)
+        self.assertIsInstance(bond_model_from_order(1), SingleBondModel)
+        self.assertIsInstance(bond_model_from_order(2), FixedBondModel)
+        self.assertIsInstance(bond_model_from_order(3), FixedBondModel)
+        self.assertIs(bond_model_from_order(1), bond_model_from_order(1))
+        with self.assertRaises(ValueError):
+            bond_model_from_order(4)
+
+    def test_templates_are_shared(self):
+        single = SingleBondModel()
+        self.assertIs(single.model('a'), single.model('a'))
+        self.assertIs(single.model('a'), SingleBondModel(SnapJoint()).model('a'))
+        self.assertIsNot(single.model('a'), single.model('b'))
+        self.assertIsNot(single.model('a'), SingleBondModel(SnapJoint(radius=4)).model('a'))
+        self.assertEqual(single.model('a').as_scad(), single.model('a').as_scad())
+        self.assertIs(FixedBondModel().model(None), FixedBondModel().model(None))
+
+    def test_has_space(self):
+        self.assertFalse(NoBondModel().has_space('a'))
+        self.assertTrue(SingleBondModel().has_space(None))
+        self.assertFalse(FixedBondModel().has_space(None))
+        self.assertTrue(FixedBondModel().has_space('a'))
+        self.assertNotIn('cube(size = 0', FixedBondModel().model('a').as_scad())
+
+    def test_clear_templates(self):
+        model = SingleBondModel().model('a')
+        clear_bond_templates()
+        self.assertIsNot(model, SingleBondModel().model('a'))
+        self.assertEqual(model.as_scad(), SingleBondModel().model('a').as_scad())
+        bond = bond_model_from_order(1)
+        clear_bond_templates()
+        self.assertIsNot(bond, bond_model_from_order(1))
+
+    def test_snap_joint_equality(self):
+        self.assertEqual(SnapJoint(), SnapJoint())
+        self.assertEqual(hash(SnapJoint()), hash(SnapJoint()))
+        self.assertNotEqual(SnapJoint(), SnapJoint(clearance=0.3))
+
+    def test_library_model(self):
+        scad = SingleBondModel().model('a', library=True).as_scad()
+        self.assertIn('single_bond_space(clearance = 0.5, indent = 0.5, lip = 0.75, radius = 3.25);', scad)
+        self.assertIn('bond_label(message = "a a ", radius = 3.25);', scad)
+        self.assertNotIn('polygon', scad)
+        self.assertNotIn('bond_label', SingleBondModel().model(None, library=True).as_scad())
+        self.assertIn('bond_label', FixedBondModel().model('b', library=True).as_scad())
+
+    def test_bond_scad_modules(self):
+        library = '\n'.join(bond_scad_modules())
+        for module in ['snap_receiver', 'spherical_cap', 'single_bond_space', 'revolve_text', 'bond_label']:
+            self.assertIn('module {}('.format(module), library)
+        # The module bodies are built from the same code as the inlined geometry, with the parameters left symbolic.
+        self.assertIn('r = ((radius + (clearance / 2)) + lip)', library)
+        self.assertIn('square(size = [1, indent]);', library)
+        self.assertEqual(library.count('{'), library.count('}'))
@@ -6,7 +6,9 @@
 #
 
 import unittest
+import numpy as np
 from src.atoms.element import Element
+from src.utils.constants import pm
 
 
 class TestElement(unittest.TestCase):
@@ -15,3 +17,31 @@ class TestElement(unittest.TestCase):
         elm = Element.from_atomic_number(1)
         self.assertEqual(1, elm.atomic_number)
         self.assertEqual('H', elm.symbol)
+
+    def test_from_symbol(self):
+        self.assertEqual(Element.He, Element.from_symbol('He'))
+        self.assertEqual(Element.Cl, Element.from_symbol('CL'))
+        with self.assertRaises(ValueError):
+            Element.from_symbol('Xx')
+
+    def test_full_table(self):
+        self.assertEqual(118, len(Element))
+        for number in range(1, 119):
+            self.assertEqual(number, Element.from_atomic_number(number).atomic_number)
+        self.assertEqual(Element.Fe, Element.from_atomic_number(26))
+        self.assertEqual(Element.Og, Element.from_symbol('og'))
+        with self.assertRaises(ValueError):
+            Element.from_atomic_number(0)
+        with self.assertRaises(ValueError):
+            Element.from_atomic_number(119)
+
+    def test_vectorized_lookups(self):
+        numbers = np.array([1, 6, 26, 6])
+        self.assertEqual([Element.H, Element.C, Element.Fe, Element.C], Element.from_atomic_numbers(numbers))
+        np.testing.assert_array_equal(
+            [element.van_der_waals_radius for element in Element.from_atomic_numbers(numbers)],
+            Element.van_der_waals_radii(numbers))
+        np.testing.assert_array_equal([32 * pm, 75 * pm], Element.single_bond_radii(np.array([1, 6])))
+        self.assertEqual(['white', 'darkorange'], Element.cpk_colors(np.array([1, 26])).tolist())
+        with self.assertRaises(ValueError):
+            Element.from_atomic_numbers(np.array([1, 200]))
@@ -5,12 +5,12 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from typing import List, Optional
+from typing import List, Optional, Union
 from src.atoms.atom_position import AtomPosition
+from src.molecules.bond_topology import BondTopology
 from src.molecules.molecule_positions import MoleculePositions
 from pathlib import Path
-import json
-from src.molecules.molecule_position_utils import molecule_position_from_pubchem
+from src.molecules.molecule_position_cache import molecule_position_from_pubchem_file
 import numpy as np
 
 
@@ -25,7 +25,7 @@ class AdeninePositions(MoleculePositions):
     def __init__(
         self,
         atoms: List[AtomPosition],
-        bond_orders: np.ndarray,
+        bond_orders: Union[np.ndarray, BondTopology],
         labels: Optional[List[str]] = None
     ) -> None:
         """Construct the AdeninePositions object with the given atom positions. This generally should not be used
@@ -34,21 +34,20 @@ class AdeninePositions(MoleculePositions):
         super().__init__(atoms, bond_orders, labels)
 
     @staticmethod
-    def create_from_pubchem() -> 'AdeninePositions':
+    def create_from_pubchem(cache_directory: Optional[Union[str, Path]] = None) -> 'AdeninePositions':
         """This function will create an AdeninePositions object from the PubChem Conformer data located in the data
-        directory. It will return the object with the atom positions set.
+        directory. It will return the object with the atom positions set. The parsed data is cached in
+        cache_directory, see molecule_position_from_pubchem_file.
         """
         path = Path(__file__).resolve().parent.parent / 'data/pubchem/adenine.json'
-        with open(path) as f:
-            parsed_json = json.load(f)
-        positions = molecule_position_from_pubchem(parsed_json)
+        positions = molecule_position_from_pubchem_file(path, cache_directory)
         # The order of the atoms from PubChem is as follows:
         # [N7, N9, N3, N1, N6, C5, C4, C6, C8, C2, H9, H8, H2, H6_1, H6_2]
         # We know that even though order 1 bonds are present, we remap them to order 2 bonds because they are actually
         # rigid.
-        bond_orders = positions.bond_orders
+        bond_orders = positions.bonds.orders
         bond_orders[bond_orders == 1] = 2
         # We label the atoms to make it easier to assemble
         labels = ['N7', 'N9', 'N3', 'N1', 'N6', 'C5', 'C4', 'C6', 'C8', 'C2', 'H9', 'H8', 'H2', 'H6', 'H6']
 
-        return AdeninePositions(positions.atoms, bond_orders, labels)
+        return AdeninePositions.from_arrays(positions.elements, positions.coordinates, positions.bonds, labels)
@@ -10,14 +10,15 @@ from src.examples.adenine import AdeninePositions
 from src.atoms.element import Element
 from src.molecules.molecule_representation import MoleculeRepresentation
 from src.molecules.molecule_model_utils import molecule_model_from_positions
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 
 
 class TestAdeninePositions(unittest.TestCase):
 
     def test_works(self):
         """We test to make sure the adenine molecule can be represented and model files generated."""
-        adenine = AdeninePositions.create_from_pubchem()
+        with TemporaryDirectory() as cache_directory:
+            adenine = AdeninePositions.create_from_pubchem(cache_directory)
 
         # We expect to have 15 atoms in the adenine molecule.
         self.assertEqual(15, len(adenine.atoms))
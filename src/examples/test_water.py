@@ -8,7 +8,7 @@
 import unittest
 from src.molecules.molecule_representation import MoleculeRepresentation
 from src.examples.water import WaterPositions
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 from src.molecules.molecule_model_utils import molecule_model_from_positions
 
 
@@ -16,7 +16,8 @@ class TestWaterModel(unittest.TestCase):
 
     def test_works(self):
         """We test to make sure the water molecule can be represented and model files generated."""
-        positions = WaterPositions.create_from_pubchem()
+        with TemporaryDirectory() as cache_directory:
+            positions = WaterPositions.create_from_pubchem(cache_directory)
 
         # We expect to have 3 atoms in the adenine molecule.
         self.assertEqual(3, len(positions.atoms))
@@ -5,12 +5,12 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from typing import List, Optional
+from typing import List, Optional, Union
 from src.atoms.atom_position import AtomPosition
+from src.molecules.bond_topology import BondTopology
 from src.molecules.molecule_positions import MoleculePositions
 from pathlib import Path
-import json
-from src.molecules.molecule_position_utils import molecule_position_from_pubchem
+from src.molecules.molecule_position_cache import molecule_position_from_pubchem_file
 import numpy as np
 
 
@@ -20,19 +20,18 @@ class WaterPositions(MoleculePositions):
     def __init__(
         self,
         atoms: List[AtomPosition],
-        bond_orders: np.ndarray,
+        bond_orders: Union[np.ndarray, BondTopology],
         labels: Optional[List[str]] = None
     ) -> None:
         super().__init__(atoms, bond_orders, labels)
 
     @staticmethod
-    def create_from_pubchem() -> 'WaterPositions':
+    def create_from_pubchem(cache_directory: Optional[Union[str, Path]] = None) -> 'WaterPositions':
         """This function will create a WaterPositions object from the PubChem Conformer data located in the data
-        directory. It will return the object with the atom positions set.
+        directory. It will return the object with the atom positions set. The parsed data is cached in
+        cache_directory, see molecule_position_from_pubchem_file.
         """
         path = Path(__file__).resolve().parent.parent / 'data/pubchem/water.json'
-        with open(path) as f:
-            parsed_json = json.load(f)
-        positions = molecule_position_from_pubchem(parsed_json)
+        positions = molecule_position_from_pubchem_file(path, cache_directory)
 
-        return WaterPositions(positions.atoms, positions.bond_orders)
+        return WaterPositions.from_arrays(positions.elements, positions.coordinates, positions.bonds)
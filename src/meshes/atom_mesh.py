@@ -0,0 +1,363 @@
+#
+# atom_mesh.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Dict, Final, List, Optional, Tuple
+from math import pi
+import numpy as np
+from src.atoms.atom_model import AtomModel
+from src.atoms.bond import SingleBondModel, bond_model_from_order
+from src.meshes.mesh import Mesh, uv_sphere
+from src.utils.packing import convex_hull
+from src.utils.resolution import Resolution
+from src.utils.echeck import echeck
+from src.utils.snap_joint import SnapJoint
+
+"""
+The number of segments around the sphere and around each snap receiver when no number is given.
+"""
+DEFAULT_SEGMENTS: Final[int] = 64
+
+"""
+How much room we insist on between a snap receiver and any other surface of the atom, in mm.
+"""
+RECEIVER_MARGIN: Final[float] = 0.1
+
+
+def snap_receiver_profile(snap: SnapJoint, segments: int = DEFAULT_SEGMENTS) -> np.ndarray:
+    """Returns the outline of the space a SingleBondModel removes below the face of the atom (the snap receiver and
+    the spherical cap above it) as a K x 2 array of (radius, depth) pairs. It starts on the rim of the opening in the
+    face (depth 0) and ends on the axis at the top of the cap, so revolving it around the axis gives the surface of the
+    space. The small overlaps the OpenSCAD model needs (EPS) are left out.
+    """
+    a = snap.radius + snap.clearance / 2
+    lip = snap.lip
+    indent = snap.indent
+    # The cylinder of radius a + lip less the ring of material that holds the snap ring, see
+    # SnapJoint.snap_receiver_model().
+    profile = [
+        (a, 0.0),
+        (a, indent),
+        (a + lip, indent + lip),
+        (a + lip, indent + 2 * lip),
+        (a - lip, indent + 4 * lip),
+    ]
+    # The spherical cap sits on the top of the receiver and has the same radius as it.
+    cap_radius = a - lip
+    steps = max(2, segments // 4)
+    for angle in np.linspace(0, pi / 2, steps + 1)[1:].tolist():
+        profile.append((cap_radius * np.cos(angle), indent + 4 * lip + cap_radius * np.sin(angle)))
+    profile[-1] = (0.0, profile[-1][1])
+    return np.array(profile)
+
+
+class _Cut(object):
+    """The space removed for one neighbor: everything further than distance along the unit vector direction, and
+    possibly a snap receiver below that face.
+    """
+
+    def __init__(self, direction: np.ndarray, distance: float, profile: Optional[np.ndarray]):
+        self.direction = direction
+        self.distance = distance
+        self.profile = profile
+        # Two unit vectors that, with the direction, make a right handed frame.
+        helper = np.array([1.0, 0.0, 0.0]) if abs(direction[0]) < 0.9 else np.array([0.0, 1.0, 0.0])
+        self.e1 = np.cross(direction, helper)
+        self.e1 /= np.linalg.norm(self.e1)
+        self.e2 = np.cross(direction, self.e1)
+        self.center = distance * direction
+
+
+class _MeshBuilder(object):
+    """Clips a closed convex triangle mesh by planes one at a time, capping the hole each plane leaves, so the mesh is
+    closed after every step. Edge intersections are shared between the faces on either side of the edge, so no cracks
+    can open up between them.
+    """
+
+    def __init__(self, vertices: np.ndarray, triangles: np.ndarray):
+        self.vertices = vertices
+        # Faces that have not been touched by any plane are kept as a block of triangles, the rest as polygons.
+        self.triangles = triangles
+        self.polygons: List[List[int]] = []
+        self.caps: Dict[int, List[int]] = {}
+
+    def clip(self, cut_index: int, normal: np.ndarray, distance: float) -> None:
+        distances = self.vertices @ normal - distance
+        inside = distances <= 0
+        kept = inside[self.triangles]
+        straddle = np.any(kept, axis=1) & ~np.all(kept, axis=1)
+        self.polygons.extend(self.triangles[straddle].tolist())
+        self.triangles = self.triangles[np.all(kept, axis=1)]
+
+        new_vertices: List[np.ndarray] = []
+        crossings: Dict[Tuple[int, int], int] = {}
+
+        def crossing(a: int, b: int) -> int:
+            # Computed from the edge in a fixed order so both faces of the edge get the very same vertex.
+            low, high = min(a, b), max(a, b)
+            if (low, high) not in crossings:
+                t = distances[low] / (distances[low] - distances[high])
+                new_vertices.append(self.vertices[low] + t * (self.vertices[high] - self.vertices[low]))
+                crossings[(low, high)] = len(self.vertices) + len(new_vertices) - 1
+            return crossings[(low, high)]
+
+        # Each clipped polygon leaves the plane at one crossing and comes back at another. The cap goes along that
+        # edge the other way, so we record it to chain the edges into the outline of the cap.
+        cap_edges: Dict[int, int] = {}
+        polygons = []
+        old_caps = {id(polygon): index for index, polygon in self.caps.items()}
+        caps: Dict[int, List[int]] = {}
+        for polygon in self.polygons:
+            if all(inside[vertex] for vertex in polygon):
+                clipped = polygon
+            elif not any(inside[vertex] for vertex in polygon):
+                continue
+            else:
+                clipped = []
+                exit_vertex = entry_vertex = -1
+                for i, a in enumerate(polygon):
+                    b = polygon[(i + 1) % len(polygon)]
+                    if inside[a]:
+                        clipped.append(a)
+                    if inside[a] and not inside[b]:
+                        exit_vertex = crossing(a, b)
+                        clipped.append(exit_vertex)
+                    elif not inside[a] and inside[b]:
+                        entry_vertex = crossing(a, b)
+                        clipped.append(entry_vertex)
+                cap_edges[entry_vertex] = exit_vertex
+            polygons.append(clipped)
+            if id(polygon) in old_caps:
+                caps[old_caps[id(polygon)]] = clipped
+
+        if len(cap_edges) > 0:
+            start = next(iter(cap_edges))
+            cap = [start]
+            while cap_edges[cap[-1]] != start:
+                cap.append(cap_edges[cap[-1]])
+                echeck(len(cap) <= len(cap_edges), 'The outline of a cut is not a single loop.')
+            echeck(len(cap) == len(cap_edges), 'The outline of a cut is not a single loop.')
+            polygons.append(cap)
+            caps[cut_index] = cap
+        self.polygons = polygons
+        self.caps = caps
+        if len(new_vertices) > 0:
+            self.vertices = np.concatenate((self.vertices, np.array(new_vertices)))
+
+    def faces(self, skip: List[List[int]]) -> List[np.ndarray]:
+        """Triangulates the polygons, which are all convex, as fans. The polygons in skip are left out."""
+        skipped = set(id(polygon) for polygon in skip)
+        fans = [
+            [[polygon[0], polygon[i], polygon[i + 1]] for i in range(1, len(polygon) - 1)]
+            for polygon in self.polygons if id(polygon) not in skipped]
+        return [self.triangles] + [np.array(fan, dtype=np.int64).reshape(-1, 3) for fan in fans]
+
+
+def _zip_rings(outer: np.ndarray, inner: np.ndarray, outer_angles: np.ndarray, inner_angles: np.ndarray) -> np.ndarray:
+    """Triangulates the band between two loops that both go counter-clockwise around a common center, given the angle
+    of each of their vertices around that center.
+    """
+    start = int(np.argmin(outer_angles))
+    outer = np.roll(outer, -start)
+    outer_angles = np.unwrap(np.roll(outer_angles, -start))
+    first = int(np.argmin(np.mod(inner_angles - outer_angles[0], 2 * pi)))
+    inner = np.roll(inner, -first)
+    inner_angles = outer_angles[0] + np.mod(np.roll(inner_angles, -first) - outer_angles[0], 2 * pi)
+    inner_angles = np.unwrap(inner_angles)
+    # Close both loops by repeating their first vertex one turn later.
+    outer = np.append(outer, outer[0])
+    outer_angles = np.append(outer_angles, outer_angles[0] + 2 * pi)
+    inner = np.append(inner, inner[0])
+    inner_angles = np.append(inner_angles, inner_angles[0] + 2 * pi)
+
+    faces = []
+    i = j = 0
+    while i < len(outer) - 1 or j < len(inner) - 1:
+        if j == len(inner) - 1 or (i < len(outer) - 1 and outer_angles[i + 1] <= inner_angles[j + 1]):
+            faces.append((outer[i], outer[i + 1], inner[j]))
+            i += 1
+        else:
+            faces.append((inner[j], outer[i], inner[j + 1]))
+            j += 1
+    return np.array(faces, dtype=np.int64)
+
+
+def _revolve(profile: np.ndarray, cut: _Cut, segments: int, first_vertex: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Revolves the profile (see snap_receiver_profile) around the axis of the cut, going into the atom from its face.
+    The last point of the profile must be on the axis. Returns the vertices, starting with the ring at the rim of the
+    opening, and the faces, which face the axis.
+    """
+    angles = np.linspace(0, 2 * pi, segments, endpoint=False)
+    around = np.outer(np.cos(angles), cut.e1) + np.outer(np.sin(angles), cut.e2)
+    rings = [
+        cut.center - depth * cut.direction + radius * around
+        for radius, depth in profile[:-1].tolist()]
+    apex = cut.center - profile[-1][1] * cut.direction
+    vertices = np.concatenate(rings + [apex[None, :]])
+
+    faces = []
+    ring = first_vertex + np.arange(segments)
+    for k in range(len(rings) - 1):
+        a, b = ring + k * segments, ring + (k + 1) * segments
+        a1, b1 = np.roll(a, -1), np.roll(b, -1)
+        faces.append(np.column_stack((a, a1, b1)))
+        faces.append(np.column_stack((a, b1, b)))
+    last = ring + (len(rings) - 1) * segments
+    faces.append(np.column_stack((last, np.roll(last, -1), np.full(segments, first_vertex + len(vertices) - 1))))
+    return vertices, np.concatenate(faces)
+
+
+def _receiver_samples(cut: _Cut) -> np.ndarray:
+    """Returns points spread over the surface of the snap receiver of the cut."""
+    assert cut.profile is not None
+    steps = np.linspace(0, 1, 5)[:-1]
+    outline = np.concatenate([
+        start + steps[:, None] * (end - start) for start, end in zip(cut.profile[:-1], cut.profile[1:])]
+        + [cut.profile[-1:]])
+    angles = np.linspace(0, 2 * pi, 32, endpoint=False)
+    around = np.outer(np.cos(angles), cut.e1) + np.outer(np.sin(angles), cut.e2)
+    return (cut.center - outline[:, 1, None, None] * cut.direction + outline[:, 0, None, None] * around).reshape(-1, 3)
+
+
+def _inside_receiver(points: np.ndarray, cut: _Cut, margin: float) -> np.ndarray:
+    """Returns which of the points are inside the snap receiver of the cut, or within margin of it."""
+    assert cut.profile is not None
+    depths = cut.distance - points @ cut.direction
+    radii = np.linalg.norm(points - (cut.center - depths[:, None] * cut.direction), axis=1)
+    # The depth only grows along the outline, so the receiver's radius at each depth can be interpolated.
+    limits = np.interp(depths, cut.profile[:, 1], cut.profile[:, 0])
+    return (depths > -margin) & (depths < cut.profile[-1, 1] + margin) & (radii < limits + margin)
+
+
+def print_transform(atom: AtomModel) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the rotation matrix and offset that AtomModel.print() applies to the model of the atom, so the face it
+    prints from is on the x-y plane.
+    """
+    matrix = atom.print_matrix()
+    return matrix[:3, :3], matrix[:3, 3]
+
+
+def _cuts(atom: AtomModel, segments: int) -> List[_Cut]:
+    """Returns the cuts of the neighbors that change the atom, see AtomModel.cut_neighbors()."""
+    radius = atom.element.van_der_waals_radius
+    cuts = []
+    kept = [id(neighbor) for neighbor in atom.cut_neighbors()]
+    for neighbor, direction in zip(atom.neighbors, atom.neighbor_vectors()):
+        if id(neighbor) not in kept:
+            continue
+        distance = atom.interface_distance(neighbor)
+        echeck(distance > -radius, 'A neighbor removes the whole atom.')
+        if distance >= radius:
+            continue
+        bond = bond_model_from_order(neighbor.bond_order)
+        profile = snap_receiver_profile(bond.snap, segments) if isinstance(bond, SingleBondModel) else None
+        cuts.append(_Cut(direction, distance, profile))
+    return cuts
+
+
+def print_footprint(atom: AtomModel, segments: int = DEFAULT_SEGMENTS) -> np.ndarray:
+    """Returns the outline of the atom on the bed when it is printed like AtomModel.print(), as the counter-clockwise
+    corners of its convex hull seen from above. Only the faces of the neighbors change the outside of the atom, the snap
+    receivers and labels are cut into it, so this is the tessellated sphere clipped by those faces. Unlike atom_mesh()
+    this works for every atom.
+    """
+    radius = atom.element.van_der_waals_radius
+    echeck(segments >= 8, 'At least 8 segments are needed.')
+    sphere = uv_sphere(radius, segments)
+    builder = _MeshBuilder(sphere.vertices, sphere.faces)
+    for index, cut in enumerate(_cuts(atom, segments)):
+        builder.clip(index, cut.direction, cut.distance)
+    used = np.unique(np.concatenate([faces.reshape(-1) for faces in builder.faces(skip=[])]))
+    matrix, offset = print_transform(atom)
+    return convex_hull((builder.vertices[used] @ matrix.T + offset)[:, :2])
+
+
+def atom_mesh(
+    atom: AtomModel,
+    segments: int = DEFAULT_SEGMENTS,
+    printed: bool = True,
+    resolution: Optional[Resolution] = None,
+) -> Mesh:
+    """This builds a watertight triangle mesh of the atom directly, without going through OpenSCAD. The atom is a
+    sphere less a half space for each neighbor and a snap receiver below the face of each single bond, so rather than
+    doing general CSG we clip a tessellated sphere by the planes of the faces and revolve the outline of each snap
+    receiver (see snap_receiver_profile) into its face.
+
+    Labels are not cut into the faces. Atoms whose snap receivers run into another face, the surface of the sphere or
+    each other can not be built this way and raise a ValueError, those need to go through OpenSCAD.
+
+    Args:
+        atom: The atom to mesh.
+        segments: The number of segments around the sphere and around each snap receiver.
+        printed: If True the mesh is oriented like AtomModel.print(), otherwise like AtomModel.model().
+        resolution: If given, the number of segments is the number of fragments OpenSCAD would draw the sphere of the
+            atom with at this resolution (see Resolution.fragments), rather than segments.
+
+    Returns:
+        The mesh of the atom.
+    """
+    radius = atom.element.van_der_waals_radius
+    if resolution is not None:
+        segments = max(8, resolution.fragments(radius))
+    echeck(segments >= 8, 'At least 8 segments are needed.')
+    cuts = _cuts(atom, segments)
+
+    sphere = uv_sphere(radius, segments)
+    vertices, triangles = sphere.vertices, sphere.faces
+    builder = _MeshBuilder(vertices, triangles)
+    for index, cut in enumerate(cuts):
+        builder.clip(index, cut.direction, cut.distance)
+
+    receivers = [(index, cut) for index, cut in enumerate(cuts) if cut.profile is not None and index in builder.caps]
+    # The faces of the sphere are inside the sphere itself, this is the closest they get to the center.
+    _check_receivers(radius * np.cos(pi / segments) ** 2, cuts, receivers)
+
+    faces = builder.faces(skip=[builder.caps[index] for index, _ in receivers])
+    all_vertices = [builder.vertices]
+    count = len(builder.vertices)
+    angles = np.linspace(0, 2 * pi, segments, endpoint=False)
+    for index, cut in receivers:
+        assert cut.profile is not None
+        receiver_vertices, receiver_faces = _revolve(cut.profile, cut, segments, count)
+        outer = np.array(builder.caps[index])
+        corners = builder.vertices[outer]
+        edges = np.roll(corners, -1, axis=0) - corners
+        rim = receiver_vertices[:segments]
+        # The outline goes counter-clockwise around the direction, so direction x edge points into the face.
+        inward = np.einsum('ij,kij->ki', np.cross(cut.direction, edges), rim[:, None, :] - corners)
+        echeck(bool(np.all(inward > RECEIVER_MARGIN * np.linalg.norm(edges, axis=1))),
+               'A snap receiver does not fit in the face of its neighbor.')
+        offsets = corners - cut.center
+        outer_angles = np.arctan2(offsets @ cut.e2, offsets @ cut.e1)
+        # The first ring of the receiver is the rim of the opening, which is the hole in the face.
+        faces.append(_zip_rings(outer, count + np.arange(segments), outer_angles, angles))
+        faces.append(receiver_faces)
+        all_vertices.append(receiver_vertices)
+        count += len(receiver_vertices)
+
+    mesh = Mesh(np.concatenate(all_vertices), np.concatenate(faces)).compact()
+    if printed:
+        matrix, offset = print_transform(atom)
+        mesh = mesh.transform(matrix, offset)
+    return mesh
+
+
+def _check_receivers(radius: float, cuts: List[_Cut], receivers: List[Tuple[int, _Cut]]) -> None:
+    """Makes sure every snap receiver fits inside the sphere of the given radius and the other faces without touching
+    the other receivers.
+    """
+    samples = {index: _receiver_samples(cut) for index, cut in receivers}
+    for index, cut in receivers:
+        echeck(bool(np.all(np.linalg.norm(samples[index], axis=1) < radius - RECEIVER_MARGIN)),
+               'A snap receiver does not fit inside the atom.')
+        for other_index, other in enumerate(cuts):
+            if other_index != index:
+                echeck(bool(np.all(samples[index] @ other.direction < other.distance - RECEIVER_MARGIN)),
+                       'A snap receiver runs into the face of another neighbor.')
+        for other_index, other in receivers:
+            if other_index != index:
+                echeck(not np.any(_inside_receiver(samples[index], other, RECEIVER_MARGIN)),
+                       'Two snap receivers run into each other.')
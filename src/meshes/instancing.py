@@ -0,0 +1,207 @@
+#
+# instancing.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Any, Dict, Final, List, Optional, Tuple, Union
+from pathlib import Path
+import json
+import numpy as np
+from src.atoms.element import Element
+from src.meshes.mesh import Mesh, uv_sphere
+from src.utils.colors import color_rgb, linear_rgb
+from src.utils.echeck import echeck
+from src.utils.resolution import Resolution
+
+"""
+The number of segments around the spheres of a preview when no resolution is given. Previews are often of very large
+molecules, so this is kept low.
+"""
+PREVIEW_SEGMENTS: Final[int] = 16
+
+"""
+The glTF extension that places one mesh at many positions, which is what lets a viewer draw the atoms of an element
+with a single call.
+"""
+GLTF_INSTANCING_EXTENSION: Final[str] = 'EXT_mesh_gpu_instancing'
+
+"""
+The numbers glTF uses for the component types of its accessors and the targets of its buffer views.
+"""
+_GLTF_FLOAT: Final[int] = 5126
+_GLTF_UNSIGNED_INT: Final[int] = 5125
+_GLTF_ARRAY_BUFFER: Final[int] = 34962
+_GLTF_ELEMENT_ARRAY_BUFFER: Final[int] = 34963
+
+
+def preview_sphere(
+    atomic_numbers: np.ndarray,
+    segments: int = PREVIEW_SEGMENTS,
+    resolution: Optional[Resolution] = None,
+) -> Mesh:
+    """Returns the unit sphere every atom of a preview is drawn with. With a resolution the number of segments is the
+    number of fragments OpenSCAD would draw the largest of the atoms with, see Resolution.fragments.
+    """
+    if resolution is not None and len(atomic_numbers) > 0:
+        segments = resolution.fragments(float(np.max(Element.van_der_waals_radii(atomic_numbers))))
+    return uv_sphere(1.0, max(4, segments))
+
+
+def element_instances(atomic_numbers: np.ndarray, coordinates: np.ndarray) -> List[Tuple[Element, np.ndarray]]:
+    """Splits the atoms by element. Returns each element with the indices of its atoms, ordered by atomic number."""
+    atomic_numbers = np.asarray(atomic_numbers)
+    echeck(coordinates.shape == (len(atomic_numbers), 3), 'There must be one position for every atom.')
+    return [
+        (Element.from_atomic_number(int(number)), np.flatnonzero(atomic_numbers == number))
+        for number in np.unique(atomic_numbers)]
+
+
+def write_gltf(
+    path: Union[str, Path],
+    atomic_numbers: np.ndarray,
+    coordinates: np.ndarray,
+    segments: int = PREVIEW_SEGMENTS,
+    resolution: Optional[Resolution] = None,
+) -> None:
+    """Writes a binary glTF (.glb) of the space filling model of the atoms. The file holds a single unit sphere, and
+    every element is a node that draws that sphere once for each of its atoms, scaled to the van der Waals radius and in
+    the color of the element, with the EXT_mesh_gpu_instancing extension. So the file grows by 24 bytes per atom and a
+    viewer draws each element with one call, which keeps even very large molecules fast to load and view.
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    sphere = preview_sphere(atomic_numbers, segments, resolution)
+    vertices = sphere.vertices.astype('<f4')
+
+    chunks: List[bytes] = []
+    buffer_views: List[Dict[str, Any]] = []
+    accessors: List[Dict[str, Any]] = []
+
+    def add_accessor(data: np.ndarray, accessor_type: str, target: Optional[int] = None, **extra) -> int:
+        offset = sum(len(chunk) for chunk in chunks)
+        chunk = np.ascontiguousarray(data).tobytes()
+        chunks.append(chunk + b'\0' * (-len(chunk) % 4))
+        view: Dict[str, Any] = {'buffer': 0, 'byteOffset': offset, 'byteLength': len(chunk)}
+        if target is not None:
+            view['target'] = target
+        buffer_views.append(view)
+        component = _GLTF_UNSIGNED_INT if data.dtype == np.dtype('<u4') else _GLTF_FLOAT
+        accessors.append({
+            'bufferView': len(buffer_views) - 1, 'componentType': component, 'count': len(data), 'type': accessor_type,
+            **extra})
+        return len(accessors) - 1
+
+    position = add_accessor(
+        vertices, 'VEC3', _GLTF_ARRAY_BUFFER,
+        min=vertices.min(axis=0).tolist(), max=vertices.max(axis=0).tolist())
+    # The normals of a unit sphere are its vertices.
+    normal = add_accessor(vertices, 'VEC3', _GLTF_ARRAY_BUFFER)
+    indices = add_accessor(sphere.faces.astype('<u4').reshape(-1), 'SCALAR', _GLTF_ELEMENT_ARRAY_BUFFER)
+
+    materials: List[Dict[str, Any]] = []
+    meshes: List[Dict[str, Any]] = []
+    nodes: List[Dict[str, Any]] = []
+    for element, atoms in element_instances(atomic_numbers, coordinates):
+        translations = coordinates[atoms].astype('<f4')
+        scales = np.full((len(atoms), 3), element.van_der_waals_radius, dtype='<f4')
+        materials.append({
+            'name': element.symbol,
+            'pbrMetallicRoughness': {
+                'baseColorFactor': list(linear_rgb(element.cpk_color)) + [1.0],
+                'metallicFactor': 0.0,
+                'roughnessFactor': 0.6}})
+        meshes.append({
+            'name': element.symbol,
+            'primitives': [{
+                'attributes': {'POSITION': position, 'NORMAL': normal},
+                'indices': indices,
+                'material': len(materials) - 1}]})
+        nodes.append({
+            'name': element.symbol,
+            'mesh': len(meshes) - 1,
+            'extensions': {GLTF_INSTANCING_EXTENSION: {'attributes': {
+                'TRANSLATION': add_accessor(translations, 'VEC3'),
+                'SCALE': add_accessor(scales, 'VEC3')}}}})
+
+    binary = b''.join(chunks)
+    document = {
+        'asset': {'version': '2.0', 'generator': 'balls and sticks'},
+        'extensionsUsed': [GLTF_INSTANCING_EXTENSION],
+        # A viewer that can not instance would draw a single atom for each element, so it should refuse the file.
+        'extensionsRequired': [GLTF_INSTANCING_EXTENSION],
+        'scene': 0,
+        'scenes': [{'nodes': list(range(len(nodes)))}],
+        'nodes': nodes,
+        'meshes': meshes,
+        'materials': materials,
+        'accessors': accessors,
+        'bufferViews': buffer_views,
+        'buffers': [{'byteLength': len(binary)}],
+    }
+    text = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    text += b' ' * (-len(text) % 4)
+    with open(path, 'wb') as file:
+        file.write(np.array([0x46546C67, 2, 12 + 8 + len(text) + 8 + len(binary)], dtype='<u4').tobytes())
+        file.write(np.array([len(text), 0x4E4F534A], dtype='<u4').tobytes())
+        file.write(text)
+        file.write(np.array([len(binary), 0x004E4942], dtype='<u4').tobytes())
+        file.write(binary)
+
+
+"""
+The layout of the vertices and faces of the binary PLY files written by write_ply.
+"""
+PLY_VERTEX_DTYPE: Final[np.dtype] = np.dtype([
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+PLY_FACE_DTYPE: Final[np.dtype] = np.dtype([('count', 'u1'), ('indices', '<i4', (3,))])
+
+
+def write_ply(
+    path: Union[str, Path],
+    atomic_numbers: np.ndarray,
+    coordinates: np.ndarray,
+    segments: int = PREVIEW_SEGMENTS,
+    resolution: Optional[Resolution] = None,
+) -> None:
+    """Writes a binary PLY of the space filling model of the atoms, for viewers without glTF instancing. PLY has no
+    instancing, so the unit sphere is copied to every atom, but the copies are made for all of the atoms at once and
+    written with one call, with the color of each atom's element on its vertices.
+    """
+    atomic_numbers = np.asarray(atomic_numbers)
+    coordinates = np.asarray(coordinates, dtype=np.float64)
+    echeck(coordinates.shape == (len(atomic_numbers), 3), 'There must be one position for every atom.')
+    sphere = preview_sphere(atomic_numbers, segments, resolution)
+    count = len(sphere.vertices)
+    radii = Element.van_der_waals_radii(atomic_numbers)
+    numbers, inverse = np.unique(atomic_numbers, return_inverse=True)
+    palette = np.array([color_rgb(name) for name in Element.cpk_colors(numbers)], dtype=np.uint8).reshape(-1, 3)
+    colors = palette[inverse.reshape(-1)]
+
+    vertices = np.zeros((len(atomic_numbers), count), dtype=PLY_VERTEX_DTYPE)
+    points = sphere.vertices[None, :, :] * radii[:, None, None] + coordinates[:, None, :]
+    vertices['x'], vertices['y'], vertices['z'] = points[..., 0], points[..., 1], points[..., 2]
+    vertices['red'], vertices['green'], vertices['blue'] = (colors[:, None, i] for i in range(3))
+    faces = np.zeros((len(atomic_numbers), len(sphere.faces)), dtype=PLY_FACE_DTYPE)
+    faces['count'] = 3
+    faces['indices'] = sphere.faces[None, :, :] + (count * np.arange(len(atomic_numbers)))[:, None, None]
+
+    header = '\n'.join([
+        'ply',
+        'format binary_little_endian 1.0',
+        'comment balls and sticks',
+        'element vertex {}'.format(vertices.size),
+        'property float x',
+        'property float y',
+        'property float z',
+        'property uchar red',
+        'property uchar green',
+        'property uchar blue',
+        'element face {}'.format(faces.size),
+        'property list uchar int vertex_indices',
+        'end_header',
+    ]) + '\n'
+    with open(path, 'wb') as file:
+        file.write(header.encode('ascii'))
+        vertices.tofile(file)
+        faces.tofile(file)
@@ -0,0 +1,148 @@
+#
+# mesh.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Optional, Sequence
+from math import pi
+import numpy as np
+from src.utils.echeck import echeck
+
+
+class Mesh(object):
+    """An indexed triangle mesh. The vertices are an N x 3 float array and the faces an M x 3 integer array of vertex
+    indices. The faces are wound counter-clockwise when seen from outside the solid, so the normals point out. Like
+    Point, a Mesh is not modified by its operations, they return a new Mesh.
+    """
+
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray):
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        echeck(len(faces) == 0 or (faces.min() >= 0 and faces.max() < len(vertices)),
+               'The faces must index the vertices.')
+        self._vertices = vertices
+        self._faces = faces
+
+    @staticmethod
+    def concatenate(meshes: Sequence['Mesh']) -> 'Mesh':
+        """Combines the meshes into one mesh (without merging anything, so overlapping meshes stay overlapping)."""
+        if len(meshes) == 0:
+            return Mesh(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64))
+        offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes[:-1]])
+        return Mesh(
+            np.concatenate([mesh.vertices for mesh in meshes]),
+            np.concatenate([mesh.faces + offset for mesh, offset in zip(meshes, offsets.tolist())]))
+
+    @property
+    def vertices(self) -> np.ndarray:
+        return self._vertices
+
+    @property
+    def faces(self) -> np.ndarray:
+        return self._faces
+
+    def triangles(self) -> np.ndarray:
+        """Returns an M x 3 x 3 array with the corners of each face."""
+        return self._vertices[self._faces]
+
+    def face_normals(self) -> np.ndarray:
+        """Returns the unit normal of each face. Degenerate faces get a zero normal."""
+        triangles = self.triangles()
+        normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+        lengths = np.linalg.norm(normals, axis=1)
+        return normals / np.where(lengths > 0, lengths, 1.0)[:, None]
+
+    def area(self) -> float:
+        """Returns the surface area of the mesh."""
+        triangles = self.triangles()
+        return float(0.5 * np.linalg.norm(
+            np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]), axis=1).sum())
+
+    def volume(self) -> float:
+        """Returns the volume enclosed by the mesh. This is only meaningful for a watertight mesh, and is negative if
+        the faces are wound the wrong way.
+        """
+        triangles = self.triangles()
+        return float(np.einsum('ij,ij->i', triangles[:, 0], np.cross(triangles[:, 1], triangles[:, 2])).sum() / 6)
+
+    def bounds(self) -> np.ndarray:
+        """Returns a 2 x 3 array with the smallest and largest coordinates of the vertices."""
+        echeck(len(self._vertices) > 0, 'An empty mesh has no bounds.')
+        return np.array([self._vertices.min(axis=0), self._vertices.max(axis=0)])
+
+    def is_watertight(self) -> bool:
+        """Returns True if the mesh is closed and consistently wound, that is, every edge is used by exactly two faces
+        which go along it in opposite directions.
+        """
+        if len(self._faces) == 0:
+            return False
+        edges = np.concatenate((self._faces[:, [0, 1]], self._faces[:, [1, 2]], self._faces[:, [2, 0]]))
+        # Every directed edge must be unique, and its reverse must be there too.
+        directed = np.unique(edges, axis=0)
+        if len(directed) != len(edges):
+            return False
+        reverse = np.unique(edges[:, ::-1], axis=0)
+        return bool(np.array_equal(directed, reverse))
+
+    def compact(self) -> 'Mesh':
+        """Returns the mesh without the vertices that no face uses."""
+        used, faces = np.unique(self._faces, return_inverse=True)
+        return Mesh(self._vertices[used], faces.reshape(-1, 3))
+
+    def transform(self, matrix: np.ndarray, offset: Optional[np.ndarray] = None) -> 'Mesh':
+        """Applies the 3x3 matrix to every vertex and then adds the offset. A matrix with a negative determinant (a
+        reflection) also flips the faces so the normals still point out.
+        """
+        echeck(matrix.shape == (3, 3), 'The matrix must be 3x3.')
+        vertices = self._vertices @ matrix.T
+        if offset is not None:
+            vertices = vertices + np.asarray(offset, dtype=np.float64)
+        faces = self._faces[:, ::-1] if np.linalg.det(matrix) < 0 else self._faces
+        return Mesh(vertices, faces)
+
+    def translate(self, offset: Sequence[float]) -> 'Mesh':
+        return Mesh(self._vertices + np.asarray(offset, dtype=np.float64), self._faces)
+
+
+def cube_mesh(size: float = 1.0) -> Mesh:
+    """Returns a cube with the given side and one corner on the origin, wound so the normals point out."""
+    vertices = size * np.array([[x, y, z] for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype=np.float64)
+    faces = [
+        [0, 1, 3], [0, 3, 2],  # x = 0
+        [4, 6, 7], [4, 7, 5],  # x = 1
+        [0, 4, 5], [0, 5, 1],  # y = 0
+        [2, 3, 7], [2, 7, 6],  # y = 1
+        [0, 2, 6], [0, 6, 4],  # z = 0
+        [1, 5, 7], [1, 7, 3],  # z = 1
+    ]
+    return Mesh(vertices, np.array(faces))
+
+
+def uv_sphere(radius: float, segments: int) -> Mesh:
+    """Returns a watertight UV sphere around the origin with the given number of segments around the equator and half
+    as many from pole to pole.
+    """
+    rings = max(2, segments // 2)
+    polar = np.linspace(0, pi, rings + 1)[1:-1]
+    azimuth = np.linspace(0, 2 * pi, segments, endpoint=False)
+    ring_points = np.stack((
+        np.outer(np.sin(polar), np.cos(azimuth)),
+        np.outer(np.sin(polar), np.sin(azimuth)),
+        np.repeat(np.cos(polar)[:, None], segments, axis=1)), axis=-1).reshape(-1, 3)
+    vertices = radius * np.concatenate(([[0.0, 0.0, 1.0]], ring_points, [[0.0, 0.0, -1.0]]))
+    north, south = 0, len(vertices) - 1
+
+    def ring(i: int) -> np.ndarray:
+        return 1 + i * segments + np.arange(segments)
+
+    def rolled(i: int) -> np.ndarray:
+        return np.roll(ring(i), -1)
+
+    faces = [np.column_stack((np.full(segments, north), ring(0), rolled(0)))]
+    for i in range(rings - 2):
+        faces.append(np.column_stack((ring(i), ring(i + 1), rolled(i + 1))))
+        faces.append(np.column_stack((ring(i), rolled(i + 1), rolled(i))))
+    faces.append(np.column_stack((np.full(segments, south), rolled(rings - 2), ring(rings - 2))))
+    return Mesh(vertices, np.concatenate(faces))
@@ -0,0 +1,97 @@
+#
+# stl.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Final, Union
+from pathlib import Path
+import re
+import numpy as np
+from src.meshes.mesh import Mesh
+from src.utils.echeck import echeck
+
+"""
+The size of the header at the start of a binary STL file, in bytes.
+"""
+STL_HEADER_BYTES: Final[int] = 80
+
+"""
+The layout of one facet of a binary STL file: the normal, the three corners and the unused attribute byte count, all
+little endian.
+"""
+STL_FACET_DTYPE: Final[np.dtype] = np.dtype([
+    ('normal', '<f4', (3,)),
+    ('vertices', '<f4', (3, 3)),
+    ('attribute', '<u2'),
+])
+
+"""
+The header written into the STL files when no header is given.
+"""
+DEFAULT_STL_HEADER: Final[str] = 'balls and sticks'
+
+"""
+Finds the coordinates of the corners in an ASCII STL file.
+"""
+_ASCII_VERTEX: Final[re.Pattern] = re.compile(rb'vertex\s+(\S+)\s+(\S+)\s+(\S+)')
+
+
+def stl_facets(mesh: Mesh) -> np.ndarray:
+    """Returns the faces of the mesh as an array of STL_FACET_DTYPE, ready to be written to a binary STL file."""
+    facets = np.zeros(len(mesh.faces), dtype=STL_FACET_DTYPE)
+    facets['normal'] = mesh.face_normals()
+    facets['vertices'] = mesh.triangles()
+    return facets
+
+
+def write_stl(mesh: Mesh, path: Union[str, Path], header: str = DEFAULT_STL_HEADER) -> None:
+    """Writes the mesh to a binary STL file. The facets are built as one NumPy array and written in one go, so this is
+    fast even for large meshes.
+    """
+    encoded = header.encode('ascii')
+    echeck(len(encoded) <= STL_HEADER_BYTES, 'The STL header can be at most {} bytes.'.format(STL_HEADER_BYTES))
+    # A binary STL must not start with "solid", otherwise readers take it for an ASCII STL.
+    echeck(not encoded.lstrip().lower().startswith(b'solid'), 'A binary STL header can not start with "solid".')
+    facets = stl_facets(mesh)
+    with open(path, 'wb') as file:
+        file.write(encoded.ljust(STL_HEADER_BYTES, b' '))
+        file.write(np.uint32(len(facets)).tobytes())
+        facets.tofile(file)
+
+
+def read_stl_facets(path: Union[str, Path], mmap: bool = False) -> np.ndarray:
+    """Reads the facets of an STL file as an array of STL_FACET_DTYPE. If mmap is True and the file is binary the
+    array is a read only memory map of the file, so large files are only read as far as they are used. ASCII files are
+    parsed into memory and get normals of zero.
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    with open(path, 'rb') as file:
+        start = file.read(STL_HEADER_BYTES + 4)
+    if len(start) == STL_HEADER_BYTES + 4:
+        count = int(np.frombuffer(start, dtype='<u4', offset=STL_HEADER_BYTES)[0])
+        # ASCII files start with "solid" too, but a binary file is always exactly the size its header says.
+        if size == STL_HEADER_BYTES + 4 + count * STL_FACET_DTYPE.itemsize:
+            if mmap:
+                return np.memmap(path, dtype=STL_FACET_DTYPE, mode='r', offset=STL_HEADER_BYTES + 4, shape=(count,))
+            return np.fromfile(path, dtype=STL_FACET_DTYPE, offset=STL_HEADER_BYTES + 4, count=count)
+    echeck(start.lstrip().startswith(b'solid'), '{} is not an STL file.'.format(path))
+    corners = np.array(_ASCII_VERTEX.findall(path.read_bytes()), dtype=np.float32)
+    echeck(len(corners) % 3 == 0, '{} has a facet without three vertices.'.format(path))
+    facets = np.zeros(len(corners) // 3, dtype=STL_FACET_DTYPE)
+    facets['vertices'] = corners.reshape(-1, 3, 3)
+    return facets
+
+
+def mesh_from_facets(facets: np.ndarray) -> Mesh:
+    """Builds an indexed mesh from STL facets by merging the corners that are at exactly the same place."""
+    corners = np.asarray(facets['vertices'], dtype=np.float64).reshape(-1, 3)
+    vertices, faces = np.unique(corners, axis=0, return_inverse=True)
+    return Mesh(vertices, faces.reshape(-1, 3))
+
+
+def read_stl(path: Union[str, Path]) -> Mesh:
+    """Reads a binary or ASCII STL file into a mesh."""
+    return mesh_from_facets(read_stl_facets(path, mmap=True))
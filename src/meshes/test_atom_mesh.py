@@ -0,0 +1,92 @@
+#
+# test_atom_mesh.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from math import pi
+import numpy as np
+from src.atoms.atom_model import AtomModelBuilder
+from src.atoms.bond import SingleBondModel
+from src.atoms.element import Element
+from src.atoms.neighbor import Neighbor
+from src.meshes.atom_mesh import atom_mesh, print_footprint, snap_receiver_profile
+from src.utils.constants import pm
+from src.utils.resolution import DRAFT, PRINT
+
+
+def water_oxygen():
+    builder = AtomModelBuilder(Element.O)
+    builder.add_bond(Element.H, 95.84*pm, Neighbor.Direction(0.0, 0.0), 1)
+    builder.add_bond(Element.H, 95.84*pm, Neighbor.Direction(0.0, 104.45), 1)
+    return builder.build()
+
+
+class TestAtomMesh(unittest.TestCase):
+
+    def test_receiver_profile(self):
+        profile = snap_receiver_profile(SingleBondModel().snap, 16)
+        self.assertEqual(0.0, profile[0, 1])
+        self.assertEqual(0.0, profile[-1, 0])
+        # The profile only ever goes deeper into the atom.
+        self.assertTrue(np.all(np.diff(profile[:, 1]) >= 0))
+
+    def test_lone_atom(self):
+        atom = AtomModelBuilder(Element.H).build()
+        mesh = atom_mesh(atom, segments=32)
+        radius = Element.H.van_der_waals_radius
+        self.assertTrue(mesh.is_watertight())
+        self.assertAlmostEqual(4 / 3 * pi * radius ** 3, mesh.volume(), delta=0.02 * mesh.volume())
+
+    def test_water(self):
+        atom = water_oxygen()
+        radius = Element.O.van_der_waals_radius
+        mesh = atom_mesh(atom, segments=32)
+        self.assertTrue(mesh.is_watertight())
+        self.assertGreater(mesh.volume(), 0)
+        self.assertLess(mesh.volume(), 4 / 3 * pi * radius ** 3)
+        # Printed, the atom sits on its face on the x-y plane.
+        self.assertAlmostEqual(0.0, mesh.bounds()[0, 2], places=9)
+
+        model = atom_mesh(atom, segments=32, printed=False)
+        self.assertAlmostEqual(mesh.volume(), model.volume())
+        self.assertLessEqual(np.linalg.norm(model.vertices, axis=1).max(), radius + 1e-9)
+
+    def test_resolution(self):
+        atom = water_oxygen()
+        draft = atom_mesh(atom, resolution=DRAFT)
+        self.assertTrue(draft.is_watertight())
+        self.assertLess(len(draft.faces), len(atom_mesh(atom, resolution=PRINT).faces))
+
+    def test_bond_without_receiver(self):
+        builder = AtomModelBuilder(Element.O)
+        builder.add_bond(Element.C, 120.0*pm, Neighbor.Direction(0.0, 0.0), 2)
+        mesh = atom_mesh(builder.build(), segments=32)
+        self.assertTrue(mesh.is_watertight())
+        self.assertAlmostEqual(0.0, mesh.bounds()[0, 2], places=9)
+
+    def test_receivers_that_overlap(self):
+        builder = AtomModelBuilder(Element.C)
+        builder.add_bond(Element.C, 154.0*pm, Neighbor.Direction(0.0, 0.0), 1)
+        builder.add_bond(Element.C, 154.0*pm, Neighbor.Direction(0.0, 20.0), 1)
+        with self.assertRaises(ValueError):
+            atom_mesh(builder.build(), segments=32)
+
+    def test_print_footprint(self):
+        radius = Element.H.van_der_waals_radius
+        lone = print_footprint(AtomModelBuilder(Element.H).build(), segments=32)
+        self.assertTrue(np.allclose(np.linalg.norm(lone, axis=1), radius))
+
+        # The outline is the printed mesh seen from above, even for atoms that atom_mesh can not build.
+        atom = water_oxygen()
+        footprint = print_footprint(atom, segments=32)
+        mesh = atom_mesh(atom, segments=32)
+        self.assertTrue(np.allclose(footprint.min(axis=0), mesh.bounds()[0, :2]))
+        self.assertTrue(np.allclose(footprint.max(axis=0), mesh.bounds()[1, :2]))
+        builder = AtomModelBuilder(Element.C)
+        builder.add_bond(Element.C, 154.0*pm, Neighbor.Direction(0.0, 0.0), 1)
+        builder.add_bond(Element.C, 154.0*pm, Neighbor.Direction(0.0, 20.0), 1)
+        footprint = print_footprint(builder.build())
+        self.assertLessEqual(np.linalg.norm(footprint, axis=1).max(), Element.C.van_der_waals_radius + 1e-9)
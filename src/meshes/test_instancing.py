@@ -0,0 +1,100 @@
+#
+# test_instancing.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import numpy as np
+from src.atoms.atom_position import AtomPosition
+from src.atoms.element import Element
+from src.meshes.instancing import GLTF_INSTANCING_EXTENSION, PLY_FACE_DTYPE, PLY_VERTEX_DTYPE
+from src.molecules.molecule_representation import MoleculeRepresentation
+from src.utils.colors import linear_rgb
+from src.utils.point import Point
+
+
+def water() -> MoleculeRepresentation:
+    return MoleculeRepresentation([
+        AtomPosition(Element.O, Point(0.0, 0.0, 0.0)),
+        AtomPosition(Element.H, Point(9.6, 0.0, 0.0)),
+        AtomPosition(Element.H, Point(-2.4, 9.3, 0.0))])
+
+
+def read_glb(path: Path):
+    data = path.read_bytes()
+    magic, version, length = np.frombuffer(data[:12], dtype='<u4')
+    json_length = int(np.frombuffer(data[12:16], dtype='<u4')[0])
+    document = json.loads(data[20:20 + json_length])
+    binary = data[20 + json_length + 8:]
+    return int(magic), int(version), int(length), len(data), document, binary
+
+
+def read_accessor(document, binary, index: int) -> np.ndarray:
+    accessor = document['accessors'][index]
+    view = document['bufferViews'][accessor['bufferView']]
+    dtype = '<f4' if accessor['componentType'] == 5126 else '<u4'
+    width = {'SCALAR': 1, 'VEC3': 3}[accessor['type']]
+    return np.frombuffer(binary, dtype=dtype, count=accessor['count'] * width, offset=view['byteOffset']).reshape(
+        accessor['count'], width)
+
+
+class TestInstancing(unittest.TestCase):
+
+    def test_gltf(self):
+        representation = water()
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'water.glb'
+            representation.write_gltf(path, segments=8)
+            magic, version, length, size, document, binary = read_glb(path)
+        self.assertEqual((0x46546C67, 2, size), (magic, version, length))
+        self.assertIn(GLTF_INSTANCING_EXTENSION, document['extensionsRequired'])
+        self.assertEqual(['H', 'O'], [node['name'] for node in document['nodes']])
+
+        # The elements share one sphere.
+        primitives = [mesh['primitives'][0] for mesh in document['meshes']]
+        self.assertEqual(1, len({json.dumps(primitive['attributes']) for primitive in primitives}))
+        positions = read_accessor(document, binary, primitives[0]['attributes']['POSITION'])
+        np.testing.assert_allclose(1.0, np.linalg.norm(positions, axis=1), rtol=1e-6)
+
+        hydrogen = document['nodes'][0]['extensions'][GLTF_INSTANCING_EXTENSION]['attributes']
+        np.testing.assert_allclose(
+            representation.coordinates[1:], read_accessor(document, binary, hydrogen['TRANSLATION']), rtol=1e-6)
+        np.testing.assert_allclose(
+            Element.H.van_der_waals_radius, read_accessor(document, binary, hydrogen['SCALE']), rtol=1e-6)
+        # glTF colors are linear, so the sRGB CSS colors are converted: gray (128) is about 0.216, not 0.502.
+        for material in document['materials']:
+            element = Element.from_symbol(material['name'])
+            np.testing.assert_allclose(
+                list(linear_rgb(element.cpk_color)) + [1.0], material['pbrMetallicRoughness']['baseColorFactor'])
+        self.assertAlmostEqual(0.2158605, linear_rgb('gray')[0], places=6)
+        self.assertEqual((1.0, 1.0, 1.0), linear_rgb('white'))
+        for view in document['bufferViews']:
+            self.assertEqual(0, view['byteOffset'] % 4)
+            self.assertLessEqual(view['byteOffset'] + view['byteLength'], len(binary))
+
+    def test_ply(self):
+        representation = water()
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'water.ply'
+            representation.write_ply(path, segments=8)
+            data = path.read_bytes()
+        header, body = data.split(b'end_header\n', 1)
+        lines = header.decode('ascii').split('\n')
+        vertex_count = int(next(line for line in lines if line.startswith('element vertex')).split()[2])
+        face_count = int(next(line for line in lines if line.startswith('element face')).split()[2])
+        self.assertEqual(len(body), vertex_count * PLY_VERTEX_DTYPE.itemsize + face_count * PLY_FACE_DTYPE.itemsize)
+
+        vertices = np.frombuffer(body, dtype=PLY_VERTEX_DTYPE, count=vertex_count)
+        faces = np.frombuffer(body, dtype=PLY_FACE_DTYPE, offset=vertex_count * PLY_VERTEX_DTYPE.itemsize)
+        self.assertEqual(0, vertex_count % 3)
+        per_atom = vertex_count // 3
+        oxygen = np.column_stack((vertices['x'], vertices['y'], vertices['z']))[:per_atom]
+        np.testing.assert_allclose(Element.O.van_der_waals_radius, np.linalg.norm(oxygen, axis=1), rtol=1e-6)
+        self.assertEqual((255, 0, 0), tuple(vertices[['red', 'green', 'blue']][0].tolist()))
+        self.assertTrue(np.all(faces['count'] == 3))
+        self.assertEqual(vertex_count - 1, faces['indices'].max())
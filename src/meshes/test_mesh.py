@@ -0,0 +1,59 @@
+#
+# test_mesh.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import numpy as np
+from src.meshes.mesh import Mesh, cube_mesh
+from src.utils.rotation import axis_angle_matrix_degrees
+
+
+class TestMesh(unittest.TestCase):
+
+    def test_cube(self):
+        cube = cube_mesh(2.0)
+        self.assertTrue(cube.is_watertight())
+        self.assertAlmostEqual(8.0, cube.volume())
+        self.assertAlmostEqual(24.0, cube.area())
+        np.testing.assert_allclose([[0, 0, 0], [2, 2, 2]], cube.bounds())
+        # The normals point away from the center.
+        centers = cube.triangles().mean(axis=1) - 1.0
+        self.assertTrue(np.all(np.einsum('ij,ij->i', cube.face_normals(), centers) > 0))
+
+    def test_open_mesh(self):
+        cube = cube_mesh()
+        self.assertFalse(Mesh(cube.vertices, cube.faces[:-1]).is_watertight())
+        flipped = cube.faces.copy()
+        flipped[0] = flipped[0][::-1]
+        self.assertFalse(Mesh(cube.vertices, flipped).is_watertight())
+
+    def test_faces_must_index_vertices(self):
+        with self.assertRaises(ValueError):
+            Mesh(np.zeros((3, 3)), np.array([[0, 1, 3]]))
+
+    def test_transform(self):
+        cube = cube_mesh()
+        rotated = cube.transform(axis_angle_matrix_degrees((0.0, 0.0, 1.0), 90), np.array([0.0, 0.0, 1.0]))
+        np.testing.assert_allclose([[-1, 0, 1], [0, 1, 2]], rotated.bounds(), atol=1e-12)
+        self.assertAlmostEqual(1.0, rotated.volume())
+        # A reflection keeps the normals pointing out.
+        mirrored = cube.transform(np.diag([-1.0, 1.0, 1.0]))
+        self.assertAlmostEqual(1.0, mirrored.volume())
+        self.assertTrue(mirrored.is_watertight())
+        np.testing.assert_allclose(cube.vertices + 1, cube.translate([1, 1, 1]).vertices)
+
+    def test_concatenate_and_compact(self):
+        cube = cube_mesh()
+        both = Mesh.concatenate([cube, cube.translate([2, 0, 0])])
+        self.assertEqual(16, len(both.vertices))
+        self.assertTrue(both.is_watertight())
+        self.assertAlmostEqual(2.0, both.volume())
+        self.assertEqual(0, len(Mesh.concatenate([]).faces))
+
+        padded = Mesh(np.concatenate((np.full((1, 3), 5.0), cube.vertices)), cube.faces + 1)
+        compacted = padded.compact()
+        self.assertEqual(8, len(compacted.vertices))
+        np.testing.assert_allclose(cube.bounds(), compacted.bounds())
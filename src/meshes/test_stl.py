@@ -0,0 +1,67 @@
+#
+# test_stl.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import numpy as np
+from src.meshes.mesh import cube_mesh
+from src.meshes.stl import STL_FACET_DTYPE, read_stl, read_stl_facets, write_stl
+
+
+class TestStl(unittest.TestCase):
+
+    def test_round_trip(self):
+        cube = cube_mesh(2.0).translate([1, 0, 0])
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'cube.stl'
+            write_stl(cube, path)
+            self.assertEqual(84 + 12 * STL_FACET_DTYPE.itemsize, path.stat().st_size)
+            self.assertEqual(50, STL_FACET_DTYPE.itemsize)
+
+            facets = read_stl_facets(path, mmap=True)
+            self.assertIsInstance(facets, np.memmap)
+            np.testing.assert_allclose(cube.face_normals(), facets['normal'])
+            np.testing.assert_allclose(cube.triangles(), facets['vertices'])
+            del facets
+
+            mesh = read_stl(path)
+            self.assertEqual(8, len(mesh.vertices))
+            self.assertTrue(mesh.is_watertight())
+            self.assertAlmostEqual(cube.volume(), mesh.volume(), places=5)
+
+    def test_ascii(self):
+        cube = cube_mesh()
+        lines = ['solid cube']
+        for triangle in cube.triangles():
+            lines += ['facet normal 0 0 0', 'outer loop']
+            lines += ['vertex {} {} {}'.format(*corner) for corner in triangle]
+            lines += ['endloop', 'endfacet']
+        lines.append('endsolid cube')
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'cube.stl'
+            path.write_text('\n'.join(lines))
+            mesh = read_stl(path)
+            self.assertTrue(mesh.is_watertight())
+            self.assertAlmostEqual(1.0, mesh.volume())
+
+    def test_bad_header(self):
+        with TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                write_stl(cube_mesh(), Path(directory) / 'cube.stl', header='solid cube')
+            path = Path(directory) / 'empty.stl'
+            path.write_bytes(b'not an stl')
+            with self.assertRaises(ValueError):
+                read_stl(path)
+
+    def test_shipped_stl(self):
+        path = Path(__file__).parents[2] / 'stls' / 'snap_ring.stl'
+        if not path.exists():
+            self.skipTest('The shipped STL files are not available.')
+        mesh = read_stl(path)
+        self.assertGreater(len(mesh.faces), 0)
+        self.assertGreater(mesh.volume(), 0)
@@ -0,0 +1,116 @@
+#
+# bond_topology.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Sequence, Tuple, Union
+import numpy as np
+from src.utils.echeck import echeck
+
+
+class BondTopology(object):
+    """This is a class that holds the bonds between the atoms of a molecule. Each bond is stored once as an edge between
+    two atom indices along with its bond order. Since an atom only has a few bonds, this takes space proportional to the
+    number of bonds rather than the N x N matrix it would take to store the bond order between every pair of atoms.
+
+    To look up the bonds of an atom quickly we also keep a compressed sparse row (CSR) adjacency: the bonds of atom i
+    are listed, sorted by mate, in adjacency[indptr[i]:indptr[i + 1]]. This makes finding the bonds of an atom
+    proportional to its number of bonds.
+    """
+
+    def __init__(
+        self,
+        num_atoms: int,
+        atoms1: Union[Sequence[int], np.ndarray],
+        atoms2: Union[Sequence[int], np.ndarray],
+        orders: Union[Sequence[int], np.ndarray],
+    ) -> None:
+        """Creates the bond topology for num_atoms atoms where the k-th bond is between the atoms with indices
+        atoms1[k] and atoms2[k] (0 based) and has bond order orders[k].
+        """
+        self._num_atoms = num_atoms
+        self._atoms1 = np.asarray(atoms1, dtype=np.int64).reshape(-1)
+        self._atoms2 = np.asarray(atoms2, dtype=np.int64).reshape(-1)
+        self._orders = np.asarray(orders, dtype=np.int8).reshape(-1)
+        echeck(len(self._atoms1) == len(self._atoms2) == len(self._orders),
+               'The number of atoms1, atoms2, and bond orders must be the same.')
+        if len(self._atoms1) > 0:
+            echeck(min(self._atoms1.min(), self._atoms2.min()) >= 0, 'Bond atom indices must not be negative.')
+            echeck(max(self._atoms1.max(), self._atoms2.max()) < num_atoms, 'Bond atom indices must refer to an atom.')
+        echeck(bool(np.all(self._atoms1 != self._atoms2)), 'An atom can not be bonded to itself.')
+
+        # Every bond appears in the adjacency of both of its atoms. We store the index of the bond rather than the order
+        # so that changes made to the orders are seen by the lookups.
+        num_bonds = len(self._orders)
+        sources = np.concatenate((self._atoms1, self._atoms2))
+        mates = np.concatenate((self._atoms2, self._atoms1))
+        bond_ids = np.concatenate((np.arange(num_bonds), np.arange(num_bonds)))
+        order = np.lexsort((mates, sources))
+        self._indptr = np.concatenate(([0], np.cumsum(np.bincount(sources, minlength=num_atoms))))
+        self._mates = mates[order]
+        self._bond_ids = bond_ids[order]
+
+    @staticmethod
+    def empty(num_atoms: int) -> 'BondTopology':
+        """Creates a bond topology for num_atoms atoms with no bonds between them."""
+        return BondTopology(num_atoms, [], [], [])
+
+    @staticmethod
+    def from_dense(bond_orders: np.ndarray) -> 'BondTopology':
+        """Creates a bond topology from a square matrix where bond_orders[i][j] is the bond order between atom i and
+        atom j. A value of 0 means no bond between the atoms. Only the upper triangle of the matrix is read.
+        """
+        echeck(bond_orders.ndim == 2 and bond_orders.shape[0] == bond_orders.shape[1],
+               'The bond order matrix must be square.')
+        atoms1, atoms2 = np.nonzero(np.triu(bond_orders, k=1))
+        return BondTopology(bond_orders.shape[0], atoms1, atoms2, bond_orders[atoms1, atoms2])
+
+    @property
+    def num_atoms(self) -> int:
+        return self._num_atoms
+
+    @property
+    def atoms1(self) -> np.ndarray:
+        return self._atoms1
+
+    @property
+    def atoms2(self) -> np.ndarray:
+        return self._atoms2
+
+    @property
+    def orders(self) -> np.ndarray:
+        """The bond order of each bond. This array can be modified in place, for example to remap all single bonds to
+        double bonds with orders[orders == 1] = 2.
+        """
+        return self._orders
+
+    def bonds(self, atom: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the arrays (mates, orders) with the indices of the atoms bonded to the given atom and the orders of
+        those bonds.
+        """
+        start, end = self._indptr[atom], self._indptr[atom + 1]
+        return self._mates[start:end], self._orders[self._bond_ids[start:end]]
+
+    def bond_order(self, atom1: int, atom2: int) -> int:
+        """Returns the bond order between the two atoms, 0 if they are not bonded."""
+        mates, orders = self.bonds(atom1)
+        matches = orders[mates == atom2]
+        return int(matches[0]) if len(matches) > 0 else 0
+
+    def degree(self, atom: int) -> int:
+        """Returns the number of bonds of the given atom."""
+        return int(self._indptr[atom + 1] - self._indptr[atom])
+
+    def to_dense(self) -> np.ndarray:
+        """Builds the N x N matrix of the bond orders between every pair of atoms. This takes a lot of memory for large
+        molecules, so it should only be used for small ones.
+        """
+        dense = np.zeros((self._num_atoms, self._num_atoms))
+        dense[self._atoms1, self._atoms2] = self._orders
+        dense[self._atoms2, self._atoms1] = self._orders
+        return dense
+
+    def __len__(self) -> int:
+        return len(self._orders)
@@ -6,45 +6,57 @@
 #
 
 from src.atoms.atom_model import AtomModelBuilder
+from src.atoms.element import Element
 from src.atoms.neighbor import Neighbor
 from src.molecules.molecule_model import MoleculeModel, MoleculeModelBuilder
 from src.molecules.molecule_positions import MoleculePositions
+from src.molecules.spatial_index import SpatialIndex
 
 
 def molecule_model_from_positions(name: str, positions: MoleculePositions) -> MoleculeModel:
     """This function will use the given AdeninePositions object to create a MoleculeModel object that represents the
     adenine molecule when printed out.
     """
-    # While not the most efficient way, we will just loop through all of the atoms in the molecule adding each one as a
-    # neighbor or bond and relying on AtomModel to only use the relevant ones.
+    # An atom only changes shape when a neighbor is closer than the sum of their van der Waals radii, so we use a
+    # spatial index to only visit those candidate pairs instead of every pair of atoms in the molecule. The geometry
+    # from each atom to its candidates is then computed in a single vectorized call.
 
     molecule = MoleculeModelBuilder(name)
-    num_atoms = len(positions.atoms)
+    elements = positions.elements
+    labels = positions.labels
+    num_atoms = len(elements)
+    if num_atoms == 0:
+        return molecule.build()
+    radii = Element.van_der_waals_radii(positions.atomic_numbers)
+    max_radius = radii.max()
+    index = SpatialIndex(positions, 2 * max_radius)
 
     for atom_idx in range(num_atoms):
-        atom = AtomModelBuilder(positions.atoms[atom_idx].element)
-        for bond_idx in range(num_atoms):
-            if bond_idx == atom_idx:
-                continue
-
-            direction = (positions.atoms[bond_idx].position - positions.atoms[atom_idx].position)
-            if positions.bond_orders[atom_idx][bond_idx] > 0:
+        atom = AtomModelBuilder(elements[atom_idx])
+        others = index.neighbors_within(atom_idx, radii[atom_idx] + max_radius)
+        distances, inclinations, azimuths = positions.neighbor_geometry(atom_idx, others)
+        near = distances < radii[atom_idx] + radii[others]
+        others, distances, inclinations, azimuths = others[near], distances[near], inclinations[near], azimuths[near]
+        mates, orders = positions.bonds.bonds(atom_idx)
+        bond_orders = dict(zip(mates.tolist(), orders.tolist()))
+        for bond_idx, distance, inclination, azimuth in zip(
+                others.tolist(), distances.tolist(), inclinations.tolist(), azimuths.tolist()):
+            direction = Neighbor.Direction(inclination, azimuth)
+            bond_order = bond_orders.get(bond_idx, 0)
+            if bond_order > 0:
                 # Add bond
                 label = None
-                if positions.labels is not None:
-                    label = "{}-{}".format(positions.labels[atom_idx], positions.labels[bond_idx])
+                if labels is not None:
+                    label = "{}-{}".format(labels[atom_idx], labels[bond_idx])
                 atom.add_bond(
-                    positions.atoms[bond_idx].element,
-                    positions.atoms[atom_idx].position.distance(positions.atoms[bond_idx].position),
-                    Neighbor.Direction(direction.get_inclination_angle(), direction.get_azimuthal_angle()),
-                    positions.bond_orders[atom_idx][bond_idx],
+                    elements[bond_idx],
+                    distance,
+                    direction,
+                    bond_order,
                     label)
             else:
                 # Add neighbor
-                atom.add_neighbor(
-                    positions.atoms[bond_idx].element,
-                    positions.atoms[atom_idx].position.distance(positions.atoms[bond_idx].position),
-                    Neighbor.Direction(direction.get_inclination_angle(), direction.get_azimuthal_angle()))
+                atom.add_neighbor(elements[bond_idx], distance, direction)
 
         molecule.add_atom(atom.build())
 
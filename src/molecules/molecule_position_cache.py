@@ -0,0 +1,102 @@
+#
+# molecule_position_cache.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Any, Dict, Final, Optional, Union
+from pathlib import Path
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+import numpy as np
+from src.atoms.element import Element
+from src.molecules.bond_topology import BondTopology
+from src.molecules.molecule_positions import MoleculePositions
+from src.molecules.molecule_position_utils import molecule_position_from_pubchem
+
+"""
+Bump this whenever the layout of the cache files changes, so that stale files are never read back.
+"""
+CACHE_VERSION: Final[int] = 1
+
+
+def default_cache_directory() -> Path:
+    """Returns the directory cached molecule positions are stored in when no directory is given. This can be moved with
+    the BALLS_AND_STICKS_CACHE environment variable, which is read on every call so it can be set at any time.
+    """
+    return Path(os.environ.get('BALLS_AND_STICKS_CACHE', Path.home() / '.cache' / 'balls_and_sticks')) / 'positions'
+
+
+def save_positions(path: Union[str, Path], positions: MoleculePositions) -> None:
+    """Saves the positions as a columnar binary (.npz) file. Each of the atomic numbers, coordinates, bond edges, bond
+    orders and labels is stored as a single array, so loading it back needs no parsing. The file is written to a
+    temporary file first and then moved in place, so a reader never sees a partially written file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arrays: Dict[str, Any] = {
+        'atomic_numbers': positions.atomic_numbers.astype(np.uint8),
+        'coordinates': positions.coordinates,
+        'bond_atoms1': positions.bonds.atoms1,
+        'bond_atoms2': positions.bonds.atoms2,
+        'bond_orders': positions.bonds.orders,
+    }
+    if positions.labels is not None:
+        arrays['labels'] = np.array(positions.labels, dtype=str)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.npz')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def load_positions(path: Union[str, Path]) -> MoleculePositions:
+    """Loads positions that were saved with save_positions."""
+    with np.load(path, allow_pickle=False) as data:
+        elements = Element.from_atomic_numbers(data['atomic_numbers'])
+        bonds = BondTopology(len(elements), data['bond_atoms1'], data['bond_atoms2'], data['bond_orders'])
+        labels = data['labels'].tolist() if 'labels' in data else None
+        return MoleculePositions.from_arrays(elements, data['coordinates'], bonds, labels)
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """Returns the SHA-256 hex digest of the contents of the file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def molecule_position_from_pubchem_file(
+    path: Union[str, Path],
+    cache_directory: Optional[Union[str, Path]] = None,
+) -> MoleculePositions:
+    """Returns the MoleculePositions for the PubChem Conformer json file at path. The parsed positions are cached in
+    cache_directory (default_cache_directory() if not given) under the hash of the file contents, so the json is only
+    parsed the first time a given file is seen and changes to the file are always picked up.
+    """
+    directory = Path(cache_directory) if cache_directory is not None else default_cache_directory()
+    cache_path = directory / 'pubchem-v{}-{}.npz'.format(CACHE_VERSION, file_hash(path))
+    if cache_path.exists():
+        try:
+            return load_positions(cache_path)
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # The cache file is damaged, so we fall back to parsing the json and overwrite it.
+            pass
+
+    with open(path) as f:
+        positions = molecule_position_from_pubchem(json.load(f))
+    try:
+        save_positions(cache_path, positions)
+    except OSError:
+        # Not being able to write the cache (e.g. a read only home directory) should not stop us from loading.
+        pass
+    return positions
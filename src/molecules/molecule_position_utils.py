@@ -5,9 +5,12 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
+from typing import Iterator, TextIO, Union
+from pathlib import Path
+import gzip
+import json as jsonlib
+from src.molecules.bond_topology import BondTopology
 from src.molecules.molecule_positions import MoleculePositions
-from src.utils.point import Point
-from src.atoms.atom_position import AtomPosition
 from src.atoms.element import Element
 from src.utils.echeck import echeck
 from src.utils.constants import pm
@@ -24,31 +27,143 @@ def molecule_position_from_pubchem(json: dict) -> MoleculePositions:
     Returns:
         A MoleculePositions object with the positions of the atoms in the molecule.
     """
-    elements = json['PC_Compounds'][0]['atoms']['element']
-    x_coords = json['PC_Compounds'][0]['coords'][0]['conformers'][0]['x']
-    y_coords = json['PC_Compounds'][0]['coords'][0]['conformers'][0]['y']
-    if 'z' in json['PC_Compounds'][0]['coords'][0]['conformers'][0]:
-        z_coords = json['PC_Compounds'][0]['coords'][0]['conformers'][0]['z']
+    return molecule_position_from_pubchem_compound(json['PC_Compounds'][0])
+
+
+def molecule_position_from_pubchem_compound(compound: dict, conformer: int = 0) -> MoleculePositions:
+    """This function will take a single compound from the PC_Compounds list of a PubChem json object and return a
+    MoleculePositions object with the positions of the atoms in the given conformer of the compound.
+
+    Args:
+        compound: One entry of the PC_Compounds list.
+        conformer: The index of the conformer to use.
+
+    Returns:
+        A MoleculePositions object with the positions of the atoms in the molecule.
+    """
+    elements = compound['atoms']['element']
+    coords = compound['coords'][0]['conformers'][conformer]
+    x_coords = coords['x']
+    y_coords = coords['y']
+    if 'z' in coords:
+        z_coords = coords['z']
     else:
         z_coords = [0.0 for _ in x_coords]
     echeck(len(elements) == len(x_coords) == len(y_coords) == len(z_coords),
            'The number of elements, x, y, and z coordinates must be the same.')
 
-    atoms = []
-    for element, x, y, z in zip(elements, x_coords, y_coords, z_coords):
-        # All of the coordinates appear to be in angstroms, so we need to convert them to pm.
-        atoms.append(AtomPosition(Element.from_atomic_number(element), Point(100*x*pm, 100*y*pm, 100*z*pm)))
+    # All of the coordinates appear to be in angstroms, so we need to convert them to pm.
+    coordinates = np.column_stack((x_coords, y_coords, z_coords)).astype(np.float64) * (100 * pm)
+    atoms = Element.from_atomic_numbers(np.asarray(elements))
 
-    # create a map that takes the element position and map it to all the other positions that element has a bond with.
-    atom_ids = json['PC_Compounds'][0]['bonds']['aid1']
-    mate_ids = json['PC_Compounds'][0]['bonds']['aid2']
-    bond_orders = json['PC_Compounds'][0]['bonds']['order']
+    # PubChem lists each bond once using 1 based atom ids. Compounds with a single atom have no bonds section.
+    bonds_json = compound.get('bonds', {'aid1': [], 'aid2': [], 'order': []})
+    atom_ids = bonds_json['aid1']
+    mate_ids = bonds_json['aid2']
+    bond_orders = bonds_json['order']
     echeck(len(atom_ids) == len(mate_ids) == len(bond_orders),
            'The number of atom ids, mate ids, and bond orders must be the same.')
 
-    bonds = np.zeros((len(atoms), len(atoms)))
-    for atom_id, mate_id, bond_order in zip(atom_ids, mate_ids, bond_orders):
-        bonds[atom_id - 1][mate_id - 1] = bond_order
-        bonds[mate_id - 1][atom_id - 1] = bond_order
+    bonds = BondTopology(len(atoms), np.asarray(atom_ids, dtype=np.int64) - 1, np.asarray(mate_ids, dtype=np.int64) - 1,
+                         bond_orders)
+
+    return MoleculePositions.from_arrays(atoms, coordinates, bonds)
+
+
+def iter_pubchem_compounds(stream: TextIO, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """This function reads a PubChem json export from the given text stream and yields the entries of its PC_Compounds
+    list one at a time. Only the compound currently being decoded is held in memory, so arbitrarily large exports can be
+    processed in constant memory (relative to the number of compounds).
 
-    return MoleculePositions(atoms, bonds)
+    Args:
+        stream: The text stream to read the json from.
+        chunk_size: The number of characters to read from the stream at a time.
+
+    Returns:
+        An iterator over the compound json objects.
+    """
+    decoder = jsonlib.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read_more(size: int) -> None:
+        nonlocal buffer, pos, eof
+        chunk = stream.read(size)
+        if not chunk:
+            eof = True
+        # Drop everything that has already been consumed so the buffer only holds the current compound.
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            read_more(chunk_size)
+
+    # Find the start of the PC_Compounds list.
+    key = '"PC_Compounds"'
+    while True:
+        found = buffer.find(key, pos)
+        if found >= 0:
+            pos = found + len(key)
+            break
+        echeck(not eof, 'The json does not contain a PC_Compounds list.')
+        # Keep the tail in case the key is split across two reads.
+        pos = max(0, len(buffer) - len(key))
+        read_more(chunk_size)
+    for expected in ':[':
+        skip_whitespace()
+        echeck(pos < len(buffer) and buffer[pos] == expected, 'Malformed PC_Compounds list.')
+        pos += 1
+
+    first = True
+    while True:
+        skip_whitespace()
+        echeck(pos < len(buffer), 'Unexpected end of the PC_Compounds list.')
+        if buffer[pos] == ']':
+            return
+        if not first:
+            echeck(buffer[pos] == ',', 'Malformed PC_Compounds list.')
+            pos += 1
+            skip_whitespace()
+        first = False
+
+        # Decode the next compound, reading more (in growing amounts) until the whole object is in the buffer.
+        size = chunk_size
+        while True:
+            try:
+                compound, end = decoder.raw_decode(buffer, pos)
+                break
+            except jsonlib.JSONDecodeError:
+                if eof:
+                    raise
+                read_more(size)
+                size *= 2
+        pos = end
+        yield compound
+
+
+def iter_molecule_positions_from_pubchem(
+    path: Union[str, Path],
+    chunk_size: int = 1 << 16,
+) -> Iterator[MoleculePositions]:
+    """This function streams a PubChem json export, which may be gzip compressed (.gz), and yields a MoleculePositions
+    object for every conformer of every compound in it, in the order they appear in the file.
+
+    Args:
+        path: The path to the json (or json.gz) file.
+        chunk_size: The number of characters to read from the file at a time.
+
+    Returns:
+        An iterator over the MoleculePositions of each conformer.
+    """
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt') as stream:
+        for compound in iter_pubchem_compounds(stream, chunk_size):
+            for conformer in range(len(compound['coords'][0]['conformers'])):
+                yield molecule_position_from_pubchem_compound(compound, conformer)
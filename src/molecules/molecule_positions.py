@@ -5,55 +5,175 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple, Type, TypeVar, Union
 from src.utils.point import Point
+from src.utils.point_array import PointArray
 from src.atoms.atom_position import AtomPosition
+from src.atoms.element import Element
+from src.molecules.bond_topology import BondTopology
 from src.utils.echeck import echeck
+from src.utils.rotation import axis_angle_matrix_degrees, quaternion_matrix, z_rotation_matrix_degrees
 import numpy as np
 
 
+T = TypeVar('T', bound='MoleculePositions')
+
+
 class MoleculePositions(object):
-    """This is a class that represents the positions of the atoms in a molecule in 3D space."""
+    """This is a class that represents the positions of the atoms in a molecule in 3D space.
+
+    The coordinates of all of the atoms are stored in a single contiguous N x 3 numpy array, so that transforming the
+    molecule or querying the geometry between atoms is a single vectorized operation. The AtomPosition objects returned
+    by atoms are views onto the rows of that array. The bonds between the atoms are held in a sparse BondTopology.
+    """
 
     def __init__(
         self,
         atoms: List[AtomPosition],
-        bond_orders: Optional[np.ndarray] = None,
-        labels: Optional[List[str]] = None
+        bond_orders: Optional[Union[np.ndarray, BondTopology]] = None,
+        labels: Optional[List[str]] = None,
+        dtype: type = np.float64,
     ) -> None:
         """This initializes the MoleculePositions object with the atom positions. And the information about the bonds
-        between the atoms. bond_orders is a 2D list where bond_order[i][j] is the bond order between atom i and atom j
-        in the atoms list. A value of 0 means no bond between the atoms.
+        between the atoms. bond_orders is either a BondTopology or a 2D array where bond_order[i][j] is the bond order
+        between atom i and atom j in the atoms list. A value of 0 means no bond between the atoms. The dtype controls
+        the precision the coordinates are stored with, np.float32 can be used to halve the memory of large structures.
         """
+        coordinates: np.ndarray = np.empty((len(atoms), 3), dtype=dtype)
+        for i, atom in enumerate(atoms):
+            coordinates[i] = atom.coordinates
+        self._init_from_arrays([atom.element for atom in atoms], coordinates, bond_orders, labels)
+
+    @classmethod
+    def from_arrays(
+        cls: Type[T],
+        elements: Sequence[Element],
+        coordinates: np.ndarray,
+        bond_orders: Optional[Union[np.ndarray, BondTopology]] = None,
+        labels: Optional[List[str]] = None,
+    ) -> T:
+        """Creates a MoleculePositions object directly from a list of elements and an N x 3 array of coordinates,
+        without creating an AtomPosition per atom. The coordinate array is used as is (not copied), so its dtype is the
+        dtype used for storage.
+        """
+        positions = cls.__new__(cls)
+        positions._init_from_arrays(list(elements), coordinates, bond_orders, labels)
+        return positions
+
+    def _init_from_arrays(
+        self,
+        elements: List[Element],
+        coordinates: np.ndarray,
+        bond_orders: Optional[Union[np.ndarray, BondTopology]],
+        labels: Optional[List[str]],
+    ) -> None:
+        num_atoms = len(elements)
+        echeck(coordinates.shape == (num_atoms, 3), 'The coordinates must be an N x 3 array with one row per atom.')
         if bond_orders is None:
-            bond_orders = np.zeros((len(atoms), len(atoms)))
-        echeck(bond_orders.shape[0] == bond_orders.shape[1], 'The bond order matrix must be square.')
-        echeck(len(atoms) == bond_orders.shape[0], 'The number of atoms must match the bond order matrix.')
+            bonds = BondTopology.empty(num_atoms)
+        elif isinstance(bond_orders, BondTopology):
+            bonds = bond_orders
+        else:
+            bonds = BondTopology.from_dense(bond_orders)
+        echeck(num_atoms == bonds.num_atoms, 'The number of atoms must match the bond order matrix.')
         if labels is not None:
-            echeck(len(labels) == len(atoms), 'If labels are included, they must match the number of atoms.')
-        self._atoms = atoms
-        self._bond_orders = bond_orders
+            echeck(len(labels) == num_atoms, 'If labels are included, they must match the number of atoms.')
+        self._elements = elements
+        self._atomic_numbers: Optional[np.ndarray] = None
+        self._coordinates = coordinates
+        self._atoms: Optional[List[AtomPosition]] = None
+        self._bonds = bonds
         self._labels = labels
 
     @property
     def atoms(self) -> List[AtomPosition]:
+        """Returns the atoms as AtomPosition views onto the coordinate array. These are created on first access."""
+        if self._atoms is None:
+            self._atoms = [
+                AtomPosition.view(element, self._coordinates[i]) for i, element in enumerate(self._elements)]
         return self._atoms
 
+    @property
+    def elements(self) -> List[Element]:
+        return self._elements
+
+    @property
+    def atomic_numbers(self) -> np.ndarray:
+        """Returns the atomic number of each atom as an array. This can be used with the vectorized lookups on Element,
+        e.g. Element.van_der_waals_radii(positions.atomic_numbers).
+        """
+        if self._atomic_numbers is None:
+            self._atomic_numbers = np.array([element.atomic_number for element in self._elements], dtype=np.int64)
+        return self._atomic_numbers
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """Returns the N x 3 array of atom coordinates. Row i holds the x, y and z coordinates of atom i."""
+        return self._coordinates
+
+    @property
+    def points(self) -> PointArray:
+        """Returns the atom coordinates as a PointArray that shares the coordinate array."""
+        return PointArray(self._coordinates)
+
+    @property
+    def bonds(self) -> BondTopology:
+        return self._bonds
+
     @property
     def bond_orders(self) -> np.ndarray:
-        return self._bond_orders
+        """Returns the N x N matrix of bond orders between every pair of atoms. This is built on each call from bonds
+        and should only be used for small molecules. It is read only, so writing to it raises a ValueError rather than
+        being lost. Bond orders are changed through bonds.orders (see BondTopology).
+        """
+        orders = self._bonds.to_dense()
+        orders.setflags(write=False)
+        return orders
 
     @property
     def labels(self) -> Optional[List[str]]:
         return self._labels
 
     def translate(self, point: Point) -> None:
-        for atom in self._atoms:
-            atom.translate(point)
+        self._coordinates += np.array([point.x, point.y, point.z], dtype=self._coordinates.dtype)
 
     def rotate_degrees(self, angle: float) -> None:
-        for atom in self._atoms:
-            atom.rotate_degrees(angle)
+        """Rotates the molecule around the z-axis by the given angle in degrees."""
+        self.rotate_matrix(z_rotation_matrix_degrees(angle))
+
+    def rotate_axis_degrees(self, axis: Point, angle: float) -> None:
+        """Rotates the molecule around the given axis (through the origin) by the given angle in degrees."""
+        self.rotate_matrix(axis_angle_matrix_degrees((axis.x, axis.y, axis.z), angle))
+
+    def rotate_quaternion(self, w: float, x: float, y: float, z: float) -> None:
+        """Rotates the molecule by the rotation described by the quaternion w + xi + yj + zk."""
+        self.rotate_matrix(quaternion_matrix(w, x, y, z))
+
+    def rotate_matrix(self, matrix: np.ndarray) -> None:
+        """Applies the given 3x3 rotation matrix to every atom in the molecule."""
+        echeck(matrix.shape == (3, 3), 'The rotation matrix must be 3x3.')
+        # The rows are the points, so we multiply by the transpose to rotate all of them at once.
+        self._coordinates[:] = self._coordinates @ matrix.T.astype(self._coordinates.dtype)
+
+    def neighbor_geometry(
+        self,
+        index: int,
+        others: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Computes the geometry from the atom at index to the atoms at the given indices (all of the other atoms if
+        not given) in one vectorized pass. This returns the arrays (distances, inclinations, azimuths) where the angles
+        are in degrees and follow the same conventions as Point.get_inclination_angle and Point.get_azimuthal_angle.
+        """
+        if others is None:
+            others = np.delete(np.arange(len(self._elements)), index)
+        x, y, z = self._coordinates[index].tolist()
+        deltas = PointArray(self._coordinates[others].astype(np.float64)) - Point(x, y, z)
+        distances = deltas.magnitudes()
+        echeck(bool(np.all(distances > 0)), 'Two atoms can not occupy the same position.')
+        return distances, deltas.get_inclination_angles(), deltas.get_azimuthal_angles()
+
+    def __len__(self) -> int:
+        return len(self._elements)
 
     def __iter__(self):
-        return iter(self._atoms)
+        return iter(self.atoms)
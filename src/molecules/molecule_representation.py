@@ -5,9 +5,16 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from typing import List
+from typing import List, Optional, Sequence, Tuple, Union
+from pathlib import Path
 from solid2 import sphere, color
+import numpy as np
 from src.atoms.atom_position import AtomPosition
+from src.atoms.element import Element
+from src.meshes.instancing import PREVIEW_SEGMENTS, write_gltf, write_ply
+from src.molecules.preview import Camera, render_atoms
+from src.utils.png import write_png
+from src.utils.resolution import Resolution, scad_fn
 
 
 class MoleculeRepresentation(object):
@@ -24,13 +31,89 @@ class MoleculeRepresentation(object):
     ):
         self._atoms = atoms
 
-    def model(self):
+    def model(self, resolution: Optional[Resolution] = None):
         """This generates a 3D model of the molecule. This is done by creating a sphere for each atom in the molecule
-        in the right position and applying the correct color to the sphere based on the element of the atom.
+        in the right position and applying the correct color to the sphere based on the element of the atom. The
+        spheres are drawn at the resolution, or with OpenSCAD's defaults if there is none.
         """
         model = sphere(0)
         for atom in self._atoms:
-            model += color(atom.element.cpk_color)(
-                sphere(atom.element.van_der_waals_radius).translate(atom.position.x, atom.position.y, atom.position.z))
+            radius = atom.element.van_der_waals_radius
+            ball = sphere(radius, _fn=scad_fn(resolution, radius))
+            model += color(atom.element.cpk_color)(ball.translate(atom.position.x, atom.position.y, atom.position.z))
 
         return model
+
+    @property
+    def atomic_numbers(self) -> np.ndarray:
+        """The atomic number of each atom, as an array. For MoleculePositions this is its own array."""
+        numbers = getattr(self._atoms, 'atomic_numbers', None)
+        if numbers is None:
+            numbers = np.array([atom.element.atomic_number for atom in self._atoms], dtype=np.int64)
+        return numbers
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """The positions of the atoms, as an N x 3 array. For MoleculePositions this is its own array."""
+        coordinates = getattr(self._atoms, 'coordinates', None)
+        if coordinates is None:
+            coordinates = np.array([atom.coordinates for atom in self._atoms], dtype=np.float64).reshape(-1, 3)
+        return coordinates
+
+    def write_gltf(
+        self,
+        path: Union[str, Path],
+        segments: int = PREVIEW_SEGMENTS,
+        resolution: Optional[Resolution] = None,
+    ) -> None:
+        """Writes the representation as a binary glTF (.glb) that draws one sphere per element for all of its atoms,
+        see src.meshes.instancing.write_gltf. Unlike model() this does not go through OpenSCAD, so it is quick to write
+        and to view even for very large molecules.
+        """
+        write_gltf(path, self.atomic_numbers, self.coordinates, segments, resolution)
+
+    def write_ply(
+        self,
+        path: Union[str, Path],
+        segments: int = PREVIEW_SEGMENTS,
+        resolution: Optional[Resolution] = None,
+    ) -> None:
+        """Writes the representation as a binary PLY mesh with the atoms colored by element, see
+        src.meshes.instancing.write_ply.
+        """
+        write_ply(path, self.atomic_numbers, self.coordinates, segments, resolution)
+
+    def render(
+        self,
+        width: int = 256,
+        height: int = 256,
+        direction: Sequence[float] = (0.0, 0.0, -1.0),
+        up: Sequence[float] = (0.0, 1.0, 0.0),
+        fov: Optional[float] = None,
+        background: Optional[Tuple[int, int, int]] = None,
+    ) -> np.ndarray:
+        """Renders a picture of the representation as an H x W x 4 RGBA image, looking along direction with up pointing
+        up and all of the atoms in view, see src.molecules.preview.render_atoms. This needs neither OpenSCAD nor a
+        viewer, so it is a quick way to check a molecule or to make thumbnails of many of them.
+        """
+        atomic_numbers = self.atomic_numbers
+        coordinates = self.coordinates
+        if len(atomic_numbers) == 0:
+            camera = Camera(direction=direction, up=up, width=width, height=height, fov=fov)
+        else:
+            radii = Element.van_der_waals_radii(atomic_numbers)
+            camera = Camera.fit(coordinates, radii, direction, up, width, height, fov)
+        return render_atoms(atomic_numbers, coordinates, camera, background)
+
+    def write_png(
+        self,
+        path: Union[str, Path],
+        width: int = 256,
+        height: int = 256,
+        direction: Sequence[float] = (0.0, 0.0, -1.0),
+        up: Sequence[float] = (0.0, 1.0, 0.0),
+        fov: Optional[float] = None,
+        background: Optional[Tuple[int, int, int]] = None,
+    ) -> None:
+        """Writes the picture made by render() to a PNG file."""
+        write_png(path, self.render(width, height, direction, up, fov, background))
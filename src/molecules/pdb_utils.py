@@ -0,0 +1,258 @@
+#
+# pdb_utils.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Dict, Final, Iterator, List, Pattern, Set, Tuple, Union
+from pathlib import Path
+from itertools import chain
+import mmap
+import re
+from src.atoms.element import Element
+from src.molecules.molecule_positions import MoleculePositions
+from src.utils.echeck import echeck
+from src.utils.constants import pm
+import numpy as np
+
+
+def _mapped_bytes(f) -> np.ndarray:
+    """Memory maps the open file and returns its bytes as a read-only uint8 array, without copying them."""
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return np.frombuffer(mapped, dtype=np.uint8)
+
+
+def _elements_from_symbols(symbols: np.ndarray) -> List[Element]:
+    """Maps an array of element symbols (bytes) to Elements, only looking up each distinct symbol once."""
+    unique, inverse = np.unique(symbols, return_inverse=True)
+    lookup = [Element.from_symbol(symbol.decode().strip()) for symbol in unique]
+    return [lookup[i] for i in inverse.ravel().tolist()]
+
+
+def _labels(chains: np.ndarray, residues: np.ndarray, sequences: np.ndarray, names: np.ndarray) -> List[str]:
+    """Builds the label of each atom in the form <chain>:<residue name><residue number>:<atom name>, e.g. A:DG12:C1'."""
+    return [
+        '{}:{}{}:{}'.format(*fields)
+        for fields in zip(chains.tolist(), residues.tolist(), sequences.tolist(), names.tolist())]
+
+
+class _PdbLines(object):
+    """This holds the start and length of each line of a memory mapped PDB file, so that fixed width columns can be
+    read for many lines at once with numpy indexing.
+    """
+
+    def __init__(self, data: np.ndarray) -> None:
+        self._data = data
+        newlines = np.flatnonzero(data == ord('\n'))
+        self.starts = np.concatenate(([0], newlines + 1))
+        self.lengths = np.concatenate((newlines, [len(data)])) - self.starts
+
+    def columns(self, lines: np.ndarray, begin: int, end: int) -> np.ndarray:
+        """Returns the (0 based, end exclusive) columns begin to end of the given lines as a bytes array. Lines that are
+        too short are padded with spaces.
+        """
+        offsets = np.arange(begin, end)
+        index = self.starts[lines, None] + offsets
+        chars = self._data[np.minimum(index, len(self._data) - 1)]
+        chars = np.where(offsets < self.lengths[lines, None], chars, ord(' ')).astype(np.uint8)
+        chars[chars == ord('\r')] = ord(' ')
+        return np.ascontiguousarray(chars).view('S{}'.format(end - begin)).ravel()
+
+
+def _symbol_from_name(field: bytes) -> bytes:
+    """Returns the element symbol of an atom from its name, columns 13-16 of an ATOM/HETATM line. The symbol is right
+    justified in columns 13-14, so ' CA ' is an alpha carbon and 'CA  ' is calcium, and a digit may come before a one
+    letter symbol, as in '1HB '. Hydrogens with four character names, like 'HG21', start in column 13 as well, so a
+    four character name starting with H is taken to be a hydrogen rather than, say, mercury.
+    """
+    if len(field.strip()) == 4 and field.startswith(b'H'):
+        return b'H'
+    return field[:2].lstrip(b' 0123456789')
+
+
+def _pdb_model(lines: _PdbLines, atoms: np.ndarray) -> MoleculePositions:
+    """Builds the MoleculePositions from the given ATOM/HETATM lines of a PDB file."""
+    # Columns from https://www.wwpdb.org/documentation/file-format-content/format33/sect9.html#ATOM
+    coordinates = np.column_stack((
+        lines.columns(atoms, 30, 38).astype(np.float64),
+        lines.columns(atoms, 38, 46).astype(np.float64),
+        lines.columns(atoms, 46, 54).astype(np.float64))) * (100 * pm)
+    fields = lines.columns(atoms, 12, 16)
+    names = np.char.strip(fields)
+    symbols = np.char.strip(lines.columns(atoms, 76, 78))
+    # Older files leave the element column blank, in which case the element comes from the atom name.
+    missing = symbols == b''
+    if np.any(missing):
+        unique, inverse = np.unique(fields[missing], return_inverse=True)
+        lookup = np.array([_symbol_from_name(field) for field in unique.tolist()], dtype='S2')
+        symbols[missing] = lookup[inverse.ravel()]
+    labels = _labels(
+        np.char.decode(np.char.strip(lines.columns(atoms, 21, 22))),
+        np.char.decode(np.char.strip(lines.columns(atoms, 17, 20))),
+        np.char.decode(np.char.strip(lines.columns(atoms, 22, 26))),
+        np.char.decode(names))
+    return MoleculePositions.from_arrays(_elements_from_symbols(symbols), coordinates, labels=labels)
+
+
+def iter_molecule_positions_from_pdb(path: Union[str, Path]) -> Iterator[MoleculePositions]:
+    """This function reads a PDB file through a memory map and yields a MoleculePositions object for each model in it
+    (just one if the file has no MODEL records). The coordinates are read for all of the atoms at once with numpy, so
+    the file is never turned into Python strings line by line. The labels of the atoms are in the form
+    <chain>:<residue name><residue number>:<atom name>. Only the first alternate location of an atom is used.
+
+    Args:
+        path: The path to the PDB file.
+
+    Returns:
+        An iterator over the MoleculePositions of each model.
+    """
+    with open(path, 'rb') as f:
+        echeck(Path(path).stat().st_size > 0, 'The PDB file is empty.')
+        lines = _PdbLines(_mapped_bytes(f))
+        everything = np.arange(len(lines.starts))
+        records = lines.columns(everything, 0, 6)
+        atoms = np.flatnonzero((records == b'ATOM  ') | (records == b'HETATM'))
+
+        # Each atom belongs to the model whose MODEL record comes last before it.
+        models = np.flatnonzero(records == b'MODEL ')
+        model_of_atom = np.searchsorted(models, atoms)
+
+        # Of the lines of an atom with alternate locations, only the first one in the file is kept, whatever its
+        # letter. An atom is told apart by its model, name, residue, chain, residue number and insertion code.
+        alternate = lines.columns(atoms, 16, 17) != b' '
+        if np.any(alternate):
+            keys = np.char.add(
+                np.char.add(model_of_atom[alternate].astype('S'), b':'),
+                np.char.add(lines.columns(atoms[alternate], 12, 16), lines.columns(atoms[alternate], 17, 27)))
+            first = np.zeros(np.count_nonzero(alternate), dtype=bool)
+            first[np.unique(keys, return_index=True)[1]] = True
+            keep = np.ones(len(atoms), dtype=bool)
+            keep[alternate] = first
+            atoms, model_of_atom = atoms[keep], model_of_atom[keep]
+        for model in np.unique(model_of_atom).tolist():
+            yield _pdb_model(lines, atoms[model_of_atom == model])
+
+
+def molecule_position_from_pdb(path: Union[str, Path], model: int = 0) -> MoleculePositions:
+    """This function returns the MoleculePositions of the given (0 based) model of a PDB file. See
+    iter_molecule_positions_from_pdb.
+    """
+    for index, positions in enumerate(iter_molecule_positions_from_pdb(path)):
+        if index == model:
+            return positions
+    raise ValueError('The PDB file does not have a model {}.'.format(model))
+
+
+"""
+Matches a single mmCIF value: a quoted string (whose quote is followed by whitespace) or a run of non-whitespace.
+"""
+_CIF_TOKEN: Final[Pattern[bytes]] = re.compile(rb"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""")
+
+
+def _cif_tokens(line: bytes) -> List[bytes]:
+    return [match.group(1) or match.group(2) or match.group(3) or b'' for match in _CIF_TOKEN.finditer(line)]
+
+
+def iter_molecule_positions_from_mmcif(path: Union[str, Path]) -> Iterator[MoleculePositions]:
+    """This function reads the _atom_site loop of an mmCIF file through a memory map and yields a MoleculePositions
+    object for each model (pdbx_PDB_model_num) in it. Only the rows of the current model are kept in memory. The labels
+    are built the same way as for PDB files. Only the first alternate location of an atom is used.
+
+    Args:
+        path: The path to the mmCIF file.
+
+    Returns:
+        An iterator over the MoleculePositions of each model.
+    """
+    with open(path, 'rb') as f:
+        echeck(Path(path).stat().st_size > 0, 'The mmCIF file is empty.')
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield from _iter_mmcif_models(iter(mapped.readline, b''))
+        finally:
+            mapped.close()
+
+
+def _iter_mmcif_models(lines: Iterator[bytes]) -> Iterator[MoleculePositions]:
+    """Does the work of iter_molecule_positions_from_mmcif on the lines of the file."""
+    # Find the header of the _atom_site loop.
+    columns: Dict[bytes, int] = {}
+    line = b''
+    in_loop = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped == b'loop_':
+            in_loop = True
+            continue
+        if in_loop and stripped.startswith(b'_atom_site.'):
+            columns[stripped[len(b'_atom_site.'):]] = len(columns)
+            continue
+        if len(columns) > 0:
+            break
+        in_loop = in_loop and stripped.startswith(b'_')
+    echeck(len(columns) > 0, 'The mmCIF file does not have an _atom_site loop.')
+
+    def column(*names: bytes) -> int:
+        for name in names:
+            if name in columns:
+                return columns[name]
+        raise ValueError('The _atom_site loop is missing the {} column.'.format(names[0].decode()))
+
+    symbol = column(b'type_symbol')
+    x, y, z = column(b'Cartn_x'), column(b'Cartn_y'), column(b'Cartn_z')
+    name = column(b'auth_atom_id', b'label_atom_id')
+    residue = column(b'auth_comp_id', b'label_comp_id')
+    chain_id = column(b'auth_asym_id', b'label_asym_id')
+    sequence = column(b'auth_seq_id', b'label_seq_id')
+    model_column = columns.get(b'pdbx_PDB_model_num')
+    alternate_column = columns.get(b'label_alt_id')
+
+    insertion = columns.get(b'pdbx_PDB_ins_code')
+
+    rows: List[List[bytes]] = []
+    located: Set[Tuple[bytes, ...]] = set()
+    current_model = None
+
+    def flush() -> MoleculePositions:
+        table = np.array(rows, dtype=bytes)
+        coordinates = table[:, [x, y, z]].astype(np.float64) * (100 * pm)
+        labels = _labels(
+            np.char.decode(table[:, chain_id]), np.char.decode(table[:, residue]),
+            np.char.decode(table[:, sequence]), np.char.decode(table[:, name]))
+        return MoleculePositions.from_arrays(_elements_from_symbols(table[:, symbol]), coordinates, labels=labels)
+
+    # The loop ends at the first line that starts a new item, loop or comment. A row may be split over several lines.
+    tokens: List[bytes] = []
+    for line in chain([line], lines):
+        if line.startswith((b'_', b'#', b'loop_', b'data_')):
+            break
+        tokens.extend(_cif_tokens(line))
+        while len(tokens) >= len(columns):
+            row, tokens = tokens[:len(columns)], tokens[len(columns):]
+            model = row[model_column] if model_column is not None else None
+            if current_model is not None and model != current_model and len(rows) > 0:
+                yield flush()
+                rows = []
+                located.clear()
+            current_model = model
+            if alternate_column is not None and row[alternate_column] not in (b'.', b'?'):
+                # Only the first alternate location of an atom in the model is kept, whatever its letter.
+                atom = (row[chain_id], row[sequence], row[insertion] if insertion is not None else b'', row[residue],
+                        row[name])
+                if atom in located:
+                    continue
+                located.add(atom)
+            rows.append(row)
+    if len(rows) > 0:
+        yield flush()
+
+
+def molecule_position_from_mmcif(path: Union[str, Path], model: int = 0) -> MoleculePositions:
+    """This function returns the MoleculePositions of the given (0 based) model of an mmCIF file. See
+    iter_molecule_positions_from_mmcif.
+    """
+    for index, positions in enumerate(iter_molecule_positions_from_mmcif(path)):
+        if index == model:
+            return positions
+    raise ValueError('The mmCIF file does not have a model {}.'.format(model))
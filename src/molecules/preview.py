@@ -0,0 +1,268 @@
+#
+# preview.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Final, Optional, Sequence, Tuple
+from math import radians, tan
+import numpy as np
+from src.atoms.element import Element
+from src.utils.colors import color_rgb
+from src.utils.echeck import echeck
+
+"""
+The side of the square tiles, in pixels, the image is split into. Each atom is only tested against the pixels of the
+tiles its outline covers.
+"""
+PREVIEW_TILE_SIZE: Final[int] = 16
+
+"""
+The most ray and atom pairs that are tested at once, which bounds the memory a tile with very many atoms takes.
+"""
+PREVIEW_BATCH_SIZE: Final[int] = 1 << 20
+
+"""
+The direction the light comes from, in camera coordinates (x right, y up, z away from the viewer). It is above, to the
+left of and behind the viewer.
+"""
+PREVIEW_LIGHT: Final[np.ndarray] = np.array([-0.4, 0.5, -1.0]) / np.linalg.norm([-0.4, 0.5, -1.0])
+
+"""
+How much of the color of an atom comes from the ambient light, the diffuse light and the white highlight.
+"""
+PREVIEW_AMBIENT: Final[float] = 0.3
+PREVIEW_DIFFUSE: Final[float] = 0.7
+PREVIEW_SPECULAR: Final[float] = 0.25
+PREVIEW_SHININESS: Final[float] = 32.0
+
+
+class Camera(object):
+    """Where a preview is seen from. The camera looks along direction at target, with up pointing up in the image, and
+    extent is the size of the scene, in the units of the coordinates, that fits across the shorter side of the image.
+    With a field of view (fov, in degrees, across the shorter side) the view is a perspective from far enough back for
+    extent to fit at the target, without one it is an orthographic projection.
+    """
+
+    def __init__(
+        self,
+        target: Sequence[float] = (0.0, 0.0, 0.0),
+        direction: Sequence[float] = (0.0, 0.0, -1.0),
+        up: Sequence[float] = (0.0, 1.0, 0.0),
+        extent: float = 10.0,
+        width: int = 256,
+        height: int = 256,
+        fov: Optional[float] = None,
+    ):
+        forward = np.asarray(direction, dtype=np.float64)
+        echeck(float(np.linalg.norm(forward)) > 0, 'The direction must not be the zero vector.')
+        forward = forward / np.linalg.norm(forward)
+        right = np.cross(forward, np.asarray(up, dtype=np.float64))
+        echeck(float(np.linalg.norm(right)) > 1e-9, 'The up vector must not be along the direction.')
+        right = right / np.linalg.norm(right)
+        echeck(extent > 0, 'The extent must be positive.')
+        echeck(width > 0 and height > 0, 'The image must have pixels.')
+        echeck(fov is None or 0 < fov < 180, 'The field of view must be between 0 and 180 degrees.')
+        self._target = np.asarray(target, dtype=np.float64)
+        # The rows are the right, up and forward axes of the camera.
+        self._axes = np.array([right, np.cross(right, forward), forward])
+        self._extent = extent
+        self._width = width
+        self._height = height
+        self._fov = fov
+
+    @staticmethod
+    def fit(
+        coordinates: np.ndarray,
+        radii: np.ndarray,
+        direction: Sequence[float] = (0.0, 0.0, -1.0),
+        up: Sequence[float] = (0.0, 1.0, 0.0),
+        width: int = 256,
+        height: int = 256,
+        fov: Optional[float] = None,
+        margin: float = 0.05,
+    ) -> 'Camera':
+        """Returns the camera that looks along direction at the spheres with the given centers and radii, with all of
+        them in the image and a margin (a fraction of the image) around them.
+        """
+        echeck(len(coordinates) > 0, 'There must be something to look at.')
+        axes = Camera(direction=direction, up=up)._axes
+        local = np.asarray(coordinates, dtype=np.float64) @ axes.T
+        low = (local - radii[:, None]).min(axis=0)
+        high = (local + radii[:, None]).max(axis=0)
+        center = (low + high) / 2
+        size = high - low
+        # The extent is across the shorter side of the image, so scale the other side to match.
+        extent = max(size[0] * min(width, height) / width, size[1] * min(width, height) / height) * (1 + 2 * margin)
+        target = center @ axes
+        if fov is not None:
+            # Stop the view at the front of the scene rather than at its middle, so nothing pokes out of the image.
+            target = (center - [0.0, 0.0, size[2] / 2]) @ axes
+        return Camera(target, direction, up, max(extent, 1e-9), width, height, fov)
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    def to_camera(self, coordinates: np.ndarray) -> np.ndarray:
+        """Returns the coordinates relative to the target in camera coordinates: x right, y up and z away from the
+        viewer.
+        """
+        return (np.asarray(coordinates, dtype=np.float64) - self._target) @ self._axes.T
+
+    def pixel_size(self) -> float:
+        """The size of a pixel at the target."""
+        return self._extent / min(self._width, self._height)
+
+    def eye_distance(self) -> Optional[float]:
+        """How far the eye is in front of the target, or None for an orthographic camera."""
+        if self._fov is None:
+            return None
+        return self._extent / 2 / tan(radians(self._fov) / 2)
+
+    def rays(self, rows: np.ndarray, columns: np.ndarray, near: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the origins and unit directions, in camera coordinates, of the rays through the centers of the given
+        pixels. Orthographic rays start at depth near, which has to be in front of everything that should be seen.
+        """
+        size = self.pixel_size()
+        x = (columns + 0.5 - self._width / 2) * size
+        y = (self._height / 2 - rows - 0.5) * size
+        distance = self.eye_distance()
+        if distance is None:
+            origins = np.column_stack((x, y, np.full_like(x, near)))
+            directions = np.tile([0.0, 0.0, 1.0], (len(x), 1))
+        else:
+            origins = np.tile([0.0, 0.0, -distance], (len(x), 1))
+            directions = np.column_stack((x, y, np.full_like(x, distance)))
+            directions /= np.linalg.norm(directions, axis=1)[:, None]
+        return origins, directions
+
+    def footprints(self, centers: np.ndarray, radii: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns the pixel column and row of the middle of each sphere (in camera coordinates) and a radius in pixels
+        that its outline is inside of. Spheres the camera can not see get a radius of -1.
+        """
+        size = self.pixel_size()
+        distance = self.eye_distance()
+        if distance is None:
+            scale = np.full(len(centers), 1 / size)
+            radius = radii * scale
+        else:
+            depth = centers[:, 2] + distance
+            visible = depth > radii
+            scale = np.where(visible, distance / np.where(visible, depth, 1.0), 0.0) / size
+            # The outline of a sphere seen in perspective is larger than its middle cross section, which projecting the
+            # radius from the depth of the front of the sphere covers, and off the axis it is also stretched away from
+            # the middle of the image, by up to the distance from the eye over the depth.
+            safe = np.where(visible, depth, 1.0)
+            stretch = np.sqrt(safe ** 2 + centers[:, 0] ** 2 + centers[:, 1] ** 2) / safe
+            radius = np.where(visible, radii * distance * stretch / np.where(visible, depth - radii, 1.0) / size, -1.0)
+        columns = centers[:, 0] * scale + self._width / 2
+        rows = self._height / 2 - centers[:, 1] * scale
+        return columns, rows, radius
+
+
+def render_atoms(
+    atomic_numbers: np.ndarray,
+    coordinates: np.ndarray,
+    camera: Optional[Camera] = None,
+    background: Optional[Tuple[int, int, int]] = None,
+) -> np.ndarray:
+    """Renders the space filling (CPK) model of the atoms and returns it as an H x W x 4 RGBA image. Each atom is a
+    sphere of its van der Waals radius in its CPK color, lit from the upper left. Every pixel casts a ray and keeps the
+    nearest sphere it hits, but to keep that fast the image is split into tiles and each ray is only tested against the
+    atoms whose outline covers its tile. Pixels that miss every atom get the background, which is transparent if None.
+    Without a camera, Camera.fit frames all of the atoms from the front.
+    """
+    atomic_numbers = np.asarray(atomic_numbers)
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 3)
+    echeck(len(coordinates) == len(atomic_numbers), 'There must be one position for every atom.')
+    radii = Element.van_der_waals_radii(atomic_numbers) if len(atomic_numbers) > 0 else np.zeros(0)
+    if camera is None:
+        camera = Camera.fit(coordinates, radii) if len(coordinates) > 0 else Camera()
+    image = np.zeros((camera.height, camera.width, 4), dtype=np.uint8)
+    if background is not None:
+        image[...] = list(background) + [255]
+    if len(coordinates) == 0:
+        return image
+
+    numbers, inverse = np.unique(atomic_numbers, return_inverse=True)
+    palette = np.array([color_rgb(name) for name in Element.cpk_colors(numbers)], dtype=np.float64).reshape(-1, 3)
+    colors = palette[inverse.reshape(-1)]
+    centers = camera.to_camera(coordinates)
+    near = float((centers[:, 2] - radii).min()) - 1.0
+
+    # File every atom under each tile its outline covers.
+    tile = PREVIEW_TILE_SIZE
+    tiles_across = -(-camera.width // tile)
+    tiles_down = -(-camera.height // tile)
+    columns, rows, reach = camera.footprints(centers, radii)
+    first_column = np.floor((columns - reach) / tile).astype(np.int64)
+    last_column = np.floor((columns + reach) / tile).astype(np.int64)
+    first_row = np.floor((rows - reach) / tile).astype(np.int64)
+    last_row = np.floor((rows + reach) / tile).astype(np.int64)
+    shown = (
+        (reach >= 0) & (last_column >= 0) & (first_column < tiles_across) & (last_row >= 0) & (first_row < tiles_down))
+    atoms = np.flatnonzero(shown)
+    first_column = np.clip(first_column[atoms], 0, tiles_across - 1)
+    last_column = np.clip(last_column[atoms], 0, tiles_across - 1)
+    first_row = np.clip(first_row[atoms], 0, tiles_down - 1)
+    last_row = np.clip(last_row[atoms], 0, tiles_down - 1)
+    spans = last_column - first_column + 1
+    counts = spans * (last_row - first_row + 1)
+    pair_atoms = np.repeat(atoms, counts)
+    steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    pair_tiles = (
+        (np.repeat(first_row, counts) + steps // np.repeat(spans, counts)) * tiles_across
+        + np.repeat(first_column, counts) + steps % np.repeat(spans, counts))
+    order = np.argsort(pair_tiles, kind='stable')
+    pair_atoms = pair_atoms[order]
+    tile_ids, starts, tile_counts = np.unique(pair_tiles[order], return_index=True, return_counts=True)
+
+    for tile_id, start, count in zip(tile_ids.tolist(), starts.tolist(), tile_counts.tolist()):
+        row0 = (tile_id // tiles_across) * tile
+        column0 = (tile_id % tiles_across) * tile
+        pixel_rows, pixel_columns = np.mgrid[
+            row0:min(row0 + tile, camera.height), column0:min(column0 + tile, camera.width)]
+        pixel_rows = pixel_rows.reshape(-1)
+        pixel_columns = pixel_columns.reshape(-1)
+        origins, directions = camera.rays(pixel_rows, pixel_columns, near)
+        nearest = np.full(len(origins), np.inf)
+        hit = np.full(len(origins), -1)
+        candidates = pair_atoms[start:start + count]
+        batch = max(1, PREVIEW_BATCH_SIZE // len(origins))
+        for first in range(0, len(candidates), batch):
+            chosen = candidates[first:first + batch]
+            # Solve |origin + t direction - center| = radius for the nearest t of every ray and atom.
+            offsets = origins[:, None, :] - centers[chosen][None, :, :]
+            b = np.einsum('ijk,ik->ij', offsets, directions)
+            c = np.einsum('ijk,ijk->ij', offsets, offsets) - radii[chosen][None, :] ** 2
+            discriminant = b * b - c
+            distance = np.where(discriminant > 0, -b - np.sqrt(np.maximum(discriminant, 0)), np.inf)
+            distance = np.where(distance > 0, distance, np.inf)
+            best = np.argmin(distance, axis=1)
+            best_distance = distance[np.arange(len(origins)), best]
+            closer = best_distance < nearest
+            nearest[closer] = best_distance[closer]
+            hit[closer] = chosen[best[closer]]
+
+        found = hit >= 0
+        if not np.any(found):
+            continue
+        atom = hit[found]
+        points = origins[found] + nearest[found, None] * directions[found]
+        normals = (points - centers[atom]) / radii[atom, None]
+        diffuse = np.clip(normals @ PREVIEW_LIGHT, 0, None)
+        halfway = PREVIEW_LIGHT - directions[found]
+        halfway /= np.linalg.norm(halfway, axis=1)[:, None]
+        specular = np.clip(np.einsum('ij,ij->i', normals, halfway), 0, None) ** PREVIEW_SHININESS
+        shaded = (
+            colors[atom] * (PREVIEW_AMBIENT + PREVIEW_DIFFUSE * diffuse)[:, None]
+            + 255 * PREVIEW_SPECULAR * specular[:, None])
+        image[pixel_rows[found], pixel_columns[found], :3] = np.clip(shaded, 0, 255).astype(np.uint8)
+        image[pixel_rows[found], pixel_columns[found], 3] = 255
+    return image
@@ -0,0 +1,226 @@
+#
+# sdf_utils.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Callable, Deque, Dict, Final, Iterator, List, Optional, TextIO, Tuple, Type, Union
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+import gzip
+from src.atoms.element import Element
+from src.molecules.bond_topology import BondTopology
+from src.molecules.molecule_positions import MoleculePositions
+from src.utils.echeck import echeck
+from src.utils.constants import pm
+import numpy as np
+
+"""
+Maps the bond types of the MOL format to the bond orders we model. Aromatic bonds (type 4) sit in rigid rings, so just
+like the single bonds in adenine's rings they are modelled as fixed (order 2) bonds.
+"""
+MOL_BOND_ORDERS: Final[Dict[int, int]] = {1: 1, 2: 2, 3: 3, 4: 2}
+
+
+def iter_sdf_records(stream: TextIO) -> Iterator[str]:
+    """This function reads an SDF file from the given text stream and yields the text of each record (everything up to,
+    but not including, the $$$$ line) one at a time. A MOL file is a single record without the $$$$ line.
+    """
+    lines: List[str] = []
+    for line in stream:
+        if line.startswith('$$$$'):
+            yield ''.join(lines)
+            lines = []
+        else:
+            lines.append(line)
+    if any(line.strip() for line in lines):
+        yield ''.join(lines)
+
+
+def molecule_position_from_molfile(record: str) -> MoleculePositions:
+    """This function parses the molfile (V2000 or V3000) at the start of an SDF record and returns a MoleculePositions
+    object with the positions of the atoms in the molecule and the bond orders between them.
+
+    Args:
+        record: The text of the record.
+
+    Returns:
+        A MoleculePositions object with the positions of the atoms in the molecule.
+    """
+    lines = record.splitlines()
+    echeck(len(lines) >= 4, 'A molfile must have a header and a counts line.')
+    if 'V3000' in lines[3]:
+        return _molecule_position_from_v3000(lines)
+    return _molecule_position_from_v2000(lines)
+
+
+def _molecule_position(
+    symbols: List[str],
+    coordinates: List[List[float]],
+    atoms1: List[int],
+    atoms2: List[int],
+    types: List[int],
+) -> MoleculePositions:
+    """Builds the MoleculePositions from the parsed molfile columns, where the atom indices are 0 based."""
+    for bond_type in types:
+        echeck(bond_type in MOL_BOND_ORDERS, 'Unsupported molfile bond type {}.'.format(bond_type))
+    elements = [Element.from_symbol(symbol) for symbol in symbols]
+    # The coordinates are in angstroms, so we need to convert them to pm.
+    array = np.array(coordinates, dtype=np.float64).reshape(-1, 3) * (100 * pm)
+    bonds = BondTopology(len(elements), atoms1, atoms2, [MOL_BOND_ORDERS[bond_type] for bond_type in types])
+    return MoleculePositions.from_arrays(elements, array, bonds)
+
+
+def _molecule_position_from_v2000(lines: List[str]) -> MoleculePositions:
+    """Parses the fixed width atom and bond blocks of a V2000 molfile."""
+    num_atoms = int(lines[3][0:3])
+    num_bonds = int(lines[3][3:6])
+    echeck(len(lines) >= 4 + num_atoms + num_bonds, 'The molfile is missing atom or bond lines.')
+
+    symbols = []
+    coordinates = []
+    for line in lines[4:4 + num_atoms]:
+        coordinates.append([float(line[0:10]), float(line[10:20]), float(line[20:30])])
+        symbols.append(line[31:34].strip())
+
+    atoms1 = []
+    atoms2 = []
+    types = []
+    for line in lines[4 + num_atoms:4 + num_atoms + num_bonds]:
+        atoms1.append(int(line[0:3]) - 1)
+        atoms2.append(int(line[3:6]) - 1)
+        types.append(int(line[6:9]))
+
+    return _molecule_position(symbols, coordinates, atoms1, atoms2, types)
+
+
+def _molecule_position_from_v3000(lines: List[str]) -> MoleculePositions:
+    """Parses the CTAB block of a V3000 molfile. Here every line starts with 'M  V30' and a trailing '-' continues the
+    line onto the next one.
+    """
+    entries = []
+    pending = ''
+    for line in lines[4:]:
+        if line.startswith('M  END'):
+            break
+        if not line.startswith('M  V30 '):
+            continue
+        content = pending + line[7:].rstrip()
+        if content.endswith('-'):
+            pending = content[:-1]
+            continue
+        pending = ''
+        entries.append(content)
+
+    symbols = []
+    coordinates = []
+    atom_ids = []
+    bonds: List[List[int]] = []
+    block = None
+    for entry in entries:
+        fields = entry.split()
+        if fields[0] == 'BEGIN':
+            block = fields[1]
+        elif fields[0] == 'END':
+            block = None
+        elif block == 'ATOM':
+            atom_ids.append(int(fields[0]))
+            symbols.append(fields[1])
+            coordinates.append([float(fields[2]), float(fields[3]), float(fields[4])])
+        elif block == 'BOND':
+            bonds.append([int(fields[1]), int(fields[2]), int(fields[3])])
+
+    # V3000 atom ids do not need to be consecutive, so we map them to the index of the atom.
+    indices = {atom_id: index for index, atom_id in enumerate(atom_ids)}
+    return _molecule_position(
+        symbols,
+        coordinates,
+        [indices[bond[1]] for bond in bonds],
+        [indices[bond[2]] for bond in bonds],
+        [bond[0] for bond in bonds])
+
+
+"""
+The errors a record that can not be parsed raises: echeck's ValueError, and the IndexError and KeyError of lines
+that are too short or bonds to atoms that are not there.
+"""
+RECORD_ERRORS: Final[Tuple[Type[Exception], ...]] = (ValueError, IndexError, KeyError)
+
+
+def _molecule_positions_from_records(
+    records: List[str],
+    skip: bool,
+) -> List[Union[MoleculePositions, Tuple[str]]]:
+    """Parses a chunk of records. This is a module level function so it can be run in a worker process. If skip is True
+    a record that can not be parsed gives a 1-tuple with its error rather than stopping the chunk.
+    """
+    results: List[Union[MoleculePositions, Tuple[str]]] = []
+    for record in records:
+        try:
+            results.append(molecule_position_from_molfile(record))
+        except RECORD_ERRORS as e:
+            if not skip:
+                raise
+            results.append(('{}: {}'.format(type(e).__name__, e),))
+    return results
+
+
+def iter_molecule_positions_from_sdf(
+    path: Union[str, Path],
+    processes: Optional[int] = None,
+    chunk_records: int = 256,
+    errors: str = 'raise',
+    on_error: Optional[Callable[[int, str], None]] = None,
+) -> Iterator[MoleculePositions]:
+    """This function streams an SDF or MOL file, which may be gzip compressed (.gz), and yields a MoleculePositions
+    object for every record in it, in the order they appear in the file.
+
+    Args:
+        path: The path to the sdf (or sdf.gz) file.
+        processes: If given, the records are parsed in chunks by a pool with this many worker processes. Only a few
+            chunks per worker are in flight at any time, so memory stays bounded however large the file is.
+        chunk_records: The number of records sent to a worker at a time.
+        errors: 'raise' to stop at the first record that can not be parsed, or 'skip' to leave such records out and go
+            on with the rest of the file, which is what large dumps with the odd unsupported record need.
+        on_error: Called with the index of each skipped record in the file (counting from 0) and its error.
+
+    Returns:
+        An iterator over the MoleculePositions of each record.
+    """
+    echeck(errors in ('raise', 'skip'), "errors must be 'raise' or 'skip', not {!r}.".format(errors))
+    skip = errors == 'skip'
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt') as stream:
+        records = iter_sdf_records(stream)
+        index = 0
+
+        def results(chunk: List[Union[MoleculePositions, Tuple[str]]]) -> Iterator[MoleculePositions]:
+            nonlocal index
+            for result in chunk:
+                if isinstance(result, tuple):
+                    if on_error is not None:
+                        on_error(index, result[0])
+                else:
+                    yield result
+                index += 1
+
+        if processes is None or processes <= 1:
+            for record in records:
+                yield from results(_molecule_positions_from_records([record], skip))
+            return
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            in_flight: Deque[Future] = deque()
+            while True:
+                # Keep every worker busy while the main process reads ahead, but never more than two chunks each.
+                while len(in_flight) < 2 * processes:
+                    chunk = list(islice(records, chunk_records))
+                    if len(chunk) == 0:
+                        break
+                    in_flight.append(executor.submit(_molecule_positions_from_records, chunk, skip))
+                if len(in_flight) == 0:
+                    return
+                yield from results(in_flight.popleft().result())
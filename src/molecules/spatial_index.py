@@ -0,0 +1,88 @@
+#
+# spatial_index.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from math import ceil
+from typing import Optional
+import numpy as np
+from src.atoms.element import Element
+from src.molecules.molecule_positions import MoleculePositions
+from src.utils.echeck import echeck
+
+
+class SpatialIndex(object):
+    """This is a uniform cell grid over the atoms of a MoleculePositions object. Space is divided into cubes of side
+    cell_size and every atom is filed under the cube that contains it, so finding the atoms near a given atom only needs
+    to look at the handful of cubes around it instead of every atom in the molecule.
+
+    By default the cell size is the largest van der Waals diameter in the molecule, which is the furthest apart two
+    atoms can be and still change each other's shape. With that size every relevant neighbor is in one of the 27 cells
+    surrounding an atom.
+    """
+
+    def __init__(
+        self,
+        positions: MoleculePositions,
+        cell_size: Optional[float] = None,
+    ) -> None:
+        self._positions = positions
+        coordinates = positions.coordinates.astype(np.float64)
+        if cell_size is None:
+            radii = Element.van_der_waals_radii(positions.atomic_numbers)
+            cell_size = 2 * float(radii.max()) if len(radii) > 0 else 1.0
+        echeck(cell_size > 0, 'The cell size must be greater than 0.')
+        self._cell_size = cell_size
+        self._coordinates = coordinates
+
+        # Compute the integer cell of each atom, then sort the atoms by cell so each cell is a contiguous run of the
+        # sorted order that we can find with a binary search.
+        self._origin = coordinates.min(axis=0) if len(coordinates) > 0 else np.zeros(3)
+        cells = np.floor((coordinates - self._origin) / cell_size).astype(np.int64)
+        self._shape = cells.max(axis=0) + 1 if len(cells) > 0 else np.ones(3, dtype=np.int64)
+        self._cells = cells
+        keys = self.__cell_keys(cells)
+        self._order = np.argsort(keys, kind='stable')
+        self._keys, self._starts, counts = np.unique(keys[self._order], return_index=True, return_counts=True)
+        self._ends = self._starts + counts
+
+    @property
+    def positions(self) -> MoleculePositions:
+        return self._positions
+
+    @property
+    def cell_size(self) -> float:
+        return self._cell_size
+
+    def __cell_keys(self, cells: np.ndarray) -> np.ndarray:
+        """Flattens integer cell coordinates into a single integer key per cell."""
+        return (cells[..., 0] * self._shape[1] + cells[..., 1]) * self._shape[2] + cells[..., 2]
+
+    def neighbors_within(
+        self,
+        index: int,
+        radius: float,
+    ) -> np.ndarray:
+        """Returns the indices, in increasing order, of the atoms other than index whose centers are strictly closer
+        than radius to the center of the atom at index.
+        """
+        reach = max(1, ceil(radius / self._cell_size))
+        center = self._cells[index]
+        low = np.maximum(center - reach, 0)
+        high = np.minimum(center + reach, self._shape - 1)
+        grid = np.mgrid[low[0]:high[0] + 1, low[1]:high[1] + 1, low[2]:high[2] + 1].reshape(3, -1).T
+        keys = self.__cell_keys(grid)
+
+        # Only some of the surrounding cells have atoms in them, find those and gather their atoms.
+        slots = np.minimum(np.searchsorted(self._keys, keys), len(self._keys) - 1)
+        slots = slots[self._keys[slots] == keys]
+        if len(slots) == 0:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate([self._order[self._starts[s]:self._ends[s]] for s in slots.tolist()])
+        candidates = candidates[candidates != index]
+
+        deltas = self._coordinates[candidates] - self._coordinates[index]
+        distances = np.sqrt(np.einsum('ij,ij->i', deltas, deltas))
+        return np.sort(candidates[distances < radius])
@@ -0,0 +1,46 @@
+#
+# test_bond_topology.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import numpy as np
+from src.molecules.bond_topology import BondTopology
+
+
+class TestBondTopology(unittest.TestCase):
+
+    def test_works(self):
+        # A chain 0-1-2 with a double bond between 1 and 2, and a lone atom 3.
+        bonds = BondTopology(4, [0, 1], [1, 2], [1, 2])
+        self.assertEqual(2, len(bonds))
+
+        mates, orders = bonds.bonds(1)
+        self.assertEqual([0, 2], mates.tolist())
+        self.assertEqual([1, 2], orders.tolist())
+        self.assertEqual(2, bonds.bond_order(2, 1))
+        self.assertEqual(0, bonds.bond_order(0, 2))
+        self.assertEqual(0, bonds.degree(3))
+
+        # Changing the orders in place is seen by the lookups.
+        bonds.orders[bonds.orders == 1] = 2
+        self.assertEqual(2, bonds.bond_order(0, 1))
+
+    def test_dense_round_trip(self):
+        dense = np.array([
+            [0, 1, 0],
+            [1, 0, 2],
+            [0, 2, 0]])
+        bonds = BondTopology.from_dense(dense)
+        self.assertEqual(2, len(bonds))
+        np.testing.assert_array_equal(dense, bonds.to_dense())
+
+    def test_invalid_bonds(self):
+        with self.assertRaises(ValueError):
+            BondTopology(2, [0], [0], [1])
+        with self.assertRaises(ValueError):
+            BondTopology(2, [0], [2], [1])
+        with self.assertRaises(ValueError):
+            BondTopology(2, [0], [1], [1, 2])
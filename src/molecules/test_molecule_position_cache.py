@@ -0,0 +1,87 @@
+#
+# test_molecule_position_cache.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import json
+import shutil
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+import numpy as np
+from src.molecules.molecule_position_cache import (
+    default_cache_directory, load_positions, molecule_position_from_pubchem_file, save_positions)
+from src.molecules.molecule_position_utils import molecule_position_from_pubchem
+
+DATA_DIRECTORY = Path(__file__).resolve().parent.parent / 'data/pubchem'
+
+
+class TestMoleculePositionCache(unittest.TestCase):
+
+    def assertPositionsEqual(self, expected, actual):
+        self.assertEqual(expected.elements, actual.elements)
+        np.testing.assert_array_equal(expected.coordinates, actual.coordinates)
+        np.testing.assert_array_equal(expected.bonds.to_dense(), actual.bonds.to_dense())
+        self.assertEqual(expected.labels, actual.labels)
+
+    def test_save_and_load(self):
+        with open(DATA_DIRECTORY / 'adenine.json') as f:
+            positions = molecule_position_from_pubchem(json.load(f))
+        labeled = type(positions).from_arrays(
+            positions.elements, positions.coordinates, positions.bonds, [str(i) for i in range(len(positions))])
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'adenine.npz'
+            save_positions(path, labeled)
+            self.assertPositionsEqual(labeled, load_positions(path))
+
+    def test_pubchem_files_are_cached(self):
+        with TemporaryDirectory() as directory:
+            cache_directory = Path(directory) / 'cache'
+            for name in ['fluoxetine', 'methylphenidate']:
+                with open(DATA_DIRECTORY / '{}.json'.format(name)) as f:
+                    expected = molecule_position_from_pubchem(json.load(f))
+                # The first call parses the json and fills the cache, the second reads back the cached copy.
+                first = molecule_position_from_pubchem_file(DATA_DIRECTORY / '{}.json'.format(name), cache_directory)
+                second = molecule_position_from_pubchem_file(DATA_DIRECTORY / '{}.json'.format(name), cache_directory)
+                self.assertPositionsEqual(expected, first)
+                self.assertPositionsEqual(expected, second)
+            self.assertEqual(2, len(list(cache_directory.iterdir())))
+
+            # Changing the source file changes its hash, so it gets a new cache entry.
+            water = Path(directory) / 'water.json'
+            shutil.copy(DATA_DIRECTORY / 'water.json', water)
+            molecule_position_from_pubchem_file(water, cache_directory)
+            with open(water) as f:
+                record = json.load(f)
+            record['PC_Compounds'][0]['coords'][0]['conformers'][0]['x'][0] = 0.0
+            with open(water, 'w') as f:
+                json.dump(record, f)
+            changed = molecule_position_from_pubchem_file(water, cache_directory)
+            self.assertEqual(0.0, changed.coordinates[0][0])
+            self.assertEqual(4, len(list(cache_directory.iterdir())))
+
+    def test_damaged_cache_files_are_replaced(self):
+        with TemporaryDirectory() as directory:
+            cache_directory = Path(directory) / 'cache'
+            path = DATA_DIRECTORY / 'adenine.json'
+            with open(path) as f:
+                expected = molecule_position_from_pubchem(json.load(f))
+            molecule_position_from_pubchem_file(path, cache_directory)
+            (cache_path,) = cache_directory.iterdir()
+            data = cache_path.read_bytes()
+            # A half written file, and one cut off inside the header of its first array.
+            for damaged in [data[:len(data) // 2], data[:40]]:
+                cache_path.write_bytes(damaged)
+                self.assertPositionsEqual(expected, molecule_position_from_pubchem_file(path, cache_directory))
+                self.assertEqual(data, cache_path.read_bytes())
+
+    def test_default_cache_directory(self):
+        # The environment variable is read when the cache is used, not when the module is imported.
+        with TemporaryDirectory() as directory:
+            with patch.dict('os.environ', {'BALLS_AND_STICKS_CACHE': directory}):
+                self.assertEqual(Path(directory) / 'positions', default_cache_directory())
+                molecule_position_from_pubchem_file(DATA_DIRECTORY / 'water.json')
+                self.assertEqual(1, len(list((Path(directory) / 'positions').iterdir())))
@@ -0,0 +1,64 @@
+#
+# test_molecule_position_utils.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import copy
+import gzip
+import io
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import numpy as np
+from src.molecules.molecule_position_utils import (
+    iter_molecule_positions_from_pubchem, iter_pubchem_compounds, molecule_position_from_pubchem_compound)
+
+DATA_DIRECTORY = Path(__file__).resolve().parent.parent / 'data/pubchem'
+
+
+class TestMoleculePositionUtils(unittest.TestCase):
+
+    def setUp(self):
+        """We build an export with several compounds, where adenine has a second (shifted) conformer."""
+        self.compounds = []
+        for name in ['water', 'adenine', 'fluoxetine', 'methylphenidate']:
+            with open(DATA_DIRECTORY / '{}.json'.format(name)) as f:
+                self.compounds.append(json.load(f)['PC_Compounds'][0])
+        conformers = self.compounds[1]['coords'][0]['conformers']
+        shifted = copy.deepcopy(conformers[0])
+        shifted['x'] = [x + 1.0 for x in shifted['x']]
+        conformers.append(shifted)
+        self.export = json.dumps({'PC_Compounds': self.compounds}, indent=2)
+
+    def test_iter_pubchem_compounds(self):
+        # A tiny chunk size makes sure compounds and keys split across reads are handled.
+        for chunk_size in [1, 7, 1 << 16]:
+            compounds = list(iter_pubchem_compounds(io.StringIO(self.export), chunk_size))
+            self.assertEqual(self.compounds, compounds)
+
+        self.assertEqual([], list(iter_pubchem_compounds(io.StringIO('{"PC_Compounds": [ ]}'))))
+        with self.assertRaises(ValueError):
+            list(iter_pubchem_compounds(io.StringIO('{"Other": []}')))
+        with self.assertRaises(ValueError):
+            list(iter_pubchem_compounds(io.StringIO(self.export[:len(self.export) // 2])))
+
+    def test_iter_molecule_positions_from_pubchem(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'export.json.gz'
+            with gzip.open(path, 'wt') as f:
+                f.write(self.export)
+            positions = list(iter_molecule_positions_from_pubchem(path, chunk_size=100))
+
+        # Every conformer of every compound is produced in order.
+        self.assertEqual(5, len(positions))
+        self.assertEqual(3, len(positions[0]))
+        self.assertEqual(15, len(positions[1]))
+        self.assertEqual(15, len(positions[2]))
+        expected = molecule_position_from_pubchem_compound(self.compounds[1], 1)
+        np.testing.assert_array_equal(expected.coordinates, positions[2].coordinates)
+        np.testing.assert_allclose(
+            positions[1].coordinates + [expected.coordinates[0][0] - positions[1].coordinates[0][0], 0.0, 0.0],
+            positions[2].coordinates)
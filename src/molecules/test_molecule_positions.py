@@ -6,6 +6,8 @@
 #
 
 import unittest
+from math import sqrt
+import numpy as np
 from src.atoms.atom_position import AtomPosition
 from src.atoms.element import Element
 from src.molecules.molecule_positions import MoleculePositions
@@ -57,3 +59,69 @@ class TestMoleculePositions(unittest.TestCase):
         self.assertAlmostEqual(0.0, positions.atoms[2].position.x)
         self.assertAlmostEqual(1.0, positions.atoms[2].position.y)
         self.assertAlmostEqual(1.0, positions.atoms[2].position.z)
+
+    def test_atoms_are_views(self):
+        positions = MoleculePositions([
+            AtomPosition(Element.H, Point(0.0, 0.0, 1.0)),
+            AtomPosition(Element.He, Point(1.0, 0.0, 0.0))])
+        atoms = positions.atoms
+
+        # Moving the molecule is visible through the existing atoms and moving an atom is visible in the molecule.
+        positions.translate(Point(1.0, 2.0, 3.0))
+        self.assertAlmostEqual(4.0, atoms[0].position.z)
+        atoms[1].translate(Point(0.0, 0.0, 1.0))
+        self.assertAlmostEqual(4.0, positions.coordinates[1][2])
+
+        # Rotating around the z-axis keeps the z-coordinate.
+        positions.rotate_degrees(90.0)
+        self.assertAlmostEqual(-2.0, atoms[0].position.x)
+        self.assertAlmostEqual(1.0, atoms[0].position.y)
+        self.assertAlmostEqual(4.0, atoms[0].position.z)
+
+    def test_bond_orders_are_read_only(self):
+        positions = MoleculePositions([
+            AtomPosition(Element.H, Point(0.0, 0.0, 0.0)),
+            AtomPosition(Element.H, Point(1.0, 0.0, 0.0))], np.array([[0, 1], [1, 0]]))
+        self.assertEqual(1, positions.bond_orders[0][1])
+        # Writing to the matrix would be lost, so it raises. The orders are changed through the bonds instead.
+        with self.assertRaises(ValueError):
+            positions.bond_orders[0][1] = 2
+        positions.bonds.orders[0] = 2
+        self.assertEqual(2, positions.bond_orders[1][0])
+
+    def test_3d_rotations(self):
+        positions = MoleculePositions([
+            AtomPosition(Element.H, Point(1.0, 0.0, 0.0)),
+            AtomPosition(Element.He, Point(0.0, 1.0, 0.0))])
+
+        # Rotating 90 degrees about the y-axis takes the x-axis to the -z-axis.
+        positions.rotate_axis_degrees(Point(0.0, 1.0, 0.0), 90.0)
+        np.testing.assert_allclose(positions.coordinates, [[0.0, 0.0, -1.0], [0.0, 1.0, 0.0]], atol=1e-12)
+
+        # The same rotation in reverse as a quaternion.
+        half = sqrt(0.5)
+        positions.rotate_quaternion(half, 0.0, -half, 0.0)
+        np.testing.assert_allclose(positions.coordinates, [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], atol=1e-12)
+
+    def test_float32_storage(self):
+        positions = MoleculePositions.from_arrays(
+            [Element.H, Element.O], np.array([[0.0, 0.0, 0.0], [1.0, 1.0, 0.0]], dtype=np.float32))
+        positions.translate(Point(0.5, 0.0, 0.0))
+        positions.rotate_degrees(45.0)
+        self.assertEqual(np.float32, positions.coordinates.dtype)
+        self.assertAlmostEqual(sqrt(2.0), positions.atoms[1].position.y - positions.atoms[0].position.y, places=5)
+
+    def test_neighbor_geometry(self):
+        positions = MoleculePositions([
+            AtomPosition(Element.C, Point(1.0, 1.0, 1.0)),
+            AtomPosition(Element.H, Point(1.0 + sqrt(0.5), 1.0 + sqrt(0.5), 2.0)),
+            AtomPosition(Element.H, Point(0.0, 1.0, 1.0))])
+
+        distances, inclinations, azimuths = positions.neighbor_geometry(0)
+        for i, (distance, inclination, azimuth) in enumerate(zip(distances, inclinations, azimuths)):
+            direction = positions.atoms[i + 1].position - positions.atoms[0].position
+            self.assertAlmostEqual(direction.magnitude(), distance)
+            self.assertAlmostEqual(direction.get_inclination_angle(), inclination)
+            self.assertAlmostEqual(direction.get_azimuthal_angle(), azimuth)
+        self.assertAlmostEqual(45.0, inclinations[0])
+        self.assertAlmostEqual(180.0, azimuths[1])
@@ -0,0 +1,134 @@
+#
+# test_pdb_utils.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from src.atoms.element import Element
+from src.molecules.pdb_utils import (
+    iter_molecule_positions_from_mmcif, iter_molecule_positions_from_pdb, molecule_position_from_mmcif,
+    molecule_position_from_pdb)
+from src.utils.constants import pm
+
+# Two models of the phosphate and sugar oxygen of a nucleotide. The second atom has two alternate locations and the last
+# atom of the first model has no element column.
+PDB = """HEADER    DNA
+MODEL        1
+ATOM      1  P    DG A  12       1.000   2.000   3.000  1.00  0.00           P
+ATOM      2  OP1A DG A  12       4.000   5.000   6.000  0.50  0.00           O
+ATOM      3  OP1B DG A  12       9.000   9.000   9.000  0.50  0.00           O
+ATOM      4  C1'  DG A  12      -1.500   0.000  10.250  1.00  0.00
+ENDMDL
+MODEL        2
+ATOM      1  P    DG A  12       1.100   2.000   3.000  1.00  0.00           P
+ATOM      2  OP1  DG A  12       4.100   5.000   6.000  1.00  0.00           O
+ATOM      3  C1'  DG A  12      -1.400   0.000  10.250  1.00  0.00           C
+ENDMDL
+END
+"""
+
+PDB_WITHOUT_ELEMENTS = """ATOM      1  CA  GLY A   1       0.000   0.000   0.000  1.00  0.00
+HETATM    2 CA    CA A 101       1.000   0.000   0.000  1.00  0.00
+HETATM    3 FE   HEM A 102       2.000   0.000   0.000  1.00  0.00
+HETATM    4 CL1  HEM A 102       3.000   0.000   0.000  1.00  0.00
+ATOM      5 1HB  ALA A   2       4.000   0.000   0.000  1.00  0.00
+ATOM      6 HG21 THR A   3       5.000   0.000   0.000  1.00  0.00
+HETATM    7 ZN    ZN A 103       6.000   0.000   0.000  1.00  0.00
+"""
+
+# Alternate locations that are not lettered from A, where the first one in the file is kept.
+PDB_ALTERNATE_LOCATIONS = """ATOM      1  N   SER A   5       1.000   0.000   0.000  1.00  0.00           N
+ATOM      2  OG BSER A   5       2.000   0.000   0.000  0.60  0.00           O
+ATOM      3  OG CSER A   5       3.000   0.000   0.000  0.40  0.00           O
+ATOM      4  OG BSER A   6       4.000   0.000   0.000  0.60  0.00           O
+ATOM      5  OG ASER A   6       5.000   0.000   0.000  0.40  0.00           O
+"""
+
+MMCIF = """data_test
+#
+_entry.id TEST
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.auth_asym_id
+_atom_site.auth_seq_id
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.pdbx_PDB_model_num
+ATOM 1 P P . DG A 12 1.000 2.000 3.000 1
+ATOM 2 O OP1 A DG A 12 4.000 5.000 6.000 1
+ATOM 3 O OP1 B DG A 12 9.000 9.000 9.000 1
+ATOM 4 C "C1'" . DG A 12
+-1.500 0.000 10.250 1
+ATOM 1 P P . DG A 12 1.100 2.000 3.000 2
+ATOM 2 O OP1 . DG A 12 4.100 5.000 6.000 2
+ATOM 3 C "C1'" . DG A 12 -1.400 0.000 10.250 2
+#
+"""
+
+
+class TestPdbUtils(unittest.TestCase):
+
+    def assertModels(self, models):
+        self.assertEqual(2, len(models))
+        first, second = models
+        self.assertEqual([Element.P, Element.O, Element.C], first.elements)
+        self.assertEqual(["A:DG12:P", "A:DG12:OP1", "A:DG12:C1'"], first.labels)
+        self.assertAlmostEqual(400 * pm, first.coordinates[1][0])
+        self.assertAlmostEqual(1025 * pm, first.coordinates[2][2])
+        self.assertEqual(3, len(second))
+        self.assertAlmostEqual(-140 * pm, second.coordinates[2][0])
+
+    def test_pdb(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'test.pdb'
+            path.write_text(PDB)
+            self.assertModels(list(iter_molecule_positions_from_pdb(path)))
+            self.assertAlmostEqual(110 * pm, molecule_position_from_pdb(path, 1).coordinates[0][0])
+            with self.assertRaises(ValueError):
+                molecule_position_from_pdb(path, 2)
+
+            # Files without MODEL records are a single model.
+            path.write_text(''.join(line + '\n' for line in PDB.splitlines()[2:6]))
+            models = list(iter_molecule_positions_from_pdb(path))
+            self.assertEqual(1, len(models))
+            self.assertEqual([Element.P, Element.O, Element.C], models[0].elements)
+
+    def test_pdb_element_from_name(self):
+        # Without an element column the element is right justified in the first two columns of the atom name.
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'test.pdb'
+            path.write_text(PDB_WITHOUT_ELEMENTS)
+            positions = molecule_position_from_pdb(path)
+            self.assertEqual(
+                [Element.C, Element.Ca, Element.Fe, Element.Cl, Element.H, Element.H, Element.Zn], positions.elements)
+
+    def test_pdb_first_alternate_location(self):
+        # The first alternate location of each atom is kept even when it is not A.
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'test.pdb'
+            path.write_text(PDB_ALTERNATE_LOCATIONS)
+            positions = molecule_position_from_pdb(path)
+            self.assertEqual(["A:SER5:N", "A:SER5:OG", "A:SER6:OG"], positions.labels)
+            self.assertAlmostEqual(200 * pm, positions.coordinates[1][0])
+            self.assertAlmostEqual(400 * pm, positions.coordinates[2][0])
+
+    def test_mmcif(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'test.cif'
+            path.write_text(MMCIF)
+            self.assertModels(list(iter_molecule_positions_from_mmcif(path)))
+            self.assertAlmostEqual(110 * pm, molecule_position_from_mmcif(path, 1).coordinates[0][0])
+            # The first alternate location is kept whatever its letter.
+            path.write_text(MMCIF.replace('OP1 A', 'OP1 C'))
+            self.assertModels(list(iter_molecule_positions_from_mmcif(path)))
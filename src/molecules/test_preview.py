@@ -0,0 +1,147 @@
+#
+# test_preview.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import struct
+import zlib
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+import numpy as np
+from src.atoms.atom_position import AtomPosition
+from src.atoms.element import Element
+from src.molecules.molecule_representation import MoleculeRepresentation
+from src.molecules import preview
+from src.molecules.preview import Camera, render_atoms
+from src.utils.colors import color_rgb
+from src.utils.png import png_bytes
+from src.utils.point import Point
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """Decodes the unfiltered 8 bit RGB or RGBA PNGs that png_bytes writes."""
+    width, height, depth, kind = struct.unpack('>IIBB', data[16:26])
+    channels = 4 if kind == 6 else 3
+    position = 8
+    compressed = b''
+    while position < len(data):
+        length = struct.unpack('>I', data[position:position + 4])[0]
+        if data[position + 4:position + 8] == b'IDAT':
+            compressed += data[position + 8:position + 8 + length]
+        position += 12 + length
+    rows = np.frombuffer(zlib.decompress(compressed), dtype=np.uint8).reshape(height, 1 + width * channels)
+    return rows[:, 1:].reshape(height, width, channels)
+
+
+class TestPreview(unittest.TestCase):
+
+    def test_png_bytes(self):
+        image = np.random.default_rng(1).integers(0, 256, (5, 7, 4), dtype=np.uint8)
+        data = png_bytes(image)
+        self.assertEqual(data[:8], b'\x89PNG\r\n\x1a\n')
+        self.assertEqual(data[12:16], b'IHDR')
+        self.assertTrue(np.array_equal(decode_png(data), image))
+        self.assertTrue(data.endswith(b'IEND\xaeB`\x82'))
+        self.assertTrue(np.array_equal(decode_png(png_bytes(image[..., :3])), image[..., :3]))
+        with self.assertRaises(ValueError):
+            png_bytes(np.zeros((5, 7), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            png_bytes(np.zeros((5, 7, 3), dtype=np.float64))
+
+    def test_single_atom(self):
+        extent = 4 * Element.O.van_der_waals_radius
+        for fov in [None, 40.0]:
+            image = render_atoms(np.array([8]), np.zeros((1, 3)), Camera(extent=extent, width=64, height=48, fov=fov))
+            self.assertEqual(image.shape, (48, 64, 4))
+            self.assertEqual(image[24, 32, 3], 255)
+            self.assertEqual(image[0, 0, 3], 0)
+            self.assertEqual(image[47, 63, 3], 0)
+            # Oxygen is red.
+            self.assertGreater(int(image[24, 32, 0]), 2 * int(image[24, 32, 1]))
+
+    def test_outline(self):
+        # The outline of an orthographic sphere is its radius, a perspective one is a little larger.
+        radius = Element.O.van_der_waals_radius
+        camera = Camera(extent=4 * radius, width=101, height=101)
+        image = render_atoms(np.array([8]), np.zeros((1, 3)), camera)
+        self.assertAlmostEqual(int(np.count_nonzero(image[50, :, 3])), 101 / 4 * 2, delta=2)
+        perspective = render_atoms(
+            np.array([8]), np.zeros((1, 3)), Camera(extent=4 * radius, width=101, height=101, fov=60.0))
+        self.assertGreater(np.count_nonzero(perspective[50, :, 3]), np.count_nonzero(image[50, :, 3]))
+
+    def test_nearest_atom_wins(self):
+        # A carbon in front of an oxygen hides it, from either side.
+        numbers = np.array([8, 6])
+        coordinates = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 5.0]])
+        carbon = np.array(color_rgb(Element.C.cpk_color))
+        oxygen = np.array(color_rgb(Element.O.cpk_color))
+        for direction, expected in [((0.0, 0.0, -1.0), carbon), ((0.0, 0.0, 1.0), oxygen)]:
+            for fov in [None, 30.0]:
+                camera = Camera(direction=direction, extent=30.0, width=32, height=32, fov=fov)
+                pixel = render_atoms(numbers, coordinates, camera)[16, 16, :3].astype(np.float64)
+                self.assertGreater(pixel @ expected / np.linalg.norm(expected) / np.linalg.norm(pixel), 0.99)
+
+    def test_wide_angle_tiles(self):
+        # An atom far off the axis of a wide camera is stretched across more tiles than its round outline would cover,
+        # and the tiled render has to match one done in a single tile.
+        camera = Camera(extent=100.0, width=256, height=256, fov=140.0)
+        depth = 20.0 + camera.eye_distance()
+        coordinates = np.array([[depth * np.tan(np.radians(60.0)), 0.0, -20.0]])
+        image = render_atoms(np.array([6]), coordinates, camera)
+        self.assertGreater(np.count_nonzero(image[..., 3]), 0)
+        with patch.object(preview, 'PREVIEW_TILE_SIZE', 256):
+            self.assertTrue(np.array_equal(render_atoms(np.array([6]), coordinates, camera), image))
+
+    def test_atom_in_front_of_target(self):
+        # The camera is aimed behind the atom, which is still seen.
+        camera = Camera(target=(0.0, 0.0, -100.0), extent=100.0, width=16, height=16)
+        self.assertEqual(render_atoms(np.array([1]), np.zeros((1, 3)), camera)[8, 8, 3], 255)
+
+    def test_background(self):
+        image = render_atoms(np.array([], dtype=np.int64), np.zeros((0, 3)), Camera(width=8, height=4), (1, 2, 3))
+        self.assertTrue(np.all(image == [1, 2, 3, 255]))
+        image = render_atoms(np.array([1]), np.array([[100.0, 0.0, 0.0]]), Camera(extent=50.0, width=8, height=4))
+        self.assertFalse(np.any(image))
+
+    def test_fit(self):
+        # Every atom of a long chain is in the picture, and the picture is filled across its length.
+        coordinates = np.column_stack((np.linspace(-500, 500, 200), np.zeros(200), np.zeros(200)))
+        numbers = np.full(200, 6)
+        image = render_atoms(numbers, coordinates, Camera.fit(coordinates, Element.van_der_waals_radii(numbers)))
+        covered = np.flatnonzero(image[128, :, 3])
+        self.assertLess(covered[0], 256 * 0.1)
+        self.assertGreater(covered[-1], 256 * 0.9)
+        self.assertFalse(np.any(image[:, 0, 3]) or np.any(image[:, -1, 3]))
+
+    def test_many_atoms(self):
+        # More atoms than fit in a batch with a tile's rays give the same picture.
+        rng = np.random.default_rng(3)
+        coordinates = rng.uniform(-100, 100, (400, 3))
+        numbers = rng.choice([1, 6, 7, 8], 400)
+        camera = Camera.fit(coordinates, Element.van_der_waals_radii(numbers), width=48, height=32)
+        expected = render_atoms(numbers, coordinates, camera)
+        with patch.object(preview, 'PREVIEW_BATCH_SIZE', 300):
+            self.assertTrue(np.array_equal(render_atoms(numbers, coordinates, camera), expected))
+
+    def test_representation(self):
+        water = MoleculeRepresentation([
+            AtomPosition(Element.O, Point(0.0, 0.0, 0.0)),
+            AtomPosition(Element.H, Point(9.6, 0.0, 0.0)),
+            AtomPosition(Element.H, Point(-2.4, 9.3, 0.0))])
+        image = water.render(40, 30, direction=(0.0, -1.0, 0.0), up=(0.0, 0.0, 1.0), background=(255, 255, 255))
+        self.assertEqual(image.shape, (30, 40, 4))
+        self.assertTrue(np.all(image[..., 3] == 255))
+        self.assertTrue(np.any(np.any(image[..., :3] != 255, axis=2)))
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'water.png'
+            water.write_png(path, 40, 30)
+            self.assertTrue(np.array_equal(decode_png(path.read_bytes()), water.render(40, 30)))
+        self.assertEqual(MoleculeRepresentation([]).render(8, 8).shape, (8, 8, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#
+# test_sdf_utils.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import gzip
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import numpy as np
+from src.atoms.element import Element
+from src.molecules.molecule_position_utils import molecule_position_from_pubchem
+from src.utils.constants import pm
+from src.molecules.sdf_utils import iter_molecule_positions_from_sdf, molecule_position_from_molfile
+
+DATA_DIRECTORY = Path(__file__).resolve().parent.parent / 'data/pubchem'
+
+METHANOL_V3000 = """methanol
+  test
+
+  0  0  0     0  0            999 V3000
+M  V30 BEGIN CTAB
+M  V30 COUNTS 3 2 0 0 0
+M  V30 BEGIN ATOM
+M  V30 10 C 0.0 0.0 0.0 0
+M  V30 20 O 1.43 0.0 -
+M  V30 0.0 0
+M  V30 30 H -0.5 0.9 0.0 0
+M  V30 END ATOM
+M  V30 BEGIN BOND
+M  V30 1 1 10 20
+M  V30 2 1 10 30
+M  V30 END BOND
+M  V30 END CTAB
+M  END
+"""
+
+
+def v2000_from_pubchem(name: str) -> str:
+    """Writes the first conformer of a PubChem compound as a V2000 molfile."""
+    with open(DATA_DIRECTORY / '{}.json'.format(name)) as f:
+        compound = json.load(f)['PC_Compounds'][0]
+    conformer = compound['coords'][0]['conformers'][0]
+    elements = compound['atoms']['element']
+    bonds = compound['bonds']
+    counts = '{:3d}{:3d}  0  0  0  0  0  0  0  0999 V2000'.format(len(elements), len(bonds['aid1']))
+    lines = [name, '  test', '', counts]
+    for i, number in enumerate(elements):
+        lines.append('{:10.4f}{:10.4f}{:10.4f} {:<3} 0  0  0  0  0  0  0  0  0  0  0  0'.format(
+            conformer['x'][i], conformer['y'][i], conformer.get('z', [0.0] * len(elements))[i],
+            Element.from_atomic_number(number).symbol))
+    for aid1, aid2, order in zip(bonds['aid1'], bonds['aid2'], bonds['order']):
+        lines.append('{:3d}{:3d}{:3d}  0  0  0  0'.format(aid1, aid2, order))
+    lines.append('M  END')
+    lines.append('> <NAME>')
+    lines.append(name)
+    lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+class TestSdfUtils(unittest.TestCase):
+
+    def assertMatchesPubchem(self, name, positions):
+        with open(DATA_DIRECTORY / '{}.json'.format(name)) as f:
+            expected = molecule_position_from_pubchem(json.load(f))
+        self.assertEqual(expected.elements, positions.elements)
+        np.testing.assert_allclose(expected.coordinates, positions.coordinates)
+        np.testing.assert_array_equal(expected.bonds.to_dense(), positions.bonds.to_dense())
+
+    def test_v2000(self):
+        self.assertMatchesPubchem('fluoxetine', molecule_position_from_molfile(v2000_from_pubchem('fluoxetine')))
+
+    def test_v3000(self):
+        positions = molecule_position_from_molfile(METHANOL_V3000)
+        self.assertEqual([Element.C, Element.O, Element.H], positions.elements)
+        self.assertAlmostEqual(143 * pm, positions.coordinates[1][0])
+        self.assertEqual(1, positions.bonds.bond_order(0, 1))
+        self.assertEqual(1, positions.bonds.bond_order(2, 0))
+
+    def test_streams_gzipped_sdf(self):
+        names = ['water', 'adenine', 'fluoxetine', 'methylphenidate'] * 5
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'library.sdf.gz'
+            with gzip.open(path, 'wt') as f:
+                for name in names:
+                    f.write(v2000_from_pubchem(name))
+                    f.write('$$$$\n')
+                f.write(METHANOL_V3000)
+                f.write('$$$$\n')
+
+            for processes in [None, 2]:
+                positions = list(iter_molecule_positions_from_sdf(path, processes=processes, chunk_records=3))
+                self.assertEqual(len(names) + 1, len(positions))
+                for name, molecule in zip(names, positions):
+                    self.assertMatchesPubchem(name, molecule)
+                self.assertEqual(3, len(positions[-1]))
+
+    def test_bad_records(self):
+        good = v2000_from_pubchem('water')
+        bad_bond = good.replace('  1  2  1  0', '  1  2  5  0', 1)
+        self.assertNotEqual(good, bad_bond)
+        bad_element = good.replace(' O ', ' Xx', 1)
+        short = 'name\n  test\n\n  3  2  0  0  0  0  0  0  0  0999 V2000\n'
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'library.sdf'
+            path.write_text('$$$$\n'.join([good, bad_bond, good, bad_element, short, good]) + '$$$$\n')
+            for processes in [None, 2]:
+                with self.assertRaises(ValueError):
+                    list(iter_molecule_positions_from_sdf(path, processes=processes, chunk_records=2))
+                failures = []
+                positions = list(iter_molecule_positions_from_sdf(
+                    path, processes=processes, chunk_records=2, errors='skip',
+                    on_error=lambda index, error: failures.append((index, error))))
+                self.assertEqual(3, len(positions))
+                for molecule in positions:
+                    self.assertMatchesPubchem('water', molecule)
+                self.assertEqual([1, 3, 4], [index for index, _ in failures])
+                self.assertIn('bond type 5', failures[0][1])
+                self.assertIn('Xx', failures[1][1])
+        with self.assertRaises(ValueError):
+            list(iter_molecule_positions_from_sdf(path, errors='ignore'))
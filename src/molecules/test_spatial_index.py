@@ -0,0 +1,34 @@
+#
+# test_spatial_index.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import numpy as np
+from src.atoms.element import Element
+from src.molecules.molecule_positions import MoleculePositions
+from src.molecules.spatial_index import SpatialIndex
+
+
+class TestSpatialIndex(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        """We compare the neighbors found using the index against checking every pair of atoms."""
+        rng = np.random.default_rng(0)
+        coordinates = rng.uniform(-60.0, 60.0, (300, 3))
+        positions = MoleculePositions.from_arrays([Element.C] * 300, coordinates)
+        index = SpatialIndex(positions)
+        self.assertAlmostEqual(2 * Element.C.van_der_waals_radius, index.cell_size)
+
+        # Check radii both smaller and larger than the cell size.
+        for radius in [10.0, 30.0, 45.0]:
+            for i in range(len(positions)):
+                distances = np.linalg.norm(coordinates - coordinates[i], axis=1)
+                expected = [j for j in range(len(positions)) if j != i and distances[j] < radius]
+                self.assertEqual(expected, index.neighbors_within(i, radius).tolist())
+
+    def test_single_atom(self):
+        positions = MoleculePositions.from_arrays([Element.H], np.zeros((1, 3)))
+        self.assertEqual(0, len(SpatialIndex(positions).neighbors_within(0, 100.0)))
@@ -0,0 +1,122 @@
+#
+# build_manifest.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Any, Dict, Final, List, Optional, Sequence, Union
+from pathlib import Path
+import hashlib
+import json
+import os
+from src.atoms.atom_model import AtomModel
+from src.atoms.bond import SingleBondModel, bond_model_from_order
+from src.utils.resolution import Resolution
+
+"""
+Bump this whenever the code that generates the files changes what it writes, so that every file is rebuilt rather than
+kept from an older version. The hashes only cover the inputs of the files, not the code, so this includes any change to
+the geometry built by AtomModel, the bond models, SnapJoint or the scad library, as well as to the plate layout.
+"""
+BUILD_MANIFEST_VERSION: Final[int] = 1
+
+"""
+The manifest of a molecule is kept next to its files as <molecule_name><MANIFEST_SUFFIX>.
+"""
+MANIFEST_SUFFIX: Final[str] = '.manifest.json'
+
+
+def atom_inputs(atom: AtomModel) -> List[Any]:
+    """Returns everything the printed part of the atom is made from as a JSON friendly list: its element and, for each
+    neighbor, the element, distance, direction, bond order, label and the parameters of the snap joint of the bond.
+    """
+    neighbors = []
+    for neighbor in atom.neighbors:
+        bond = bond_model_from_order(neighbor.bond_order)
+        neighbors.append([
+            neighbor.element.atomic_number, neighbor.distance, neighbor.direction.inclination,
+            neighbor.direction.azimuthal, neighbor.bond_order, neighbor.label,
+            list(bond.snap.parameters) if isinstance(bond, SingleBondModel) else None])
+    return [atom.element.atomic_number, neighbors]
+
+
+def resolution_inputs(resolution: Optional[Resolution]) -> Optional[List[float]]:
+    """Returns what a resolution changes about the generated geometry, or None for OpenSCAD's defaults."""
+    return None if resolution is None else [resolution.angle, resolution.size]
+
+
+def input_hash(inputs: Any) -> str:
+    """Returns the SHA-256 hex digest of JSON friendly inputs along with BUILD_MANIFEST_VERSION."""
+    text = json.dumps([BUILD_MANIFEST_VERSION, inputs], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class BuildManifest(object):
+    """Records, for every file a build writes to a directory, the hash of the inputs it was made from (see input_hash),
+    so the next build only has to write the files whose inputs changed. A build asks is_current() for each file it
+    would write, writes the ones that are not, records all of them, and then prunes the files the last build recorded
+    that this one did not, before it saves the manifest. Only files that a build recorded are ever pruned.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self._path = Path(path)
+        self._previous: Dict[str, str] = {}
+        self._outputs: Dict[str, str] = {}
+        try:
+            manifest = json.loads(self._path.read_text(encoding='utf-8'))
+            if manifest.get('version') == BUILD_MANIFEST_VERSION:
+                self._previous = dict(manifest['outputs'])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # A missing or unreadable manifest just means everything is rebuilt.
+            pass
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def directory(self) -> Path:
+        """The directory of the manifest, which the names of the files are relative to."""
+        return self._path.parent
+
+    @property
+    def outputs(self) -> Dict[str, str]:
+        """Maps the name of each file recorded by this build to the hash of its inputs."""
+        return self._outputs
+
+    def is_current(self, name: str, digest: str) -> bool:
+        """Returns True if the file exists and the last build made it from inputs with the same hash."""
+        return self._previous.get(name) == digest and (self.directory / name).exists()
+
+    def record(self, name: str, digest: str) -> None:
+        """Records that the file is part of this build and was made from inputs with the hash."""
+        self._outputs[name] = digest
+
+    def prune(self, suffixes: Optional[Sequence[str]] = None) -> List[Path]:
+        """Removes the files the last build recorded that this build did not, and returns their paths. If suffixes is
+        given only the files that end with one of them are removed, for a build that only writes those kinds of files.
+        The other files the last build recorded are then carried over into this one unchanged.
+        """
+        orphans = []
+        for name, digest in self._previous.items():
+            if name in self._outputs:
+                continue
+            if suffixes is None or name.endswith(tuple(suffixes)):
+                orphans.append(self.directory / name)
+            elif (self.directory / name).exists():
+                self._outputs[name] = digest
+        for path in orphans:
+            path.unlink(missing_ok=True)
+        return orphans
+
+    def save(self) -> None:
+        """Writes the manifest of this build, which is what the next build compares against."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self._path.with_name(self._path.name + '.tmp')
+        temporary.write_text(
+            json.dumps({'version': BUILD_MANIFEST_VERSION, 'outputs': self._outputs}, indent=2, sort_keys=True) + '\n',
+            encoding='utf-8')
+        # Replacing the old manifest in one step means an interrupted save never leaves half a manifest behind.
+        os.replace(temporary, self._path)
+        self._previous = dict(self._outputs)
@@ -0,0 +1,50 @@
+#
+# colors.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Dict, Final, Tuple
+from src.utils.echeck import echeck
+
+"""
+The red, green and blue (0 to 255) of the named CSS colors used for the CPK colors of the elements, so the colors can be
+used outside of OpenSCAD.
+"""
+COLORS: Final[Dict[str, Tuple[int, int, int]]] = {
+    'beige': (245, 245, 220),
+    'blue': (0, 0, 255),
+    'cyan': (0, 255, 255),
+    'darkgreen': (0, 100, 0),
+    'darkorange': (255, 140, 0),
+    'darkred': (139, 0, 0),
+    'darkviolet': (148, 0, 211),
+    'dimgray': (105, 105, 105),
+    'gray': (128, 128, 128),
+    'green': (0, 128, 0),
+    'orange': (255, 165, 0),
+    'pink': (255, 192, 203),
+    'red': (255, 0, 0),
+    'violet': (238, 130, 238),
+    'white': (255, 255, 255),
+    'yellow': (255, 255, 0),
+}
+
+
+def color_rgb(name: str) -> Tuple[int, int, int]:
+    """Returns the red, green and blue (0 to 255) of the named color."""
+    echeck(name.lower() in COLORS, 'Unknown color: {}'.format(name))
+    return COLORS[name.lower()]
+
+
+def linear_rgb(name: str) -> Tuple[float, float, float]:
+    """Returns the red, green and blue (0 to 1) of the named color in linear light, which is what formats like glTF
+    take. The CSS colors are sRGB, whose channels are undone with the sRGB transfer function.
+    """
+    def linear(channel: int) -> float:
+        c = channel / 255
+        return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+    red, green, blue = color_rgb(name)
+    return linear(red), linear(green), linear(blue)
@@ -0,0 +1,236 @@
+#
+# packing.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Final, List, Sequence, Tuple
+import numpy as np
+from src.utils.echeck import echeck
+
+"""
+The gap, in mm, left between the parts on a plate.
+"""
+PART_SPACING: Final[float] = 2.0
+
+"""
+How much smaller, as a fraction, a turned rectangle around a footprint has to be before the part is turned for it. This
+keeps round parts, whose every rectangle is about the same, from being turned by odd angles.
+"""
+_TURN_THRESHOLD: Final[float] = 0.005
+
+
+class Bed(object):
+    """The area of a printer's bed that parts can be placed on, width along x and depth along y in mm."""
+
+    def __init__(self, width: float, depth: float):
+        echeck(width > 0 and depth > 0, 'The bed must have an area.')
+        self._width = width
+        self._depth = depth
+
+    @property
+    def width(self) -> float:
+        return self._width
+
+    @property
+    def depth(self) -> float:
+        return self._depth
+
+    def __repr__(self) -> str:
+        return 'Bed({}, {})'.format(self._width, self._depth)
+
+
+"""
+The bed parts are arranged for when no bed is given, 220 mm square like the beds of many common printers.
+"""
+DEFAULT_BED: Final[Bed] = Bed(220, 220)
+
+
+def convex_hull(points: np.ndarray) -> np.ndarray:
+    """Returns the corners of the convex hull of the 2D points, counter-clockwise. This is Andrew's monotone chain:
+    https://en.wikibooks.org/wiki/Algorithm_Implementation/Geometry/Convex_hull/Monotone_chain
+    """
+    unique = np.unique(np.asarray(points, dtype=np.float64).reshape(-1, 2), axis=0)
+    if len(unique) < 3:
+        return unique
+
+    def chain(ordered: List[List[float]]) -> List[List[float]]:
+        hull: List[List[float]] = []
+        for x, y in ordered:
+            # Drop the last corner while it does not turn left on the way to this point.
+            while len(hull) >= 2 and (
+                    (hull[-1][0] - hull[-2][0]) * (y - hull[-2][1]) - (hull[-1][1] - hull[-2][1]) * (x - hull[-2][0])
+                    <= 0):
+                hull.pop()
+            hull.append([x, y])
+        return hull[:-1]
+
+    ordered = unique.tolist()
+    return np.array(chain(ordered) + chain(ordered[::-1]))
+
+
+class Footprint(object):
+    """The outline of a part on the bed, boxed by the smallest rectangle around it. Turning the part by angle degrees
+    about the z axis lines that rectangle up with the x and y axes, with its lower left corner at low and its width and
+    depth given by size.
+    """
+
+    def __init__(self, points: np.ndarray):
+        hull = convex_hull(points)
+        echeck(len(hull) > 0, 'A footprint needs at least one point.')
+        # The smallest rectangle has a side along an edge of the hull, so those are the only turns that need trying.
+        edges = np.roll(hull, -1, axis=0) - hull
+        angles = np.concatenate(([0.0], -np.degrees(np.arctan2(edges[:, 1], edges[:, 0])) % 90))
+        radians = np.radians(angles)
+        cosines, sines = np.cos(radians), np.sin(radians)
+        xs = np.outer(cosines, hull[:, 0]) - np.outer(sines, hull[:, 1])
+        ys = np.outer(sines, hull[:, 0]) + np.outer(cosines, hull[:, 1])
+        areas = (xs.max(axis=1) - xs.min(axis=1)) * (ys.max(axis=1) - ys.min(axis=1))
+        best = int(np.argmin(areas))
+        if areas[best] > areas[0] * (1 - _TURN_THRESHOLD):
+            best = 0
+        self._angle = float(angles[best])
+        self._low = np.array([xs[best].min(), ys[best].min()])
+        self._size = np.array([xs[best].max(), ys[best].max()]) - self._low
+
+    @property
+    def angle(self) -> float:
+        return self._angle
+
+    @property
+    def low(self) -> np.ndarray:
+        return self._low
+
+    @property
+    def size(self) -> np.ndarray:
+        return self._size
+
+
+class Placement(object):
+    """Where a part goes: the plate it is on, and the angle in degrees to turn it by about the z axis and then the
+    offset to move it by.
+    """
+
+    def __init__(self, plate: int, angle: float, offset: Tuple[float, float]):
+        self._plate = plate
+        self._angle = angle
+        self._offset = offset
+
+    @property
+    def plate(self) -> int:
+        return self._plate
+
+    @property
+    def angle(self) -> float:
+        return self._angle
+
+    @property
+    def offset(self) -> Tuple[float, float]:
+        return self._offset
+
+
+class _Plate(object):
+    """The free space of a plate in a MaxRects packing, kept as the list of the largest empty rectangles, which may
+    overlap each other.
+    """
+
+    def __init__(self, width: float, depth: float):
+        self.free: List[Tuple[float, float, float, float]] = [(0.0, 0.0, width, depth)]
+
+    def find(self, width: float, depth: float) -> Tuple[float, float, float, bool]:
+        """Returns the score (lower is better), corner and whether it is turned of the best place for the rectangle,
+        by best short side fit. The score is infinite if it fits nowhere.
+        """
+        best: Tuple[float, float, float, bool] = (np.inf, 0.0, 0.0, False)
+        for x, y, free_width, free_depth in self.free:
+            for turned, (w, d) in enumerate([(width, depth), (depth, width)]):
+                if w <= free_width + 1e-9 and d <= free_depth + 1e-9:
+                    score = min(free_width - w, free_depth - d)
+                    if score < best[0]:
+                        best = (score, x, y, bool(turned))
+        return best
+
+    def fits(self, short: float, long: float) -> bool:
+        """Returns whether any free rectangle could take a rectangle with the given sides."""
+        return any(
+            min(width, depth) >= short - 1e-9 and max(width, depth) >= long - 1e-9 for _, _, width, depth in self.free)
+
+    def place(self, x: float, y: float, width: float, depth: float) -> None:
+        """Takes the rectangle out of the free space, splitting every free rectangle it overlaps into the parts of it
+        that are left, and then drops the free rectangles that are inside another.
+        """
+        right, top = x + width, y + depth
+        free = []
+        for fx, fy, fw, fd in self.free:
+            if x >= fx + fw or right <= fx or y >= fy + fd or top <= fy:
+                free.append((fx, fy, fw, fd))
+                continue
+            if x > fx:
+                free.append((fx, fy, x - fx, fd))
+            if right < fx + fw:
+                free.append((right, fy, fx + fw - right, fd))
+            if y > fy:
+                free.append((fx, fy, fw, y - fy))
+            if top < fy + fd:
+                free.append((fx, top, fw, fy + fd - top))
+        self.free = [
+            a for i, a in enumerate(free)
+            if not any(
+                (j < i or a != b) and b[0] <= a[0] and b[1] <= a[1] and a[0] + a[2] <= b[0] + b[2]
+                and a[1] + a[3] <= b[1] + b[3]
+                for j, b in enumerate(free) if j != i)]
+
+
+def pack_footprints(
+    footprints: Sequence[Footprint],
+    bed: Bed = DEFAULT_BED,
+    spacing: float = PART_SPACING,
+) -> List[Placement]:
+    """Packs the parts with the given footprints onto as few plates as it can and returns where each part goes, in the
+    order of the footprints. This is the MaxRects heuristic with best short side fit
+    (https://github.com/juj/RectangleBinPack/blob/master/RectangleBinPack.pdf): the parts are placed largest first, each
+    on the first plate it fits on, at the spot of that plate that leaves the least room on its shorter side, turned by
+    90 degrees if that fits better. The rectangles around the parts are kept spacing apart, and a part that does not fit
+    on an empty bed raises a ValueError.
+    """
+    placements: List[Placement] = [Placement(0, 0.0, (0.0, 0.0))] * len(footprints)
+    if len(footprints) == 0:
+        return placements
+    # Growing every part and the bed by the spacing keeps the parts that far apart and lets them reach the bed's edges.
+    sizes = np.array([footprint.size for footprint in footprints]) + spacing
+    width, depth = bed.width + spacing, bed.depth + spacing
+    for size in sizes:
+        echeck(
+            bool(min(size) <= min(width, depth) + 1e-9 and max(size) <= max(width, depth) + 1e-9),
+            'A part of {:.1f} x {:.1f} mm does not fit on the {:.1f} x {:.1f} mm bed.'.format(
+                size[0] - spacing, size[1] - spacing, bed.width, bed.depth))
+    order = sorted(range(len(footprints)), key=lambda i: (-sizes[i].max(), -sizes[i].min(), i))
+    # The smallest sides of the parts that are still to be placed, so plates that can take none of them are skipped.
+    shorts = np.minimum.accumulate(sizes[order].min(axis=1)[::-1])[::-1]
+    longs = np.minimum.accumulate(sizes[order].max(axis=1)[::-1])[::-1]
+
+    plates: List[_Plate] = []
+    open_plates: List[int] = []
+    for step, index in enumerate(order):
+        open_plates = [plate for plate in open_plates if plates[plate].fits(shorts[step], longs[step])]
+        w, d = sizes[index]
+        for plate in open_plates:
+            score, x, y, turned = plates[plate].find(w, d)
+            if score < np.inf:
+                break
+        else:
+            plates.append(_Plate(width, depth))
+            plate = len(plates) - 1
+            open_plates.append(plate)
+            score, x, y, turned = plates[plate].find(w, d)
+        plates[plate].place(x, y, *((d, w) if turned else (w, d)))
+
+        footprint = footprints[index]
+        low = footprint.low
+        if turned:
+            # A quarter turn more takes the lower left corner of the rectangle to (-top, left).
+            low = np.array([-(footprint.low[1] + footprint.size[1]), footprint.low[0]])
+        angle = (footprint.angle + (90 if turned else 0)) % 360
+        placements[index] = Placement(plate, angle, (x - float(low[0]), y - float(low[1])))
+    return placements
@@ -0,0 +1,37 @@
+#
+# png.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Union
+from pathlib import Path
+import struct
+import zlib
+import numpy as np
+from src.utils.echeck import echeck
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def png_bytes(image: np.ndarray) -> bytes:
+    """Encodes an H x W x 3 (RGB) or H x W x 4 (RGBA) array of 8 bit channels as a PNG."""
+    echeck(image.ndim == 3 and image.shape[2] in (3, 4), 'The image must be H x W x 3 or H x W x 4.')
+    echeck(image.dtype == np.uint8, 'The image must have 8 bit channels.')
+    height, width, channels = image.shape
+    # Every row starts with the filter type, 0 is no filtering.
+    rows = np.concatenate((np.zeros((height, 1), dtype=np.uint8), image.reshape(height, width * channels)), axis=1)
+    header = struct.pack('>IIBBBBB', width, height, 8, 6 if channels == 4 else 2, 0, 0, 0)
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + _chunk(b'IHDR', header)
+        + _chunk(b'IDAT', zlib.compress(rows.tobytes(), 6))
+        + _chunk(b'IEND', b''))
+
+
+def write_png(path: Union[str, Path], image: np.ndarray) -> None:
+    """Writes an H x W x 3 (RGB) or H x W x 4 (RGBA) array of 8 bit channels to a PNG file."""
+    Path(path).write_bytes(png_bytes(image))
@@ -9,7 +9,12 @@ from math import pi, cos, sin, atan2, asin
 
 
 class Point:
-    """Represents a point in 3D space."""
+    """Represents a point in 3D space. Points are immutable, every operation returns a new Point. They use __slots__ so
+    that they are small and quick to create, since many of them are made in the geometry building loops. For working
+    with many points at once see PointArray.
+    """
+
+    __slots__ = ('_x', '_y', '_z')
 
     def __init__(self, x: float, y: float, z: float = 0.0):
         self._x = x
@@ -61,41 +66,45 @@ class Point:
         return str(self)
 
     def __eq__(self, other) -> bool:
-        if type(self) != type(other):
+        if not isinstance(other, Point):
             raise TypeError("Operands must be instances of Point")
-        return self.x == other.x and self.y == other.y and self.z == other.z
+        return self._x == other._x and self._y == other._y and self._z == other._z
 
     def __add__(self, other) -> 'Point':
-        if type(self) != type(other):
+        if not isinstance(other, Point):
             raise TypeError("Operands must be instances of Point")
-        return Point(self.x + other.x, self.y + other.y, self.z + other.z)
+        return Point(self._x + other._x, self._y + other._y, self._z + other._z)
 
     def __sub__(self, other) -> 'Point':
-        if type(self) != type(other):
+        if not isinstance(other, Point):
             raise TypeError("Operands must be instances of Point")
-        return Point(self.x - other.x, self.y - other.y, self.z - other.z)
+        return Point(self._x - other._x, self._y - other._y, self._z - other._z)
+
+    def __hash__(self) -> int:
+        return hash((self._x, self._y, self._z))
 
     def __neg__(self):
-        return Point(-self.x, -self.y, -self.z)
+        return Point(-self._x, -self._y, -self._z)
 
     def distance(self, other) -> float:
         """Find the distance between this point and another point."""
-        return ((self.x - other.x) ** 2 + (self.y - other.y) ** 2 + (self.z - other.z) ** 2) ** 0.5
+        dx = self._x - other.x
+        dy = self._y - other.y
+        dz = self._z - other.z
+        return (dx * dx + dy * dy + dz * dz) ** 0.5
 
     def magnitude(self) -> float:
         """Find the magnitude of this point as a vector."""
-        return self.distance(Point(0.0, 0.0, 0.0))
+        return (self._x * self._x + self._y * self._y + self._z * self._z) ** 0.5
 
     def rotate_radians(self, angle: float) -> 'Point':
-        """Rotate this point around the origin by the given angle in radians.
-        TODO update for 3D points.
-        """
-        return Point(self.x * cos(angle) - self.y * sin(angle), self.x * sin(angle) + self.y * cos(angle))
+        """Rotate this point around the z-axis by the given angle in radians. The z-coordinate is unchanged."""
+        c = cos(angle)
+        s = sin(angle)
+        return Point(self._x * c - self._y * s, self._x * s + self._y * c, self._z)
 
     def rotate_degrees(self, angle: float) -> 'Point':
-        """Rotate this point around the origin by the given angle in degrees.
-        TODO update for 3D points.
-        """
+        """Rotate this point around the z-axis by the given angle in degrees. The z-coordinate is unchanged."""
         radians = angle * (pi / 180)
         return self.rotate_radians(radians)
 
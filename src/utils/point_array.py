@@ -0,0 +1,128 @@
+#
+# point_array.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from math import pi, cos, sin
+from typing import Iterator, List, Sequence, Union
+import numpy as np
+from src.utils.echeck import echeck
+from src.utils.point import Point
+
+
+class PointArray:
+    """Represents many points in 3D space stored in a single N x 3 numpy array. This supports the same operations as
+    Point, but each one is a single vectorized operation over all of the points, so whole vertex sets or molecules can
+    be transformed and measured at once. Like Point, a PointArray is not modified by its operations, they return a new
+    PointArray.
+    """
+
+    def __init__(self, coordinates: np.ndarray):
+        """Create the array from an N x 3 array of coordinates (or N x 2 for points in the x-y plane). The coordinates
+        are not copied if they are already a float array of the right shape.
+        """
+        coordinates = np.asarray(coordinates)
+        if coordinates.dtype.kind != 'f':
+            coordinates = coordinates.astype(np.float64)
+        if coordinates.ndim == 2 and coordinates.shape[1] == 2:
+            coordinates = np.column_stack((coordinates, np.zeros(len(coordinates), dtype=coordinates.dtype)))
+        echeck(coordinates.ndim == 2 and coordinates.shape[1] == 3, 'The coordinates must be an N x 3 array.')
+        self._coordinates = coordinates
+
+    @staticmethod
+    def from_points(points: Sequence[Point]) -> 'PointArray':
+        """Create the array from a list of Points."""
+        return PointArray(np.array([(point.x, point.y, point.z) for point in points], dtype=np.float64).reshape(-1, 3))
+
+    def to_points(self) -> List[Point]:
+        """Return the points as a list of Points."""
+        return [Point(x, y, z) for x, y, z in self._coordinates.tolist()]
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        return self._coordinates
+
+    @property
+    def x(self) -> np.ndarray:
+        return self._coordinates[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self._coordinates[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self._coordinates[:, 2]
+
+    def __len__(self) -> int:
+        return len(self._coordinates)
+
+    def __getitem__(self, index: int) -> Point:
+        x, y, z = self._coordinates[index].tolist()
+        return Point(x, y, z)
+
+    def __iter__(self) -> Iterator[Point]:
+        return iter(self.to_points())
+
+    def __str__(self) -> str:
+        return str(self.to_points())
+
+    def __repr__(self):
+        return str(self)
+
+    @staticmethod
+    def __operand(other: Union[Point, 'PointArray']) -> np.ndarray:
+        """Returns the coordinates of a Point (which is applied to every point) or a PointArray of the same length."""
+        if isinstance(other, Point):
+            return np.array([other.x, other.y, other.z])
+        if isinstance(other, PointArray):
+            return other._coordinates
+        raise TypeError("Operands must be instances of Point or PointArray")
+
+    def __add__(self, other: Union[Point, 'PointArray']) -> 'PointArray':
+        return PointArray(self._coordinates + self.__operand(other))
+
+    def __sub__(self, other: Union[Point, 'PointArray']) -> 'PointArray':
+        return PointArray(self._coordinates - self.__operand(other))
+
+    def __neg__(self) -> 'PointArray':
+        return PointArray(-self._coordinates)
+
+    def distances(self, other: Union[Point, 'PointArray']) -> np.ndarray:
+        """Find the distance between each point and the given point (or the matching point of another PointArray)."""
+        deltas = self._coordinates - self.__operand(other)
+        return np.sqrt(np.einsum('ij,ij->i', deltas, deltas))
+
+    def magnitudes(self) -> np.ndarray:
+        """Find the magnitude of each point as a vector."""
+        return np.sqrt(np.einsum('ij,ij->i', self._coordinates, self._coordinates))
+
+    def rotate_matrix(self, matrix: np.ndarray) -> 'PointArray':
+        """Apply the given 3x3 rotation matrix to every point."""
+        echeck(matrix.shape == (3, 3), 'The rotation matrix must be 3x3.')
+        return PointArray(self._coordinates @ matrix.T)
+
+    def rotate_radians(self, angle: float) -> 'PointArray':
+        """Rotate the points around the z-axis by the given angle in radians. The z-coordinates are unchanged."""
+        c = cos(angle)
+        s = sin(angle)
+        return self.rotate_matrix(np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]]))
+
+    def rotate_degrees(self, angle: float) -> 'PointArray':
+        """Rotate the points around the z-axis by the given angle in degrees. The z-coordinates are unchanged."""
+        return self.rotate_radians(angle * (pi / 180))
+
+    def get_inclination_angles(self) -> np.ndarray:
+        """This finds the angle in degrees from the x-y plane to the vector formed by each point. Values will be between
+        -90 and +90 degrees.
+        """
+        # Clip to guard against rounding pushing the ratio just outside of [-1, 1].
+        return np.degrees(np.arcsin(np.clip(self.z / self.magnitudes(), -1.0, 1.0)))
+
+    def get_azimuthal_angles(self) -> np.ndarray:
+        """This finds the angle in degrees from the positive x-axis to the projection of each point onto the x-y plane.
+        Values will be between -180 and +180 degrees.
+        """
+        return np.degrees(np.arctan2(self.y, self.x))
@@ -5,10 +5,11 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from typing import List, Optional
+from typing import List, Optional, Union
 from math import atan2
 from src.utils.echeck import echeck
 from src.utils.point import Point
+from src.utils.point_array import PointArray
 
 
 class ConvexPolygonBuilder:
@@ -85,17 +86,23 @@ class Polygon:
     class does not enforce anything about the vertices, the Builder classes should ensure that the vertices are valid
     according to the rules of that builder. For example, the ConvexPolygonBuilder ensures that the vertices used to
     construct the polygon form a convex polygon.
+
+    The vertices are held in a PointArray, so transforming the polygon transforms all of its vertices at once.
     """
 
-    def __init__(self, vertices: List[Point]):
-        self.__vertices = vertices
+    def __init__(self, vertices: Union[List[Point], PointArray]):
+        self.__vertices = vertices if isinstance(vertices, PointArray) else PointArray.from_points(vertices)
 
     @property
     def num_vertices(self):
         return len(self.__vertices)
 
     @property
-    def vertices(self):
+    def vertices(self) -> List[Point]:
+        return self.__vertices.to_points()
+
+    @property
+    def vertex_array(self) -> PointArray:
         return self.__vertices
 
     def vertex(self, index: int):
@@ -103,12 +110,12 @@ class Polygon:
 
     def translate(self, point: Point) -> 'Polygon':
         """Translate the polygon by the given point."""
-        return Polygon([vertex + point for vertex in self.__vertices])
+        return Polygon(self.__vertices + point)
 
     def rotate_radians(self, angle: float) -> 'Polygon':
         """Rotates the polygon by the given angle about the origin."""
-        return Polygon([vertex.rotate_radians(angle) for vertex in self.__vertices])
+        return Polygon(self.__vertices.rotate_radians(angle))
 
     def rotate_degrees(self, angle: float) -> 'Polygon':
         """Rotates the polygon by the given angle about the origin."""
-        return Polygon([vertex.rotate_degrees(angle) for vertex in self.__vertices])
+        return Polygon(self.__vertices.rotate_degrees(angle))
@@ -6,53 +6,393 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from math import sqrt, ceil
-from typing import List
-from src.atoms.atom_model import AtomModel
-from solid2 import cube
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import collections
+import shutil
+from src.atoms.atom_model import AtomModel, atom_scad_library, group_equivalent_atoms
+from src.atoms.element import Element
+from solid2 import scad_render_to_file, union
+from solid2.core.object_base import OpenSCADObject
+from src.meshes.atom_mesh import print_footprint
 from src.molecules.molecule_model import MoleculeModel
+from src.utils.build_manifest import MANIFEST_SUFFIX, BuildManifest, atom_inputs, input_hash, resolution_inputs
+from src.utils.echeck import echeck
+from src.utils.packing import DEFAULT_BED, PART_SPACING, Bed, Footprint, Placement, pack_footprints
+from src.utils.render_cache import RenderCache, canonical_scad
+from src.utils.resolution import Resolution
+from src.utils.scad_library import SCAD_LIBRARY_FILENAME
 
 
-def index_to_2d(index, num_columns):
-    """This function takes an index to an array and the number of columns in a grid and returns the row and column of
-    that index if the array were to be arranged in a grid.
-    """
-    row = index // num_columns
-    column = index % num_columns
-    return (row, column)
-
-
-def arrange_prints(atoms: List[AtomModel]):
-    """This function takes a list of AtomModel objects and arranges them into a grid so that they are not overlapping
-    and are not too far apart. This is useful when you have a list of atoms of the same element type and you want to
-    print them all at once. It is assumed that the all of the atoms in the list are of the same element type.
+def arrange_prints(
+    atoms: List[AtomModel],
+    library: bool = False,
+    resolution: Optional[Resolution] = None,
+    bed: Bed = DEFAULT_BED,
+    spacing: float = PART_SPACING,
+) -> List[OpenSCADObject]:
+    """This function takes a list of AtomModel objects, orients each of them for printing (see AtomModel.print()) and
+    packs them onto as few plates of the bed as it can, at least spacing apart. Each part is boxed by the smallest
+    rectangle around its real outline on the bed (see print_footprint), which may be turned about the z axis, and the
+    boxes are packed by pack_footprints. This is useful when you have a list of atoms of the same element type and you
+    want to print them all at once.
 
     Parameters
     ----------
     atoms : List[AtomModel]
         A list of AtomModel objects to arrange.
 
+    library : bool
+        If True the atoms are built with calls to the modules of the shared scad library. See AtomModel.model().
+
+    resolution : Optional[Resolution]
+        The resolution the atoms are drawn at. See AtomModel.model().
+
+    bed : Bed
+        The bed the plates are for. A part that does not fit on it raises a ValueError.
+
+    spacing : float
+        The gap in mm between the parts.
+
+    Returns
+    -------
+    List[OpenSCADObject]
+        The model of each plate, in the order they were filled, so only the last one can be partly empty.
+    """
+    models: Dict[int, OpenSCADObject] = {}
+    return [_plate_model(plate, library, resolution, models) for plate in layout_prints(atoms, bed, spacing)]
+
+
+def layout_prints(
+    atoms: List[AtomModel],
+    bed: Bed = DEFAULT_BED,
+    spacing: float = PART_SPACING,
+) -> List[List[Tuple[int, AtomModel, Placement]]]:
+    """Works out where arrange_prints puts the atoms without building any models. Returns, for each plate, the index in
+    atoms of each atom on it, the part drawn for it and where that part goes. Atoms that are the same part (see
+    group_equivalent_atoms) are all drawn as the first atom of their group, so its model only has to be built once. The
+    same atom may be in the list more than once, to print copies of it.
+    """
+    parts: Dict[int, AtomModel] = {}
+    footprints: Dict[int, Footprint] = {}
+    for group in group_equivalent_atoms(atoms):
+        footprint = Footprint(print_footprint(group[0]))
+        parts.update({id(atom): group[0] for atom in group})
+        footprints.update({id(atom): footprint for atom in group})
+    placements = pack_footprints([footprints[id(atom)] for atom in atoms], bed, spacing)
+    plates: List[List[Tuple[int, AtomModel, Placement]]] = []
+    for index, (atom, placement) in enumerate(zip(atoms, placements)):
+        plates.extend([] for _ in range(placement.plate + 1 - len(plates)))
+        plates[placement.plate].append((index, parts[id(atom)], placement))
+    return plates
+
+
+def _plate_model(
+    plate: List[Tuple[int, AtomModel, Placement]],
+    library: bool,
+    resolution: Optional[Resolution],
+    models: Dict[int, OpenSCADObject],
+) -> OpenSCADObject:
+    """Returns the model of a plate from layout_prints. The printed model of each part is built once and kept in models.
+    """
+    placed = []
+    for _, part, placement in plate:
+        if id(part) not in models:
+            models[id(part)] = part.print(library, resolution)
+        model = models[id(part)]
+        if placement.angle != 0:
+            model = model.rotate(0, 0, placement.angle)
+        placed.append(model.translate(placement.offset[0], placement.offset[1], 0))
+    return union()(*placed)
+
+
+def _write_plates(
+    manifest: BuildManifest,
+    stem: str,
+    atoms: List[AtomModel],
+    labels: List[str],
+    library: bool,
+    resolution: Optional[Resolution],
+    bed: Bed,
+) -> Dict[Path, List[str]]:
+    """Lays the atoms out on plates (see layout_prints) and writes each plate to a scad file named by plate_filenames
+    in the directory of the manifest, unless the manifest says the file is current. The file starts with a comment that
+    lists the label of each atom on the plate and where its middle is. Returns the labels of the atoms on each plate.
+    """
+    inputs: Dict[int, List] = {}
+    models: Dict[int, OpenSCADObject] = {}
+    plate_labels: Dict[Path, List[str]] = {}
+    plates = layout_prints(atoms, bed)
+    for filename, plate in zip(plate_filenames(stem, len(plates)), plates):
+        for _, part, _ in plate:
+            if id(part) not in inputs:
+                inputs[id(part)] = atom_inputs(part)
+        # A part is only turned about the middle of its atom, so that ends up at the offset.
+        parts = [
+            '// {} at ({:.1f}, {:.1f})'.format(labels[index], placement.offset[0], placement.offset[1])
+            for index, _, placement in plate]
+        header = '\n'.join(['// The parts on this plate:'] + parts) + '\n\n'
+        if library:
+            header += 'use <{}>;\n\n'.format(SCAD_LIBRARY_FILENAME)
+        digest = input_hash([
+            'plate', header, resolution_inputs(resolution),
+            [[inputs[id(part)], placement.angle, list(placement.offset)] for _, part, placement in plate]])
+        if not manifest.is_current(filename, digest):
+            scad_render_to_file(
+                _plate_model(plate, library, resolution, models), str(manifest.directory / filename),
+                file_header=header)
+        manifest.record(filename, digest)
+        plate_labels[manifest.directory / filename] = [labels[index] for index, _, _ in plate]
+    return plate_labels
+
+
+def plate_filenames(stem: str, count: int) -> List[str]:
+    """Returns the names of the scad files of count plates: <stem>.scad for a single plate, otherwise
+    <stem>_plate<number>.scad counting from 1.
+    """
+    if count == 1:
+        return ['{}.scad'.format(stem)]
+    return ['{}_plate{}.scad'.format(stem, number) for number in range(1, count + 1)]
+
+
+def save_scad_library(directory: str = '') -> str:
+    """Writes the shared scad library (see atom_scad_library) to SCAD_LIBRARY_FILENAME in the given directory and
+    returns its path. The file is only written when its text changes, so tools that watch it are not woken for nothing.
+    """
+    path = Path(directory) / SCAD_LIBRARY_FILENAME
+    text = atom_scad_library()
+    if not path.exists() or path.read_text(encoding='utf-8') != text:
+        path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def print_molecule(
+    molecule: MoleculeModel,
+    directory: str = '',
+    library: bool = False,
+    render: bool = False,
+    processes: Optional[int] = None,
+    resolution: Optional[Resolution] = None,
+    bed: Bed = DEFAULT_BED,
+    cache: Optional[RenderCache] = None,
+) -> Optional['RenderReport']:
+    """This function takes a MoleculeModel object and produces a collection of scad files in the given directory. The
+    atoms of each element type are packed onto as few plates of the bed as they fit on (see arrange_prints), and each
+    plate is written to its own scad file. The scad files will be named with the format of
+    <molecule_name>_<element_name>.scad, or <molecule_name>_<element_name>_plate<number>.scad when an element takes more
+    than one plate. Each file starts with a comment that lists its atoms, by their index among the atoms of their
+    element like the STL files of render_molecule, and where on the plate they are.
+
+    The build is incremental. A BuildManifest (<molecule_name>.manifest.json in the directory) records the hash of the
+    inputs of every file: the parts on a plate with their placements, each part's neighbors, bond orders, labels and
+    snap joints, the resolution, the library flag and BUILD_MANIFEST_VERSION. Only files whose inputs changed are
+    written again, so editing one atom only rebuilds the plates (and STL files) it and its neighbors are on. Files the
+    last build wrote that this one did not, like the plates of an element that needs fewer of them now, are removed. A
+    build without render leaves the STL files of earlier builds alone. The hashes do not cover the code that builds the
+    geometry, so BUILD_MANIFEST_VERSION has to be bumped when that changes.
+
+    If library is True the shared scad library is written as well, and each scad file uses its modules for the snap
+    receivers, bond spaces and labels, so every cut is just a module call plus a transform. This keeps the files small
+    and lets OpenSCAD evaluate the repeated geometry once.
+
+    If render is True every atom is also rendered to an STL file in the directory, see render_molecule, which is given
+    the cache and processes to render with. The RenderReport of that is returned.
+
+    The atoms are drawn at the resolution (see src.utils.resolution), so a model can be iterated on with DRAFT and only
+    the final export pays for PRINT. Without a resolution OpenSCAD's defaults are used.
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest(Path(directory) / '{}{}'.format(molecule.name, MANIFEST_SUFFIX))
+    if library:
+        save_scad_library(directory)
+    for element in molecule.elements:
+        atoms = molecule.element_atoms(element)
+        _write_plates(
+            manifest, '{}_{}'.format(molecule.name, element.name), atoms,
+            ['{} {} {}'.format(molecule.name, element.name, index) for index in range(len(atoms))],
+            library, resolution, bed)
+    report = None
+    if render:
+        report = render_molecule(
+            molecule, directory, cache, library=library, processes=processes, resolution=resolution,
+            manifest=manifest)
+    # Without a render the STL files are not part of the build, but they are kept for the next build that renders.
+    manifest.prune(None if render else ['.scad'])
+    manifest.save()
+    return report
+
+
+def print_batch(
+    name: str,
+    molecules: Sequence[Tuple[MoleculeModel, int]],
+    directory: str = '',
+    library: bool = False,
+    resolution: Optional[Resolution] = None,
+    bed: Bed = DEFAULT_BED,
+) -> Dict[Path, List[str]]:
+    """This function plates a whole print run at once. It takes the molecules to print, each with the number of copies
+    to print of it, and pools the atoms of each element type across all of the molecules and copies, so they are packed
+    onto shared plates (see arrange_prints). That keeps the number of plates, and of filament changes, as low as it can
+    be. Atoms that are the same part are modelled once even when they come from different molecules.
+
+    The plates of each element are written to <name>_<element_name>.scad, or <name>_<element_name>_plate<number>.scad
+    when it takes more than one plate, in the given directory. So that the parts can be sorted after printing, each file
+    starts with a comment that labels every atom on the plate as "<molecule_name> copy <copy> <element_name> <index>",
+    where index is as in print_molecule, along with where on the plate it is. Like print_molecule the build is
+    incremental, with the manifest <name>.manifest.json, and the shared scad library is written if library is True.
+
+    Returns the labels of the atoms on each plate, by the path of the plate's file.
     """
-    side_len = sqrt(ceil(sqrt(len(atoms))) ** 2)
-    radius = atoms[0].element.van_der_waals_radius
-    spacing = 2  # 2mm spacing between atoms
-    delta = 2 * radius + spacing
+    echeck(all(copies >= 0 for _, copies in molecules), 'The number of copies can not be negative.')
+    names = [molecule.name for molecule, _ in molecules]
+    echeck(len(set(names)) == len(names), 'The molecules of a batch need different names to tell their parts apart.')
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    manifest = BuildManifest(Path(directory) / '{}{}'.format(name, MANIFEST_SUFFIX))
+    if library:
+        save_scad_library(directory)
+    elements: List[Element] = []
+    for molecule, copies in molecules:
+        elements.extend(element for element in molecule.elements if copies > 0 and element not in elements)
+    plates: Dict[Path, List[str]] = {}
+    for element in elements:
+        atoms: List[AtomModel] = []
+        labels: List[str] = []
+        for molecule, copies in molecules:
+            if element not in molecule.elements:
+                continue
+            element_atoms = molecule.element_atoms(element)
+            for copy in range(1, copies + 1):
+                atoms.extend(element_atoms)
+                labels.extend(
+                    '{} copy {} {} {}'.format(molecule.name, copy, element.name, index)
+                    for index in range(len(element_atoms)))
+        plates.update(
+            _write_plates(manifest, '{}_{}'.format(name, element.name), atoms, labels, library, resolution, bed))
+    manifest.prune()
+    manifest.save()
+    return plates
 
-    model = cube(0)
-    for i, atom in enumerate(atoms):
-        row, col = index_to_2d(i, side_len)
-        model += atom.print().translate(row * delta, col * delta, 0)
 
-    return model
+class RenderReport(object):
+    """The outcome of render_molecule. A failed render does not stop the others, so this holds the STL files that were
+    written along with the error of every file that could not be rendered.
+    """
+
+    def __init__(self, paths: List[Path], failures: Dict[Path, str]):
+        self._paths = paths
+        self._failures = failures
+
+    @property
+    def paths(self) -> List[Path]:
+        """The STL files of the atoms, in the order of the atoms, whether they were written or were already current."""
+        return self._paths
+
+    @property
+    def failures(self) -> Dict[Path, str]:
+        """Maps each STL file that could not be rendered to the error that stopped it."""
+        return self._failures
+
+    @property
+    def succeeded(self) -> bool:
+        return len(self._failures) == 0
+
 
+def _render_job(cache: RenderCache, scad: str, paths: List[Path], evict: bool) -> Tuple[int, int, Optional[str]]:
+    """Renders the scad through the cache and copies the STL to each of the paths. This is a module level function so
+    it can be run in a worker process, where the cache is a copy. So it returns the hits and misses it added to the
+    cache, along with the error if the render or a copy failed. Workers pass evict=False, so that none of them can
+    remove a cached file while another is copying it, and the cache is evicted once after they are all done.
+    """
+    hits, misses = cache.hits, cache.misses
+    error = None
+    try:
+        stl = cache.render(scad, evict)
+        for path in paths:
+            shutil.copyfile(stl, path)
+    except Exception as e:
+        error = '{}: {}'.format(type(e).__name__, e)
+    return cache.hits - hits, cache.misses - misses, error
+
+
+def render_molecule(
+    molecule: MoleculeModel,
+    directory: str = '',
+    cache: Optional[RenderCache] = None,
+    library: bool = False,
+    processes: Optional[int] = None,
+    resolution: Optional[Resolution] = None,
+    manifest: Optional[BuildManifest] = None,
+) -> RenderReport:
+    """This function renders the printable model of every atom in the molecule to an STL file named
+    <molecule_name>_<element_name>_<index>.stl in the given directory, where index counts the atoms of each element. The
+    renders go through the cache (a RenderCache in the default cache directory if not given), so only atoms whose model
+    changed since the last run are rendered again. Atoms that are the same part (see group_equivalent_atoms) are only
+    rendered once and each of them gets a copy of the STL.
 
-def print_molecule(molecule: MoleculeModel):  # todo add directory to save to
-    """This function takes a MoleculeModel object and produces a collection of scad files. Each scad file will contain
-    the 3D model of the molecule with all of the atoms of a particular element type arranged in a grid, so it will
-    produce one scad file for each element type in the molecule. The scad files will be named with the format of
-    <molecule_name>_<element_name>.scad.
+    Args:
+        molecule: The molecule to render.
+        directory: The directory the STL files are written to.
+        cache: The cache the renders go through.
+        library: If True the atoms are built with the modules of the shared scad library. See AtomModel.model().
+        processes: If given, the renders are run by a pool with this many worker processes (os.cpu_count() uses every
+            core). The renderer of the cache must then be picklable, like a module level function. The hits and
+            misses of the workers are added to the cache, and it is evicted once all of the renders are done.
+        resolution: The resolution the atoms are drawn at. Each resolution is cached separately.
+        manifest: If given, a BuildManifest kept in the directory. STL files it says are current are not rendered
+            again, and every STL file that is in place afterwards is recorded in it. Saving it is left to the caller.
+
+    Returns:
+        A RenderReport with the STL files that were written and the errors of any renders that failed.
     """
+    cache = cache if cache is not None else RenderCache()
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    echeck(manifest is None or manifest.directory.resolve() == Path(directory).resolve(),
+           'The manifest must be kept in the directory the STL files are written to.')
+    paths: List[Path] = []
+    digests: Dict[Path, str] = {}
+    jobs: Dict[str, List[Path]] = collections.defaultdict(list)
     for element in molecule.elements:
         atoms = molecule.element_atoms(element)
-        model = arrange_prints(atoms)
-        model.save_as_scad('{}_{}.scad'.format(molecule.name, element.name))
+        element_paths = {
+            id(atom): Path(directory) / '{}_{}_{}.stl'.format(molecule.name, element.name, index)
+            for index, atom in enumerate(atoms)}
+        for group in group_equivalent_atoms(atoms):
+            group_paths = [element_paths[id(atom)] for atom in group]
+            if manifest is not None:
+                digest = input_hash(['stl', library, resolution_inputs(resolution), atom_inputs(group[0])])
+                digests.update({path: digest for path in group_paths})
+                group_paths = [path for path in group_paths if not manifest.is_current(path.name, digest)]
+                if len(group_paths) == 0:
+                    continue
+            scad = canonical_scad(group[0].print(library, resolution), library)
+            jobs[scad].extend(group_paths)
+        paths.extend(element_paths.values())
+
+    failures: Dict[Path, str] = {}
+    if processes is None or processes <= 1:
+        for scad, job_paths in jobs.items():
+            _, _, error = _render_job(cache, scad, job_paths, True)
+            if error is not None:
+                failures.update({path: error for path in job_paths})
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = {executor.submit(_render_job, cache, scad, job_paths, False): job_paths
+                       for scad, job_paths in jobs.items()}
+            for future, job_paths in futures.items():
+                # The job catches its own errors, this is for a worker that could not run it at all.
+                exception = future.exception()
+                if exception is None:
+                    hits, misses, error = future.result()
+                    cache.count(hits, misses)
+                else:
+                    error = '{}: {}'.format(type(exception).__name__, exception)
+                if error is not None:
+                    failures.update({path: error for path in job_paths})
+        cache.evict()
+
+    if manifest is not None:
+        for path in paths:
+            if path not in failures:
+                manifest.record(path.name, digests[path])
+    return RenderReport([path for path in paths if path not in failures], failures)
@@ -0,0 +1,168 @@
+#
+# render_cache.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Callable, Final, Optional, Union
+from pathlib import Path
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from src.atoms.atom_model import AtomModel, atom_scad_library
+from src.utils.echeck import echeck
+from src.utils.resolution import Resolution
+
+"""
+Bump this whenever the way the scad is rendered changes, so that stale STL files are never reused.
+"""
+RENDER_CACHE_VERSION: Final[int] = 1
+
+"""
+The default limit on the total size of the cached STL files, 1 GiB. Once it is exceeded the least recently used files
+are removed.
+"""
+DEFAULT_RENDER_CACHE_BYTES: Final[int] = 1 << 30
+
+"""
+The OpenSCAD executable used by openscad_renderer. This can be overridden with the OPENSCAD environment variable.
+"""
+OPENSCAD_COMMAND: Final[str] = os.environ.get('OPENSCAD', 'openscad')
+
+"""
+A renderer takes the path of a scad file and the path the STL file should be written to.
+"""
+Renderer = Callable[[Path, Path], None]
+
+
+def default_render_cache_directory() -> Path:
+    """Returns the directory rendered STL files are stored in when no directory is given. Like the molecule position
+    cache this can be moved with the BALLS_AND_STICKS_CACHE environment variable, which is read on every call.
+    """
+    return Path(os.environ.get('BALLS_AND_STICKS_CACHE', Path.home() / '.cache' / 'balls_and_sticks')) / 'stls'
+
+
+def openscad_renderer(scad_path: Path, stl_path: Path) -> None:
+    """Renders the scad file to an STL file with OpenSCAD."""
+    echeck(shutil.which(OPENSCAD_COMMAND) is not None,
+           'Could not find the OpenSCAD executable ({}). Install it or set OPENSCAD.'.format(OPENSCAD_COMMAND))
+    subprocess.run(
+        [OPENSCAD_COMMAND, '-o', str(stl_path), str(scad_path)],
+        check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def canonical_scad(model, library: bool = False) -> str:
+    """Returns the scad text of a solid2 model in a canonical form, so that equal models always give equal text. When
+    the model uses the modules of the shared scad library (see AtomModel.model()) the library is written into the text,
+    so the text is self contained and changes to the library change the text.
+    """
+    text = model.as_scad()
+    if library:
+        text = atom_scad_library() + '\n' + text
+    lines = [line.rstrip() for line in text.replace('\r\n', '\n').split('\n')]
+    return '\n'.join(lines).strip('\n') + '\n'
+
+
+def scad_hash(scad: str) -> str:
+    """Returns the SHA-256 hex digest that the STL rendered from the scad text is stored under."""
+    return hashlib.sha256('v{}\n{}'.format(RENDER_CACHE_VERSION, scad).encode('utf-8')).hexdigest()
+
+
+class RenderCache(object):
+    """This renders scad text to STL files and keeps the results in a directory keyed by the hash of the text. When the
+    same text is rendered again the stored STL is reused, so only atoms whose model actually changed are rendered. The
+    total size of the directory is kept under max_bytes by removing the least recently used files.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Union[str, Path]] = None,
+        renderer: Renderer = openscad_renderer,
+        max_bytes: int = DEFAULT_RENDER_CACHE_BYTES,
+    ):
+        echeck(max_bytes > 0, 'The cache size must be positive.')
+        self._directory = Path(directory) if directory is not None else default_render_cache_directory()
+        self._renderer = renderer
+        self._max_bytes = max_bytes
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    @property
+    def hits(self) -> int:
+        """The number of renders that were answered from the cache."""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """The number of renders that had to run the renderer."""
+        return self._misses
+
+    def path(self, scad: str) -> Path:
+        """Returns the path the STL rendered from the scad text is (or would be) stored at."""
+        return self._directory / '{}.stl'.format(scad_hash(scad))
+
+    def count(self, hits: int, misses: int) -> None:
+        """Adds renders made through a copy of the cache, like the one a worker process gets, to hits and misses."""
+        self._hits += hits
+        self._misses += misses
+
+    def render(self, scad: str, evict: bool = True) -> Path:
+        """Returns the path of the STL rendered from the scad text, running the renderer only if it is not cached. If
+        evict is False the cache is left over max_bytes after a new render. Processes that share the directory pass
+        that, so none of them removes a file another is still copying, and one evict() is run once they are done.
+        """
+        path = self.path(scad)
+        if path.exists():
+            self._hits += 1
+            # Touching the file marks it as recently used for eviction.
+            os.utime(path)
+            return path
+
+        self._misses += 1
+        self._directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self._directory) as work:
+            scad_path = Path(work) / 'model.scad'
+            stl_path = Path(work) / 'model.stl'
+            scad_path.write_text(scad, encoding='utf-8')
+            self._renderer(scad_path, stl_path)
+            echeck(stl_path.exists(), 'The renderer did not write an STL file.')
+            # Moving the finished file in place means a reader never sees a partially written STL.
+            os.replace(stl_path, path)
+        if evict:
+            self.evict(keep=path)
+        return path
+
+    def render_model(self, model, library: bool = False) -> Path:
+        """Renders a solid2 model. See canonical_scad for the library flag."""
+        return self.render(canonical_scad(model, library))
+
+    def render_atom(self, atom: AtomModel, library: bool = False, resolution: Optional[Resolution] = None) -> Path:
+        """Renders the printable model of the atom (AtomModel.print()) at the resolution."""
+        return self.render_model(atom.print(library, resolution), library)
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """Removes the least recently used STL files until the cache fits in max_bytes. The file keep is never
+        removed, even if it is larger than the limit on its own.
+        """
+        entries = []
+        for path in self._directory.glob('*.stl'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self._max_bytes:
+                break
+            if keep is not None and path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            total -= size
@@ -0,0 +1,92 @@
+#
+# resolution.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Dict, Final, Optional
+from math import ceil, pi
+from src.utils.echeck import echeck
+
+
+class Resolution(object):
+    """A level of detail for the generated geometry. Like OpenSCAD's $fa and $fs, angle is the largest angle in degrees
+    and size the largest length in mm of a single fragment of a circle, so small circles get fewer fragments than large
+    ones. A Resolution can not be changed once it is made, so it can be used as a key of the geometry caches.
+    """
+
+    def __init__(self, name: str, angle: float, size: float):
+        echeck(angle > 0, 'The fragment angle must be positive.')
+        echeck(size > 0, 'The fragment size must be positive.')
+        self._name = name
+        self._angle = angle
+        self._size = size
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def angle(self) -> float:
+        return self._angle
+
+    @property
+    def size(self) -> float:
+        return self._size
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Resolution) and (self._angle, self._size) == (other._angle, other._size)
+
+    def __hash__(self) -> int:
+        return hash((self._angle, self._size))
+
+    def __repr__(self) -> str:
+        return 'Resolution({!r}, {}, {})'.format(self._name, self._angle, self._size)
+
+    def fragment_size(self, feature_size: Optional[float] = None) -> float:
+        """Returns the largest fragment length to use for geometry that has to keep details of the given size, like the
+        lip of a snap joint. A fragment is never longer than the smallest detail, whatever the resolution.
+        """
+        return self._size if feature_size is None else min(self._size, feature_size)
+
+    def fragments(self, radius: float, feature_size: Optional[float] = None) -> int:
+        """Returns the number of fragments a circle of the given radius is drawn with. This is the rule OpenSCAD uses
+        for $fa and $fs, so setting $fn to it gives the same geometry as setting $fa and $fs.
+        """
+        if radius < 1e-6:
+            return 3
+        return int(ceil(max(min(360 / self._angle, 2 * pi * radius / self.fragment_size(feature_size)), 5)))
+
+    def scad_parameters(self, feature_size: Optional[float] = None) -> Dict[str, float]:
+        """Returns the $fa and $fs arguments for a module call, for geometry whose radii are only known inside the
+        module (see scad_module).
+        """
+        return {'_fa': self._angle, '_fs': self.fragment_size(feature_size)}
+
+
+"""
+Coarse geometry for quickly previewing and iterating on a model.
+"""
+DRAFT: Final[Resolution] = Resolution('draft', 20, 3)
+
+"""
+The geometry that is exported for printing. Fragments of at most 0.4 mm are about the width of a printed line.
+"""
+PRINT: Final[Resolution] = Resolution('print', 3, 0.4)
+
+"""
+Very fine geometry for models that are kept rather than printed. This is slow to render.
+"""
+ARCHIVAL: Final[Resolution] = Resolution('archival', 1, 0.1)
+
+"""
+The resolutions by name.
+"""
+RESOLUTIONS: Final[Dict[str, Resolution]] = {resolution.name: resolution for resolution in [DRAFT, PRINT, ARCHIVAL]}
+
+
+def scad_fn(resolution: Optional[Resolution], radius: float, feature_size: Optional[float] = None) -> Optional[int]:
+    """Returns the $fn for a primitive of the given radius, or None (OpenSCAD's defaults) when there is no resolution.
+    """
+    return None if resolution is None else resolution.fragments(radius, feature_size)
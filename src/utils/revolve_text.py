@@ -5,13 +5,62 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
-from solid2 import text, square
+from typing import Final
+from functools import lru_cache
+from solid2 import text, union
+from src.utils.echeck import echeck
+from src.utils.scad_library import scad_module_definition
 
+"""
+The font used for the text. Each character is drawn separately so it can be placed around the circle.
+"""
+FONT: Final[str] = "Liberation Sans:style=Bold"
 
-def revolve_text(radius: float, font_size: float, msg: str):
-    """This takes text and aligns it around a circle with the given radius and font size."""
-    model = square(0)
-    for i in range(len(msg)):
-        txt = text(text=msg[i], font="Liberation Sans:style=Bold", size=font_size, valign="center", halign="center")
-        model += txt.translate(0, radius + font_size / 2, 0).rotate(-i * 360 / len(msg))
-    return model
+"""
+The number of different rings of text that are kept by revolve_text.
+"""
+TEXT_RING_CACHE_SIZE: Final[int] = 512
+
+
+def _period(msg: str) -> int:
+    """Returns the length of the shortest piece of the message that the whole message is a repeat of."""
+    for length in range(1, len(msg)):
+        if len(msg) % length == 0 and msg == msg[:length] * (len(msg) // length):
+            return length
+    return len(msg)
+
+
+@lru_cache(maxsize=TEXT_RING_CACHE_SIZE)
+def revolve_text(radius: float, font_size: float, msg: str, font: str = FONT):
+    """This takes text and aligns it around a circle with the given radius and font size. The ring only depends on the
+    arguments, so it is built once and the same object is returned for every bond with the same label. If the message
+    repeats (bond labels are written around the ring twice) only the first repeat is built out of characters, and the
+    others are rotated copies of it, so OpenSCAD only has to draw the characters of one repeat.
+    """
+    echeck(len(msg) > 0, 'The message must not be empty.')
+    step = 360 / len(msg)
+    period = _period(msg)
+    characters = [
+        text(text=msg[i], font=font, size=font_size, valign="center", halign="center")
+        .translate(0, radius + font_size / 2, 0).rotate(-i * step)
+        for i in range(period)]
+    part = union()(*characters)
+    if period == len(msg):
+        return part
+    return union()(part, *[part.rotate(-k * period * step) for k in range(1, len(msg) // period)])
+
+
+def revolve_text_module() -> str:
+    """Returns the definition of the revolve_text(radius, font_size, message) module for the shared scad library. This
+    is the same geometry as revolve_text(), but the loop over the characters is done by OpenSCAD.
+    """
+    body = (
+        'for (i = [0:len(message) - 1]) {\n'
+        '\trotate(a = -i * 360 / len(message)) {\n'
+        '\t\ttranslate(v = [0, radius + font_size / 2, 0]) {\n'
+        '\t\t\ttext(font = "' + FONT + '", halign = "center", size = font_size, text = message[i], '
+        'valign = "center");\n'
+        '\t\t}\n'
+        '\t}\n'
+        '}\n')
+    return scad_module_definition('revolve_text', ['radius', 'font_size', 'message'], body)
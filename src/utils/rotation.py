@@ -0,0 +1,60 @@
+#
+# rotation.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from math import pi, cos, sin
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from src.utils.echeck import echeck
+
+
+def axis_angle_matrix_degrees(axis: Tuple[float, float, float], angle: float) -> np.ndarray:
+    """Returns the 3x3 matrix that rotates points counter-clockwise by the given angle in degrees around the given axis
+    (looking down the axis towards the origin). The axis does not need to be normalized. This uses Rodrigues' rotation
+    formula: https://en.wikipedia.org/wiki/Rodrigues%27_rotation_formula
+    """
+    direction = np.asarray(axis, dtype=np.float64)
+    length = float(np.linalg.norm(direction))
+    echeck(length > 0, 'The rotation axis must not be the zero vector.')
+    x, y, z = direction / length
+    radians = angle * (pi / 180)
+    c = cos(radians)
+    s = sin(radians)
+    t = 1 - c
+    return np.array([
+        [t * x * x + c, t * x * y - s * z, t * x * z + s * y],
+        [t * x * y + s * z, t * y * y + c, t * y * z - s * x],
+        [t * x * z - s * y, t * y * z + s * x, t * z * z + c]])
+
+
+def quaternion_matrix(w: float, x: float, y: float, z: float) -> np.ndarray:
+    """Returns the 3x3 rotation matrix for the quaternion w + xi + yj + zk. The quaternion does not need to be
+    normalized.
+    """
+    norm = (w * w + x * x + y * y + z * z) ** 0.5
+    echeck(norm > 0, 'The quaternion must not be zero.')
+    w, x, y, z = w / norm, x / norm, y / norm, z / norm
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+
+
+def z_rotation_matrix_degrees(angle: float) -> np.ndarray:
+    """Returns the 3x3 matrix that rotates points counter-clockwise by the given angle in degrees around the z-axis."""
+    return axis_angle_matrix_degrees((0.0, 0.0, 1.0), angle)
+
+
+def affine_matrix(matrix: np.ndarray, offset: Optional[Sequence[float]] = None) -> np.ndarray:
+    """Returns the 4x4 matrix that applies the 3x3 matrix and then adds the offset, the form OpenSCAD's multmatrix
+    takes.
+    """
+    echeck(matrix.shape == (3, 3), 'The matrix must be 3x3.')
+    affine = np.eye(4)
+    affine[:3, :3] = matrix
+    if offset is not None:
+        affine[:3, 3] = offset
+    return affine
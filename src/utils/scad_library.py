@@ -0,0 +1,40 @@
+#
+# scad_library.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+from typing import Any, Final, Sequence
+from textwrap import indent
+from solid2 import scad_inline
+from solid2.core.object_base import OpenSCADObject
+
+"""
+The name of the shared library file that the plates `use` when they are written in library mode. It holds the module
+definitions for the pieces of geometry that get repeated for every neighbor of every atom.
+"""
+SCAD_LIBRARY_FILENAME: Final[str] = 'balls_and_sticks.scad'
+
+
+def scad_module(name: str, **params) -> OpenSCADObject:
+    """Returns a call to the module with the given name in the library, e.g. snap_receiver(lip = 0.75, ...). This can
+    be transformed and combined like any other solid2 object.
+    """
+    return OpenSCADObject(name, params)
+
+
+def scad_parameter(name: str) -> Any:
+    """Returns a placeholder for a module parameter. Passing these to the geometry builders in place of numbers builds
+    the body of a parameterized module from the same code that builds the inlined geometry, since the arithmetic on them
+    is written out as OpenSCAD expressions.
+    """
+    return scad_inline(name)
+
+
+def scad_module_definition(name: str, parameters: Sequence[str], body) -> str:
+    """Returns the OpenSCAD definition of a module with the given parameters. The body can either be a solid2 object or
+    OpenSCAD source.
+    """
+    source = body if isinstance(body, str) else body.as_scad() + '\n'
+    return 'module {}({}) {{\n{}}}\n'.format(name, ', '.join(parameters), indent(source, '\t'))
@@ -5,14 +5,17 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
+from typing import Optional, Tuple
 from solid2 import polygon, square, cylinder, cube
 from src.utils.constants import EPS
+from src.utils.resolution import Resolution, scad_fn
 
 
 class SnapJoint:
     """This class holds the geometry of the snap joint used in the SingleBondModel class. It is used to connect two
     atoms together in a single bond. This class has two methods, one to generate the snap ring model and one to
-    generate the complementary snap receiver model that the snap join fits into.
+    generate the complementary snap receiver model that the snap join fits into. Bump BUILD_MANIFEST_VERSION (see
+    build_manifest) along with any change to the geometry made here, so built files are not kept from before it.
     """
 
     def __init__(
@@ -60,9 +63,20 @@ class SnapJoint:
     def indent(self) -> float:
         return self._indent
 
-    def snap_ring_model(self):
+    @property
+    def parameters(self) -> Tuple[float, float, float, float]:
+        """Returns (clearance, lip, radius, indent). Two snap joints with the same parameters have the same geometry."""
+        return (self._clearance, self._lip, self._radius, self._indent)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SnapJoint) and self.parameters == other.parameters
+
+    def __hash__(self) -> int:
+        return hash(self.parameters)
+
+    def snap_ring_model(self, resolution: Optional[Resolution] = None):
         """This method returns the snap ring model. This is the ring that snaps into the atoms' cavities to hold them
-        together.
+        together. The round parts are drawn at the resolution, keeping the lip (see Resolution.fragments).
         """
         # make the snap ring profile
         half = polygon([
@@ -74,8 +88,8 @@ class SnapJoint:
             [-2, 0]])
         half += square(2, self.indent, center=False).translate([-2, -self.indent])
         half = half.translate([self.radius - (self.clearance / 2), self.indent, 0])
-        half = half.rotate_extrude()
-        half += cylinder(h=1, r=1.25, center=True).translate([0, 0, 0.5])
+        half = half.rotate_extrude(_fn=scad_fn(resolution, self.radius - self.clearance / 2 + self.lip, self.lip))
+        half += cylinder(h=1, r=1.25, center=True, _fn=scad_fn(resolution, 1.25, self.lip)).translate([0, 0, 0.5])
         # make the notch to cut out of the atom
         notch = cube(3 * self.radius, self.radius + self.lip - 2, self.radius + self.lip - 2 + EPS, center=True)
         half -= notch.translate([0, 0, 1.75])
@@ -86,9 +100,10 @@ class SnapJoint:
         model -= bottom.translate(self.radius - (self.clearance / 2) - EPS, -3 * self.radius / 2, -3 * self.radius / 2)
         return model.rotate([0, 90, 0])
 
-    def snap_receiver_model(self):
+    def snap_receiver_model(self, resolution: Optional[Resolution] = None):
         """This model returns the space that the snap ring fits into. This is the portion of the atom that will be
-        removed to make room for the snap ring."""
+        removed to make room for the snap ring. The round parts are drawn at the resolution, keeping the lip (see
+        Resolution.fragments)."""
         model = polygon([
             [0, 0],
             [self.lip, self.lip],
@@ -96,10 +111,11 @@ class SnapJoint:
             [-self.lip, 4 * self.lip],
             [1, 4 * self.lip],
             [1, 0]])
-        model += square(1, self.indent).translate([0, -self.indent])
+        model += square([1, self.indent]).translate([0, -self.indent])
         model = model.translate([self.radius + (self.clearance / 2), 0, 0])
-        model = model.rotate_extrude()
-
         r = self.radius + (self.clearance / 2) + self.lip
+        fn = scad_fn(resolution, r, self.lip)
+        model = model.rotate_extrude(_fn=fn)
+
         h = 4 * self.lip + self.indent - EPS
-        return cylinder(r=r, h=h).translate([0, 0, EPS / 2 - self.indent]) - model
+        return cylinder(r=r, h=h, _fn=fn).translate([0, 0, EPS / 2 - self.indent]) - model
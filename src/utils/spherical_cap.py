@@ -5,9 +5,13 @@
 # Licensed under Creative Commons BY-NC-SA 3.0. See license file.
 #
 
+from typing import Optional
 from solid2 import sphere, cube
+from src.utils.resolution import Resolution, scad_fn
 
 
-def spherical_cap(r: float):
-    """This function generates a spherical cap with radius r, that is, a sphere cut in half."""
-    return sphere(r) - cube(2 * r, center=True).translate([0, 0, -r])
+def spherical_cap(r: float, resolution: Optional[Resolution] = None, feature_size: Optional[float] = None):
+    """This function generates a spherical cap with radius r, that is, a sphere cut in half. The sphere is drawn at the
+    resolution, keeping details of feature_size (see Resolution.fragments).
+    """
+    return sphere(r, _fn=scad_fn(resolution, r, feature_size)) - cube(2 * r, center=True).translate([0, 0, -r])
@@ -0,0 +1,90 @@
+#
+# test_build_manifest.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import json
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from src.atoms.atom_model import AtomModelBuilder
+from src.atoms.element import Element
+from src.atoms.neighbor import Neighbor
+from src.utils.build_manifest import BUILD_MANIFEST_VERSION, BuildManifest, atom_inputs, input_hash
+from src.utils.constants import pm
+
+
+class TestBuildManifest(unittest.TestCase):
+
+    def test_manifest(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'm.manifest.json'
+            (Path(directory) / 'a.scad').write_text('a')
+            (Path(directory) / 'b.scad').write_text('b')
+            (Path(directory) / 'c.scad').write_text('c')
+            manifest = BuildManifest(path)
+            self.assertFalse(manifest.is_current('a.scad', '1'))
+            manifest.record('a.scad', '1')
+            manifest.record('b.scad', '2')
+            manifest.save()
+            self.assertEqual({'a.scad': '1', 'b.scad': '2'}, json.loads(path.read_text())['outputs'])
+
+            manifest = BuildManifest(path)
+            self.assertTrue(manifest.is_current('a.scad', '1'))
+            self.assertFalse(manifest.is_current('a.scad', '3'))
+            self.assertFalse(manifest.is_current('c.scad', '1'))
+            manifest.record('a.scad', '3')
+            # Only b.scad was recorded before and not now, c.scad was never part of the build.
+            self.assertEqual([Path(directory) / 'b.scad'], manifest.prune())
+            self.assertEqual(['a.scad', 'c.scad', 'm.manifest.json'], sorted(p.name for p in Path(directory).iterdir()))
+            manifest.save()
+            self.assertTrue(BuildManifest(path).is_current('a.scad', '3'))
+
+    def test_prune_suffixes(self):
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / 'm.manifest.json'
+            for name in ['a.scad', 'a.stl', 'b.stl']:
+                (Path(directory) / name).write_text(name)
+            manifest = BuildManifest(path)
+            for name in ['a.scad', 'a.stl', 'b.stl']:
+                manifest.record(name, '1')
+            manifest.save()
+            (Path(directory) / 'b.stl').unlink()
+
+            # A build of only scad files keeps the STL files that are still there.
+            manifest = BuildManifest(path)
+            self.assertEqual([Path(directory) / 'a.scad'], manifest.prune(['.scad']))
+            self.assertEqual({'a.stl': '1'}, manifest.outputs)
+            manifest.save()
+            self.assertTrue(BuildManifest(path).is_current('a.stl', '1'))
+            self.assertEqual([Path(directory) / 'a.stl'], BuildManifest(path).prune())
+
+    def test_unreadable_manifest(self):
+        with TemporaryDirectory() as directory:
+            (Path(directory) / 'a.scad').write_text('a')
+            path = Path(directory) / 'm.manifest.json'
+            for text in ['{', '[]', json.dumps({'version': BUILD_MANIFEST_VERSION + 1, 'outputs': {'a.scad': '1'}})]:
+                path.write_text(text)
+                manifest = BuildManifest(path)
+                self.assertFalse(manifest.is_current('a.scad', '1'))
+                self.assertEqual([], manifest.prune())
+
+    def test_inputs(self):
+        def atom(label):
+            builder = AtomModelBuilder(Element.O)
+            builder.add_bond(Element.H, 95.84*pm, Neighbor.Direction(0.0, 0.0), 1, label)
+            builder.add_bond(Element.C, 120.0*pm, Neighbor.Direction(0.0, 120.0), 2)
+            return builder.build()
+
+        self.assertEqual(input_hash(atom_inputs(atom('x'))), input_hash(atom_inputs(atom('x'))))
+        self.assertNotEqual(input_hash(atom_inputs(atom('x'))), input_hash(atom_inputs(atom('y'))))
+        inputs = atom_inputs(atom(None))
+        # The single bond has a snap joint, the double bond does not.
+        self.assertEqual(4, len(inputs[1][0][6]))
+        self.assertIsNone(inputs[1][1][6])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+#
+# test_packing.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from math import ceil
+import numpy as np
+from src.utils.packing import Bed, Footprint, Placement, convex_hull, pack_footprints
+
+
+def rectangle(width: float, depth: float, angle: float = 0.0, center=(0.0, 0.0)) -> np.ndarray:
+    corners = np.array([[-width, -depth], [width, -depth], [width, depth], [-width, depth]]) / 2
+    radians = np.radians(angle)
+    turn = np.array([[np.cos(radians), -np.sin(radians)], [np.sin(radians), np.cos(radians)]])
+    return corners @ turn.T + center
+
+
+def placed(points: np.ndarray, placement: Placement) -> np.ndarray:
+    """Moves the points of a part the way the placement says to."""
+    radians = np.radians(placement.angle)
+    turn = np.array([[np.cos(radians), -np.sin(radians)], [np.sin(radians), np.cos(radians)]])
+    return points @ turn.T + placement.offset
+
+
+class TestPacking(unittest.TestCase):
+
+    def test_convex_hull(self):
+        points = np.random.default_rng(2).uniform(-1, 1, (200, 2))
+        points = np.concatenate((points, [[-2, -2], [2, -2], [2, 2], [-2, 2], [0, 2]]))
+        hull = convex_hull(points)
+        self.assertTrue(np.array_equal(hull, [[-2, -2], [2, -2], [2, 2], [-2, 2]]))
+        self.assertEqual(1, len(convex_hull(np.ones((3, 2)))))
+
+    def test_footprint(self):
+        footprint = Footprint(rectangle(4, 2, center=(1, 1)))
+        self.assertEqual(0.0, footprint.angle)
+        self.assertTrue(np.allclose([-1, 0], footprint.low))
+        self.assertTrue(np.allclose([4, 2], footprint.size))
+        # A turned rectangle is turned back so it is boxed tightly.
+        points = rectangle(4, 2, 30)
+        footprint = Footprint(points)
+        self.assertTrue(np.allclose([2, 4], np.sort(footprint.size)))
+        moved = placed(points, Placement(0, footprint.angle, (0.0, 0.0)))
+        self.assertTrue(np.allclose(footprint.low, moved.min(axis=0)))
+        self.assertTrue(np.allclose(footprint.size, moved.max(axis=0) - moved.min(axis=0)))
+        # A round part is not turned for a box that is barely smaller.
+        angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+        self.assertEqual(0.0, Footprint(np.column_stack((np.cos(angles), np.sin(angles)))).angle)
+
+    def test_pack(self):
+        rng = np.random.default_rng(5)
+        parts = [rectangle(*rng.uniform(5, 30, 2), rng.uniform(0, 90)) for _ in range(120)]
+        footprints = [Footprint(part) for part in parts]
+        bed = Bed(100, 80)
+        placements = pack_footprints(footprints, bed, spacing=2.0)
+        plates = max(placement.plate for placement in placements) + 1
+        area = sum(footprint.size.prod() for footprint in footprints)
+        self.assertEqual(set(range(plates)), set(placement.plate for placement in placements))
+        # The packing is dense: fewer plates than the grid of the largest part would need.
+        self.assertLess(plates, ceil(len(parts) / ((102 // 34) * (82 // 34))))
+        self.assertGreater(area / (plates * bed.width * bed.depth), 0.6)
+
+        boxes = []
+        for part, placement in zip(parts, placements):
+            moved = placed(part, placement)
+            low, high = moved.min(axis=0), moved.max(axis=0)
+            self.assertTrue(np.all(low >= -1e-9) and np.all(high <= [bed.width + 1e-9, bed.depth + 1e-9]))
+            boxes.append((placement.plate, low, high))
+        for i, (plate, low, high) in enumerate(boxes):
+            for other_plate, other_low, other_high in boxes[:i]:
+                if plate == other_plate:
+                    gap = np.maximum(other_low - high, low - other_high).max()
+                    self.assertGreaterEqual(gap, 2.0 - 1e-9)
+
+    def test_fills_plates_in_order(self):
+        placements = pack_footprints([Footprint(rectangle(10, 10))] * 5, Bed(21, 21), spacing=1.0)
+        self.assertEqual([0, 0, 0, 0, 1], sorted(placement.plate for placement in placements))
+
+    def test_turns_to_fit(self):
+        placements = pack_footprints([Footprint(rectangle(30, 10))], Bed(10, 30), spacing=0.0)
+        self.assertEqual(90.0, placements[0].angle)
+        self.assertEqual([], pack_footprints([], Bed(10, 30)))
+
+    def test_too_large(self):
+        with self.assertRaises(ValueError):
+            pack_footprints([Footprint(rectangle(30, 10))], Bed(20, 20))
+        with self.assertRaises(ValueError):
+            Bed(0, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -91,3 +91,12 @@ class TestPoint(unittest.TestCase):
         p = Point(-one_over_root2, -one_over_root2, -1.0)
         self.assertAlmostEqual(p.get_inclination_angle(), -45.0)
         self.assertAlmostEqual(p.get_azimuthal_angle(), -135.0)
+
+    def test_immutable(self):
+        p = Point(1.0, 2.0, 3.0)
+        with self.assertRaises(AttributeError):
+            p.x = 2.0
+        with self.assertRaises(AttributeError):
+            p.w = 2.0
+        self.assertEqual(1, len({Point(1.0, 2.0, 3.0), p}))
+        self.assertAlmostEqual(3.0, p.rotate_degrees(90.0).z)
@@ -0,0 +1,57 @@
+#
+# test_point_array.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from math import sqrt
+import numpy as np
+from src.utils.point import Point
+from src.utils.point_array import PointArray
+
+
+class TestPointArray(unittest.TestCase):
+
+    def setUp(self):
+        one_over_root2 = 1 / 2 ** 0.5
+        self.points = [
+            Point(3.0, 4.0),
+            Point(one_over_root2, -one_over_root2, 1.0),
+            Point(-one_over_root2, -one_over_root2, -1.0),
+            Point(1.0, 0.0, 2.0)]
+        self.array = PointArray.from_points(self.points)
+
+    def assertPointsAlmostEqual(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            self.assertAlmostEqual(e.x, a.x)
+            self.assertAlmostEqual(e.y, a.y)
+            self.assertAlmostEqual(e.z, a.z)
+
+    def test_matches_point(self):
+        """Every vectorized operation should give the same results as doing it point by point."""
+        offset = Point(1.0, 2.0, 3.0)
+        self.assertEqual([p + offset for p in self.points], (self.array + offset).to_points())
+        self.assertEqual([p - offset for p in self.points], (self.array - offset).to_points())
+        self.assertEqual([-p for p in self.points], (-self.array).to_points())
+        self.assertPointsAlmostEqual([p.rotate_degrees(30.0) for p in self.points], self.array.rotate_degrees(30.0))
+        np.testing.assert_allclose([p.distance(offset) for p in self.points], self.array.distances(offset))
+        np.testing.assert_allclose([p.magnitude() for p in self.points], self.array.magnitudes())
+        np.testing.assert_allclose(
+            [p.get_inclination_angle() for p in self.points], self.array.get_inclination_angles())
+        np.testing.assert_allclose([p.get_azimuthal_angle() for p in self.points], self.array.get_azimuthal_angles())
+
+    def test_pairwise(self):
+        other = self.array.rotate_degrees(90.0)
+        np.testing.assert_allclose([5.0 * sqrt(2), sqrt(2), sqrt(2), sqrt(2)], self.array.distances(other))
+        self.assertEqual(self.points[0] + other[0], (self.array + other)[0])
+
+    def test_2d_coordinates(self):
+        array = PointArray(np.array([[1, 2], [3, 4]]))
+        self.assertEqual([Point(1.0, 2.0), Point(3.0, 4.0)], array.to_points())
+        with self.assertRaises(ValueError):
+            PointArray(np.zeros((2, 4)))
+        with self.assertRaises(TypeError):
+            array + 1.0
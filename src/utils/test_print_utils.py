@@ -0,0 +1,243 @@
+#
+# test_print_utils.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from src.atoms.atom_model import AtomModelBuilder
+from src.atoms.element import Element
+from src.atoms.neighbor import Neighbor
+from src.molecules.molecule_model import MoleculeModel, MoleculeModelBuilder
+from src.utils.constants import pm
+from src.utils.packing import Bed
+from src.utils.print_utils import arrange_prints, plate_filenames, print_batch, print_molecule, render_molecule
+from src.utils.render_cache import RenderCache
+from src.utils.resolution import DRAFT
+
+
+def copy_renderer(scad_path: Path, stl_path: Path) -> None:
+    """Stands in for OpenSCAD by copying the scad text into the STL file. This is module level so a process pool can
+    pickle it.
+    """
+    stl_path.write_text(scad_path.read_text())
+
+
+def labelled_failing_renderer(scad_path: Path, stl_path: Path) -> None:
+    """Fails for the atoms that have a bond labelled x."""
+    if 'text = "x"' in scad_path.read_text():
+        raise RuntimeError('render failed')
+    copy_renderer(scad_path, stl_path)
+
+
+def salt() -> MoleculeModel:
+    """Three sodium atoms, the first two of which are the same part (their bonds only point in different directions)
+    and the last of which has a labelled bond.
+    """
+    builder = MoleculeModelBuilder('salt')
+    for direction, label in [
+            (Neighbor.Direction(45.0, 45.0), None), (Neighbor.Direction(0.0, 0.0), None),
+            (Neighbor.Direction(0.0, 0.0), 'x')]:
+        builder.add_atom(AtomModelBuilder(Element.Na).add_bond(Element.Cl, 238.6*pm, direction, 1, label).build())
+    return builder.build()
+
+
+def salt_with_chlorine(label: str) -> MoleculeModel:
+    """The three sodium atoms of salt() and a chlorine atom with a bond labelled label."""
+    builder = MoleculeModelBuilder('salt')
+    for atom in salt().atoms():
+        builder.add_atom(atom)
+    builder.add_atom(
+        AtomModelBuilder(Element.Cl).add_bond(Element.Na, 238.6*pm, Neighbor.Direction(0.0, 0.0), 1, label).build())
+    return builder.build()
+
+
+class TestRenderMolecule(unittest.TestCase):
+
+    def test_render_molecule(self):
+        with TemporaryDirectory() as directory:
+            cache = RenderCache(Path(directory) / 'cache', copy_renderer)
+            report = render_molecule(salt(), str(Path(directory) / 'out'), cache)
+            self.assertTrue(report.succeeded)
+            self.assertEqual(['salt_Na_0.stl', 'salt_Na_1.stl', 'salt_Na_2.stl'], [path.name for path in report.paths])
+            # The first two atoms are the same part, so they are only rendered once.
+            self.assertEqual((0, 2), (cache.hits, cache.misses))
+            render_molecule(salt(), str(Path(directory) / 'out'), cache)
+            self.assertEqual((2, 2), (cache.hits, cache.misses))
+
+    def test_parallel_matches_serial(self):
+        with TemporaryDirectory() as directory:
+            serial = render_molecule(
+                salt(), str(Path(directory) / 'serial'), RenderCache(Path(directory) / 'cache1', copy_renderer))
+            parallel = render_molecule(
+                salt(), str(Path(directory) / 'parallel'), RenderCache(Path(directory) / 'cache2', copy_renderer),
+                processes=2)
+            self.assertTrue(parallel.succeeded)
+            self.assertEqual([path.name for path in serial.paths], [path.name for path in parallel.paths])
+            for expected, actual in zip(serial.paths, parallel.paths):
+                self.assertEqual(expected.read_text(), actual.read_text())
+
+    def test_parallel_counts_and_eviction(self):
+        with TemporaryDirectory() as directory:
+            # The cache has no room for any STL, but the workers leave the eviction to the end, after every copy.
+            cache = RenderCache(Path(directory) / 'cache', copy_renderer, max_bytes=1)
+            report = render_molecule(salt(), str(Path(directory) / 'out'), cache, processes=2)
+            self.assertTrue(report.succeeded)
+            self.assertTrue(all(path.stat().st_size > 0 for path in report.paths))
+            self.assertEqual((0, 2), (cache.hits, cache.misses))
+            self.assertEqual([], list((Path(directory) / 'cache').glob('*.stl')))
+
+            cache = RenderCache(Path(directory) / 'cache', copy_renderer)
+            render_molecule(salt(), str(Path(directory) / 'out'), cache, processes=2)
+            render_molecule(salt(), str(Path(directory) / 'out'), cache, processes=2)
+            self.assertEqual((2, 2), (cache.hits, cache.misses))
+
+    def test_failures_are_reported(self):
+        for processes in [None, 2]:
+            with TemporaryDirectory() as directory:
+                report = render_molecule(
+                    salt(), directory, RenderCache(Path(directory) / 'cache', labelled_failing_renderer),
+                    processes=processes)
+                self.assertFalse(report.succeeded)
+                self.assertEqual(['salt_Na_0.stl', 'salt_Na_1.stl'], [path.name for path in report.paths])
+                self.assertEqual([Path(directory) / 'salt_Na_2.stl'], list(report.failures.keys()))
+                self.assertIn('render failed', report.failures[Path(directory) / 'salt_Na_2.stl'])
+
+
+class TestArrangePrints(unittest.TestCase):
+
+    def test_plates(self):
+        atoms = salt().element_atoms(Element.Na)
+        diameter = 2 * Element.Na.van_der_waals_radius
+        self.assertEqual(1, len(arrange_prints(atoms)))
+        # A bed that only has room for two of the atoms side by side.
+        plates = arrange_prints(atoms, bed=Bed(2 * diameter + 3, diameter + 1))
+        self.assertEqual(2, len(plates))
+        self.assertEqual(2, plates[0].as_scad().count('color('))
+        self.assertEqual(1, plates[1].as_scad().count('color('))
+        with self.assertRaises(ValueError):
+            arrange_prints(atoms, bed=Bed(diameter / 2, diameter / 2))
+
+    def test_plate_filenames(self):
+        self.assertEqual(['salt_Na.scad'], plate_filenames('salt_Na', 1))
+        self.assertEqual(['salt_Na_plate1.scad', 'salt_Na_plate2.scad'], plate_filenames('salt_Na', 2))
+
+
+class TestPrintMolecule(unittest.TestCase):
+
+    def test_incremental(self):
+        with TemporaryDirectory() as directory:
+            out = Path(directory) / 'out'
+            print_molecule(salt_with_chlorine('a'), str(out))
+            self.assertEqual(
+                ['salt.manifest.json', 'salt_Cl.scad', 'salt_Na.scad'], sorted(path.name for path in out.iterdir()))
+            sodium = (out / 'salt_Na.scad').read_text()
+            chlorine = (out / 'salt_Cl.scad').read_text()
+            self.assertIn('text = "a"', chlorine)
+
+            # Files that are current are not written again, so these marks stay.
+            (out / 'salt_Na.scad').write_text('kept')
+            (out / 'salt_Cl.scad').write_text('kept')
+            print_molecule(salt_with_chlorine('a'), str(out))
+            self.assertEqual('kept', (out / 'salt_Na.scad').read_text())
+            self.assertEqual('kept', (out / 'salt_Cl.scad').read_text())
+
+            # Relabelling the chlorine only rebuilds its plate.
+            print_molecule(salt_with_chlorine('b'), str(out))
+            self.assertEqual('kept', (out / 'salt_Na.scad').read_text())
+            self.assertNotEqual(chlorine, (out / 'salt_Cl.scad').read_text())
+            self.assertIn('text = "b"', (out / 'salt_Cl.scad').read_text())
+
+            # A file that went missing is written again, as is everything at another resolution.
+            (out / 'salt_Cl.scad').unlink()
+            print_molecule(salt_with_chlorine('b'), str(out))
+            self.assertTrue((out / 'salt_Cl.scad').exists())
+            self.assertEqual('kept', (out / 'salt_Na.scad').read_text())
+            print_molecule(salt_with_chlorine('b'), str(out), resolution=DRAFT)
+            self.assertNotEqual('kept', (out / 'salt_Na.scad').read_text())
+            self.assertNotEqual(sodium, (out / 'salt_Na.scad').read_text())
+
+    def test_prunes_orphans(self):
+        with TemporaryDirectory() as directory:
+            diameter = 2 * Element.Na.van_der_waals_radius
+            (Path(directory) / 'other.scad').write_text('not ours')
+            print_molecule(salt(), directory, bed=Bed(diameter + 1, diameter + 1))
+            self.assertEqual(
+                ['other.scad', 'salt.manifest.json', 'salt_Na_plate1.scad', 'salt_Na_plate2.scad',
+                 'salt_Na_plate3.scad'],
+                sorted(path.name for path in Path(directory).iterdir()))
+            print_molecule(salt(), directory)
+            self.assertEqual(
+                ['other.scad', 'salt.manifest.json', 'salt_Na.scad'],
+                sorted(path.name for path in Path(directory).iterdir()))
+
+    def test_render(self):
+        with TemporaryDirectory() as directory:
+            out = Path(directory) / 'out'
+            cache = RenderCache(Path(directory) / 'cache', copy_renderer)
+            report = print_molecule(salt_with_chlorine('a'), str(out), render=True, cache=cache)
+            assert report is not None
+            self.assertTrue(report.succeeded)
+            self.assertEqual(4, len(report.paths))
+            self.assertEqual((0, 3), (cache.hits, cache.misses))
+            # Only the STL of the relabelled chlorine is rendered again, the others are not even looked up.
+            report = print_molecule(salt_with_chlorine('b'), str(out), render=True, cache=cache)
+            assert report is not None
+            self.assertEqual(4, len(report.paths))
+            self.assertEqual((0, 4), (cache.hits, cache.misses))
+            self.assertIn('text = "b"', (out / 'salt_Cl_0.stl').read_text())
+            # Building without rendering leaves the STL files alone, and the next render still finds them current.
+            print_molecule(salt_with_chlorine('b'), str(out))
+            self.assertEqual(4, len(list(out.glob('*.stl'))))
+            report = print_molecule(salt_with_chlorine('b'), str(out), render=True, cache=cache)
+            assert report is not None
+            self.assertEqual((0, 4), (cache.hits, cache.misses))
+            # Atoms that are gone lose their STL files at the next render.
+            print_molecule(salt(), str(out))
+            self.assertEqual(4, len(list(out.glob('*.stl'))))
+            print_molecule(salt(), str(out), render=True, cache=cache)
+            self.assertEqual(
+                ['salt_Na_0.stl', 'salt_Na_1.stl', 'salt_Na_2.stl'], sorted(path.name for path in out.glob('*.stl')))
+
+
+class TestPrintBatch(unittest.TestCase):
+
+    def test_pools_elements(self):
+        brine = MoleculeModelBuilder('brine')
+        brine.add_atom(
+            AtomModelBuilder(Element.Na).add_bond(Element.Cl, 238.6*pm, Neighbor.Direction(10.0, 0.0), 1).build())
+        diameter = 2 * Element.Na.van_der_waals_radius
+        # There is room for two sodium atoms across and two deep.
+        bed = Bed(2 * diameter + 3, 2 * diameter + 3)
+        with TemporaryDirectory() as directory:
+            plates = print_batch('run', [(salt_with_chlorine('a'), 1), (brine.build(), 1)], directory, bed=bed)
+            # Separately the salt's three sodium atoms and the brine's one would take a plate each.
+            self.assertEqual([Path(directory) / 'run_Cl.scad', Path(directory) / 'run_Na.scad'], sorted(plates))
+            self.assertEqual(
+                ['brine copy 1 Na 0', 'salt copy 1 Na 0', 'salt copy 1 Na 1', 'salt copy 1 Na 2'],
+                sorted(plates[Path(directory) / 'run_Na.scad']))
+            self.assertEqual(['salt copy 1 Cl 0'], plates[Path(directory) / 'run_Cl.scad'])
+            scad = (Path(directory) / 'run_Na.scad').read_text()
+            self.assertIn('// brine copy 1 Na 0 at (', scad)
+            self.assertEqual(4, scad.count('color('))
+
+            plates = print_batch('run', [(salt(), 2), (brine.build(), 0)], directory, bed=bed)
+            self.assertEqual(
+                [Path(directory) / 'run_Na_plate1.scad', Path(directory) / 'run_Na_plate2.scad'], sorted(plates))
+            labels = sorted(label for plate in plates.values() for label in plate)
+            expected = ['salt copy {} Na {}'.format(copy, index) for copy in [1, 2] for index in range(3)]
+            self.assertEqual(expected, labels)
+            # The plates of the last run that this one does not need are removed.
+            self.assertEqual(
+                ['run.manifest.json', 'run_Na_plate1.scad', 'run_Na_plate2.scad'],
+                sorted(path.name for path in Path(directory).iterdir()))
+
+    def test_names(self):
+        with TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                print_batch('run', [(salt(), 1), (salt(), 1)], directory)
+            with self.assertRaises(ValueError):
+                print_batch('run', [(salt(), -1)], directory)
@@ -0,0 +1,99 @@
+#
+# test_render_cache.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+from solid2 import cube
+from src.atoms.atom_model import AtomModelBuilder
+from src.atoms.element import Element
+from src.atoms.neighbor import Neighbor
+from src.utils.constants import pm
+from src.utils.render_cache import RenderCache, canonical_scad, default_render_cache_directory
+
+
+class StubRenderer(object):
+    """Stands in for OpenSCAD by copying the scad text into the STL file."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, scad_path: Path, stl_path: Path) -> None:
+        self.calls += 1
+        stl_path.write_text(scad_path.read_text())
+
+
+class TestRenderCache(unittest.TestCase):
+
+    def test_canonical_scad(self):
+        self.assertEqual(canonical_scad(cube(1)), canonical_scad(cube(1)))
+        self.assertNotEqual(canonical_scad(cube(1)), canonical_scad(cube(2)))
+        self.assertIn('module neighbor_space', canonical_scad(cube(1), library=True))
+        self.assertTrue(canonical_scad(cube(1)).endswith(';\n'))
+
+    def test_renders_are_reused(self):
+        renderer = StubRenderer()
+        with TemporaryDirectory() as directory:
+            cache = RenderCache(directory, renderer)
+            first = cache.render_model(cube(1))
+            second = cache.render_model(cube(1))
+            self.assertEqual(first, second)
+            self.assertEqual(canonical_scad(cube(1)), first.read_text())
+            self.assertEqual(1, renderer.calls)
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+            cache.render_model(cube(2))
+            self.assertEqual(2, renderer.calls)
+            # A new cache over the same directory reuses the files.
+            RenderCache(directory, renderer).render_model(cube(2))
+            self.assertEqual(2, renderer.calls)
+
+    def test_render_atom(self):
+        renderer = StubRenderer()
+        builder = AtomModelBuilder(Element.Na)
+        builder.add_bond(Element.Cl, 238.6*pm, Neighbor.Direction(45.0, 45.0), 1, 'x')
+        atom = builder.build()
+        with TemporaryDirectory() as directory:
+            cache = RenderCache(directory, renderer)
+            self.assertEqual(cache.render_atom(atom), cache.render_atom(atom.clone()))
+            self.assertNotEqual(cache.render_atom(atom), cache.render_atom(atom, library=True))
+            self.assertEqual(2, renderer.calls)
+
+    def test_eviction(self):
+        renderer = StubRenderer()
+        with TemporaryDirectory() as directory:
+            size = len(canonical_scad(cube(1)))
+            cache = RenderCache(directory, renderer, max_bytes=2 * size)
+            oldest = cache.render_model(cube(1))
+            newest = cache.render_model(cube(2))
+            os.utime(oldest, (1, 1))
+            os.utime(newest, (2, 2))
+            # Using the oldest file makes it the most recently used, so the other one is removed.
+            cache.render_model(cube(1))
+            cache.render_model(cube(3))
+            self.assertTrue(oldest.exists())
+            self.assertFalse(newest.exists())
+            self.assertEqual(2, len(list(Path(directory).glob('*.stl'))))
+
+    def test_failed_render_is_not_cached(self):
+        def failing(scad_path: Path, stl_path: Path) -> None:
+            raise RuntimeError('render failed')
+
+        with TemporaryDirectory() as directory:
+            cache = RenderCache(directory, failing)
+            with self.assertRaises(RuntimeError):
+                cache.render_model(cube(1))
+            self.assertFalse(cache.path(canonical_scad(cube(1))).exists())
+            self.assertEqual([], list(Path(directory).iterdir()))
+
+    def test_default_directory(self):
+        # The environment variable is read when a cache is made, not when the module is imported.
+        with TemporaryDirectory() as directory:
+            with patch.dict('os.environ', {'BALLS_AND_STICKS_CACHE': directory}):
+                self.assertEqual(Path(directory) / 'stls', default_render_cache_directory())
+                self.assertEqual(Path(directory) / 'stls', RenderCache().directory)
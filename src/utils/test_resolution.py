@@ -0,0 +1,58 @@
+#
+# test_resolution.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from src.atoms.atom_model import AtomModelBuilder
+from src.atoms.atom_position import AtomPosition
+from src.atoms.element import Element
+from src.atoms.neighbor import Neighbor
+from src.molecules.molecule_representation import MoleculeRepresentation
+from src.utils.constants import pm
+from src.utils.point import Point
+from src.utils.resolution import ARCHIVAL, DRAFT, PRINT, RESOLUTIONS, Resolution, scad_fn
+
+
+class TestResolution(unittest.TestCase):
+
+    def test_fragments(self):
+        resolution = Resolution('test', 12, 2)
+        # OpenSCAD's defaults: at least 5 fragments, at most 360 / $fa, otherwise the circumference over $fs.
+        self.assertEqual(5, resolution.fragments(1))
+        self.assertEqual(16, resolution.fragments(5))
+        self.assertEqual(30, resolution.fragments(100))
+        self.assertEqual(3, resolution.fragments(0))
+        # A small feature makes the fragments shorter.
+        self.assertEqual(21, resolution.fragments(5, feature_size=1.5))
+        self.assertEqual({'_fa': 12, '_fs': 1.5}, resolution.scad_parameters(1.5))
+        self.assertIsNone(scad_fn(None, 5))
+        self.assertEqual(16, scad_fn(resolution, 5))
+
+    def test_profiles(self):
+        radius = Element.C.van_der_waals_radius
+        self.assertLess(DRAFT.fragments(radius), PRINT.fragments(radius))
+        self.assertLess(PRINT.fragments(radius), ARCHIVAL.fragments(radius))
+        self.assertIs(PRINT, RESOLUTIONS['print'])
+        self.assertEqual(PRINT, Resolution('other name', PRINT.angle, PRINT.size))
+        self.assertEqual(hash(PRINT), hash(Resolution('other name', PRINT.angle, PRINT.size)))
+        with self.assertRaises(ValueError):
+            Resolution('bad', 0, 1)
+
+    def test_models(self):
+        builder = AtomModelBuilder(Element.Na)
+        builder.add_bond(Element.Cl, 238.6*pm, Neighbor.Direction(45.0, 45.0), 1)
+        atom = builder.build()
+        self.assertNotIn('$fn', atom.model().as_scad())
+        scad = atom.model(resolution=PRINT).as_scad()
+        self.assertIn('sphere($fn = {}, r = '.format(PRINT.fragments(Element.Na.van_der_waals_radius)), scad)
+        self.assertIn('rotate_extrude($fn = ', scad)
+        self.assertIn('$fa = 3, $fs = 0.4', atom.model(library=True, resolution=PRINT).as_scad())
+        self.assertNotEqual(atom.print(resolution=DRAFT).as_scad(), atom.print(resolution=PRINT).as_scad())
+
+        representation = MoleculeRepresentation([AtomPosition(Element.O, Point(0.0, 0.0, 0.0))])
+        self.assertNotIn('$fn', representation.model().as_scad())
+        self.assertIn('$fn = {}'.format(DRAFT.fragments(Element.O.van_der_waals_radius)),
+                      representation.model(DRAFT).as_scad())
@@ -0,0 +1,32 @@
+#
+# test_revolve_text.py
+#
+# Copyright © 2024 Derek Seiple
+# Licensed under Creative Commons BY-NC-SA 3.0. See license file.
+#
+
+import unittest
+from src.utils.revolve_text import revolve_text
+
+
+class TestRevolveText(unittest.TestCase):
+
+    def test_rings_are_shared(self):
+        self.assertIs(revolve_text(4, 4, 'N1 N1 '), revolve_text(4, 4, 'N1 N1 '))
+        self.assertIsNot(revolve_text(4, 4, 'N1 N1 '), revolve_text(5, 4, 'N1 N1 '))
+        self.assertIsNot(revolve_text(4, 4, 'N1 N1 '), revolve_text(4, 4, 'N1 N1 ', 'Liberation Serif'))
+        self.assertIn('Liberation Serif', revolve_text(4, 4, 'N1 N1 ', 'Liberation Serif').as_scad())
+
+    def test_repeats_are_rotated_copies(self):
+        ring = revolve_text(4, 4, 'C5 C5 ')
+        self.assertEqual(2, len(ring._children))
+        first, second = ring._children
+        self.assertEqual(3, len(first._children))
+        self.assertEqual('rotate', second._name)
+        self.assertEqual(-180, second._params['a'])
+        self.assertIs(first, second._children[0])
+        self.assertEqual(3, len(revolve_text(4, 4, 'abc')._children))
+
+    def test_empty_message(self):
+        with self.assertRaises(ValueError):
+            revolve_text(4, 4, '')